@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Фоновое выполнение действий блокировки
+
+Поток мониторинга только принимает решение, а действия (пропуск трека,
+закрытие окон, завершение процессов, очистка кэша) выполняются пулом
+потоков. Действия дедуплицируются по имени (пока действие в очереди или
+выполняется, повторный запрос игнорируется), выполняются по приоритету
+(меньше - раньше), устаревшие в очереди отбрасываются по таймауту, а для
+каждого действия собирается статистика задержек.
+
+Таймаут - предел ожидания в очереди: уже запущенное действие не
+прерывается (поток нельзя безопасно остановить извне), а если оно
+выполнялось дольше таймаута, это учитывается в статистике и в логе.
+"""
+
+import time
+import queue
+import itertools
+import threading
+from typing import Callable, Dict, Optional
+
+_STOP = object()
+
+# Приоритеты действий блокировки: пропуск первым, очистка кэша последней
+PRIORITY_SKIP = 0
+PRIORITY_CLOSE_WINDOWS = 1
+PRIORITY_PROCESSES = 2
+PRIORITY_CACHE = 3
+
+
+class ActionStats:
+    """Статистика выполнения одного действия"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.dropped = 0
+        self.deduplicated = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.last_time = 0.0
+        self.total_wait = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'dropped': self.dropped,
+            'deduplicated': self.deduplicated,
+            'avg_ms': self.total_time / self.count * 1000 if self.count else 0.0,
+            'max_ms': self.max_time * 1000,
+            'last_ms': self.last_time * 1000,
+            'avg_wait_ms': self.total_wait / self.count * 1000 if self.count else 0.0,
+        }
+
+
+class ActionExecutor:
+    """Пул потоков с приоритетами, дедупликацией и таймаутами действий"""
+
+    def __init__(self, workers: int = 2, log: Optional[Callable[..., None]] = None,
+                 default_timeout: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.log = log or (lambda message, level='INFO', *args: None)
+        self.default_timeout = default_timeout
+        self.clock = clock
+        self.stats: Dict[str, ActionStats] = {}
+        # Наблюдатели завершения действий: callback(name, seconds, ok)
+        self.listeners = []
+
+        self._queue: 'queue.PriorityQueue' = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._active = set()
+        # Защищает _active и stats: статистику обновляют все потоки пула
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._workers = [threading.Thread(target=self._run, name=f'AdBlockerAction-{i}', daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def _stats_for(self, name: str) -> ActionStats:
+        """Статистика действия (вызывается под self._lock)"""
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = ActionStats()
+        return stats
+
+    def submit(self, name: str, func: Callable[[], None], priority: int = 0,
+               timeout: Optional[float] = None) -> bool:
+        """Поставить действие в очередь; False, если такое уже ждет или выполняется
+
+        timeout - сколько действие может ждать в очереди, прежде чем будет
+        отброшено как устаревшее.
+        """
+        with self._lock:
+            if self._stopped:
+                return False
+            if name in self._active:
+                self._stats_for(name).deduplicated += 1
+                return False
+            self._active.add(name)
+        timeout = self.default_timeout if timeout is None else timeout
+        self._queue.put((priority, next(self._seq), name, func, timeout, self.clock()))
+        return True
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item[2] is _STOP:
+                return
+            _, _, name, func, timeout, submitted = item
+            waited = self.clock() - submitted
+            try:
+                if waited > timeout:
+                    # Действие устарело, пока ждало в очереди
+                    with self._lock:
+                        self._stats_for(name).dropped += 1
+                    self.log(f"Действие {name} отброшено: ожидало {waited:.2f} с", "WARNING")
+                    continue
+
+                started = self.clock()
+                ok = True
+                try:
+                    func()
+                except Exception as e:
+                    ok = False
+                    self.log(f"Ошибка действия {name}: {e}", "ERROR")
+                elapsed = self.clock() - started
+
+                with self._lock:
+                    stats = self._stats_for(name)
+                    stats.count += 1
+                    if not ok:
+                        stats.errors += 1
+                    stats.total_time += elapsed
+                    stats.total_wait += waited
+                    stats.last_time = elapsed
+                    stats.max_time = max(stats.max_time, elapsed)
+                    if elapsed > timeout:
+                        stats.timeouts += 1
+                if elapsed > timeout:
+                    # Не прерывается: таймаут ограничивает только ожидание в очереди
+                    self.log(f"Действие {name} выполнялось {elapsed:.2f} с (дольше таймаута очереди {timeout:.2f} с)", "WARNING")
+                self.log("Действие %s: %.1f мс (ожидание %.1f мс)", "DEBUG",
+                         name, elapsed * 1000, waited * 1000)
+                for listener in list(self.listeners):
+                    try:
+                        listener(name, elapsed, ok)
+                    except Exception:
+                        pass
+            finally:
+                with self._lock:
+                    self._active.discard(name)
+
+    def latency_report(self) -> str:
+        """Строка со средней и максимальной задержкой каждого действия"""
+        parts = []
+        with self._lock:
+            snapshot = [(name, stats.as_dict()) for name, stats in sorted(self.stats.items())]
+        for name, data in snapshot:
+            parts.append(f"{name}: n={data['count']} avg={data['avg_ms']:.1f}мс max={data['max_ms']:.1f}мс")
+        return '; '.join(parts)
+
+    def stop(self, timeout: float = 2.0):
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        for _ in self._workers:
+            # Сигнал остановки идет после всех уже поставленных действий
+            self._queue.put((float('inf'), next(self._seq), _STOP, None, 0, 0))
+        for worker in self._workers:
+            worker.join(timeout)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Инкрементальная очистка рекламного кэша Spotify
+
+Вместо четырех rglob по всему AppData/Roaming/Spotify и AppData/Local/Spotify
+выполняется один обход os.scandir, который проверяет все шаблоны сразу.
+Для каждой папки запоминается mtime и список подпапок: mtime папки
+меняется только при добавлении, удалении или переименовании ее записей,
+поэтому неизмененные папки не перечитываются, а только проверяются
+одним stat. Индекс сохраняется между запусками.
+
+Очистка выполняется фоновым потоком с пониженным приоритетом и не
+останавливает поток мониторинга.
+"""
+
+import os
+import re
+import json
+import time
+import fnmatch
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+# Шаблоны рекламных файлов (как раньше в rglob)
+AD_CACHE_PATTERNS = ['*ad*', '*advertisement*', '*promo*', '*banner*']
+
+
+def _lower_thread_priority():
+    """Понизить приоритет текущего потока (насколько позволяет ОС)"""
+    try:
+        if os.name == 'nt':
+            import ctypes
+            THREAD_PRIORITY_LOWEST = -2
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_LOWEST)
+        elif hasattr(os, 'setpriority') and hasattr(threading, 'get_native_id'):
+            # В Linux nice можно задать отдельному потоку по его TID
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except Exception:
+        pass
+
+
+class AdCacheCleaner:
+    """Однопроходная очистка кэша с индексом mtime папок"""
+
+    def __init__(self, roots: Iterable[Path], index_file: Path,
+                 log: Optional[Callable[..., None]] = None,
+                 patterns: Optional[List[str]] = None,
+                 min_interval: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.roots = [Path(root) for root in roots]
+        self.index_file = Path(index_file)
+        self.log = log or (lambda message, level='INFO': None)
+        patterns = patterns or AD_CACHE_PATTERNS
+        # Все шаблоны - одно выражение; на Windows rglob не учитывал регистр
+        self._regex = re.compile('|'.join(fnmatch.translate(p) for p in patterns), re.IGNORECASE)
+        self.min_interval = min_interval
+        self.clock = clock
+
+        # путь папки -> {"mtime": ..., "dirs": [подпапки]}
+        self.index: Dict[str, Dict] = self._load_index()
+        self.stats = {'sweeps': 0, 'dirs_scanned': 0, 'dirs_skipped': 0,
+                      'files_deleted': 0, 'last_duration': 0.0}
+
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_sweep = 0.0
+        # Флаг очистки: ставится при приеме запроса, снимается потоком после прохода
+        self._lock = threading.Lock()
+        self._busy = False
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self):
+        tmp_file = self.index_file.with_name(self.index_file.name + '.tmp')
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            self.log(f"Не удалось сохранить индекс кэша: {e}", "WARNING")
+
+    def matches(self, name: str) -> bool:
+        return self._regex.match(name) is not None
+
+    def _scan_dir(self, path: str) -> List[str]:
+        """Прочитать папку: удалить рекламные файлы, вернуть подпапки"""
+        subdirs = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) and self.matches(entry.name):
+                        os.unlink(entry.path)
+                        self.stats['files_deleted'] += 1
+                        self.log(f"🗑️ Удален рекламный файл: {entry.name}")
+                except OSError:
+                    continue
+        return subdirs
+
+    def sweep(self) -> int:
+        """Один синхронный проход по всем корням; возвращает число удаленных файлов"""
+        started = time.monotonic()
+        deleted_before = self.stats['files_deleted']
+        seen = set()
+        stack = [str(root) for root in self.roots if root.exists()]
+        while stack and not self._stop.is_set():
+            path = stack.pop()
+            seen.add(path)
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+
+            cached = self.index.get(path)
+            if cached is not None and cached.get('mtime') == mtime:
+                # Содержимое папки не менялось - берем подпапки из индекса
+                self.stats['dirs_skipped'] += 1
+                stack.extend(cached.get('dirs', []))
+                continue
+
+            try:
+                subdirs = self._scan_dir(path)
+                # Удаление файлов меняет mtime папки - запоминаем итоговый
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            self.stats['dirs_scanned'] += 1
+            self.index[path] = {'mtime': mtime, 'dirs': subdirs}
+            stack.extend(subdirs)
+
+        if not self._stop.is_set():
+            # Папки, которых больше нет, убираем из индекса
+            for path in [p for p in self.index if p not in seen]:
+                del self.index[path]
+        self._save_index()
+
+        self.stats['sweeps'] += 1
+        self.stats['last_duration'] = time.monotonic() - started
+        self._last_sweep = self.clock()
+        return self.stats['files_deleted'] - deleted_before
+
+    def request_sweep(self) -> bool:
+        """Запросить фоновую очистку; False, если она уже идет или была недавно"""
+        with self._lock:
+            recent = self._last_sweep and self.clock() - self._last_sweep < self.min_interval
+            if self._busy or recent or self._stop.is_set():
+                return False
+            self._busy = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='AdCacheCleaner', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return True
+
+    def _run(self):
+        _lower_thread_priority()
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self.sweep()
+            except Exception as e:
+                self.log(f"Ошибка очистки рекламного кэша: {e}", "ERROR")
+            finally:
+                with self._lock:
+                    self._busy = False
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    def stop(self, timeout: float = 5.0):
+        """Остановить поток и дождаться конца прохода (обход прерывается между папками)"""
+        self._stop.set()
+        self._wakeup.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
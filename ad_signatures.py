@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сигнатуры рекламы в заголовках окон Spotify
+
+Все индикаторы, которые раньше были разбросаны по детекторам в виде
+отдельных списков и вызовов re.search, собраны здесь и компилируются
+один раз в одно регулярное выражение. Вердикт для каждого уникального
+заголовка кэшируется в ограниченном LRU: один и тот же заголовок
+проверяется тысячи раз за песню, а вычисляется один раз.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+# Подстроки (экранируются при компиляции), сгруппированные по детекторам
+AD_KEYWORDS: Dict[str, List[str]] = {
+    # Точные индикаторы рекламы в заголовке
+    'exact': ['advertisement', 'spotify ad', 'sponsored', 'spotify - advertisement'],
+    # Промо-паттерны, считаются рекламой только без структуры "Артист - Трек"
+    'promo': ['spotify.com', 'upgrade now', 'get premium', 'ad-free music'],
+    # Явные рекламные слова в артисте или треке
+    'explicit': ['advertisement', 'sponsored', 'spotify ad'],
+    # Маленькие окна-попапы
+    'popup': ['ad', 'advertisement', 'premium', 'upgrade'],
+    # Полноэкранные окна
+    'fullscreen': ['advertisement', 'ad'],
+    # Окна, которые закрываются при блокировке
+    'close': ['advertisement', 'spotify ad', 'premium', 'upgrade', 'sponsored'],
+}
+
+# Регулярные выражения (используются как есть)
+AD_PATTERNS: Dict[str, List[str]] = {
+    # Сильные индикаторы рекламы
+    'strong': [
+        r'\b(advertisement|sponsored)\b',
+        r'spotify\s*-\s*advertisement\b',
+        r'\b(upgrade|subscribe)\s*(now|today)\b',
+        r'\b(get|try)\s*premium\b',
+        r'\bad[\s-]?free\s*music\b',
+    ],
+    # Заголовки, содержащие только URL
+    'url': [r'spotify\.com', r'www\.', r'http'],
+    # Призывы к действию
+    'action': [
+        r'\bupgrade\s+to\s+premium\b',
+        r'\bget\s+spotify\s+premium\b',
+        r'\btry\s+premium\s+free\b',
+    ],
+}
+
+# Стандартные заголовки Spotify при паузе или загрузке - это НЕ реклама
+STANDARD_TITLES = frozenset(['spotify', 'spotify free', 'spotify premium'])
+
+
+class TitleVerdict(NamedTuple):
+    """Результат проверки заголовка по всем сигнатурам"""
+    title: str
+    signatures: Tuple[str, ...]  # "группа:индикатор" для каждой совпавшей сигнатуры
+    groups: FrozenSet[str]
+    is_standard: bool
+    has_separator: bool
+
+    def has(self, group: str) -> bool:
+        return group in self.groups
+
+    def in_groups(self, *groups: str) -> Tuple[str, ...]:
+        """Совпавшие сигнатуры только из указанных групп"""
+        return tuple(sig for sig in self.signatures if sig.split(':', 1)[0] in groups)
+
+    def first(self, group: str) -> Optional[str]:
+        """Первая совпавшая сигнатура группы (для логов)"""
+        prefix = group + ':'
+        return next((sig for sig in self.signatures if sig.startswith(prefix)), None)
+
+
+class AdSignatureMatcher:
+    """Одно скомпилированное выражение для всех сигнатур + LRU вердиктов"""
+
+    def __init__(self, keywords: Optional[Dict[str, List[str]]] = None,
+                 patterns: Optional[Dict[str, List[str]]] = None,
+                 cache_size: int = 512):
+        keywords = AD_KEYWORDS if keywords is None else keywords
+        patterns = AD_PATTERNS if patterns is None else patterns
+
+        self.signatures: List[Tuple[str, str]] = []
+        parts = []
+        for group, items in keywords.items():
+            for keyword in items:
+                parts.append(re.escape(keyword))
+                self.signatures.append((group, f"{group}:{keyword}"))
+        for group, items in patterns.items():
+            for pattern in items:
+                parts.append(pattern)
+                self.signatures.append((group, f"{group}:{pattern}"))
+
+        # Каждая сигнатура - необязательный lookahead от начала строки,
+        # поэтому один вызов match() отмечает все совпавшие сигнатуры сразу
+        combined = ''.join(f'(?=.*?(?P<s{i}>{part}))?' for i, part in enumerate(parts))
+        self._regex = re.compile(combined, re.DOTALL)
+
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, title: str) -> TitleVerdict:
+        title_lower = title.lower().strip()
+        found = self._regex.match(title_lower)
+        signatures = []
+        groups = set()
+        for i, (group, name) in enumerate(self.signatures):
+            if found.group(f's{i}') is not None:
+                signatures.append(name)
+                groups.add(group)
+        return TitleVerdict(title, tuple(signatures), frozenset(groups),
+                            title_lower in STANDARD_TITLES, ' - ' in title)
+
+    def cache_info(self):
+        return self.match.cache_info()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Асинхронная буферизованная запись лога ad_blocker.log
+
+Горячий путь (цикл детекции) только кладет запись в очередь. Фоновый
+поток форматирует строки пачками, выводит их в консоль, дописывает в
+постоянно открытый файл и сбрасывает его по интервалу или по размеру
+пачки. Файл ротируется по размеру, чтобы лог не рос бесконечно на
+машинах, работающих неделями.
+"""
+
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List, Tuple
+
+LOG_LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+
+_STOP = object()
+
+
+class AsyncLogWriter:
+    """Очередь записей лога + фоновый писатель с пакетным сбросом и ротацией"""
+
+    def __init__(self, log_file: Path, min_level: str = 'INFO',
+                 flush_interval: float = 0.5, batch_size: int = 200,
+                 max_bytes: int = 5 * 1024 * 1024, backup_count: int = 3,
+                 echo: bool = True, max_queue: int = 10000):
+        self.log_file = Path(log_file)
+        self.min_level = LOG_LEVELS.get(min_level, 20)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.echo = echo
+        self.dropped = 0
+        self.written = 0
+
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_queue)
+        self._file = None
+        self._size = 0
+        self._closed = False
+        # Защищает файл при синхронной записи после close()
+        self._lock = threading.Lock()
+        self._ts_cache: Tuple[int, str] = (-1, '')
+        self._thread = threading.Thread(target=self._run, name='AdBlockerLog', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def enabled(self, level: str) -> bool:
+        return LOG_LEVELS.get(level, 20) >= self.min_level
+
+    def write(self, message: str, level: str = 'INFO', *args):
+        """Поставить запись в очередь (уровень фильтруется до форматирования)
+
+        args подставляются в message %-форматированием уже в фоновом потоке.
+        """
+        if LOG_LEVELS.get(level, 20) < self.min_level:
+            return
+        record = (time.time(), level, message, args)
+        if self._closed:
+            # После остановки писателя пишем синхронно, чтобы не терять сообщения
+            with self._lock:
+                self._write_batch([record])
+                self._close_file()
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _timestamp(self, ts: float) -> str:
+        second = int(ts)
+        if self._ts_cache[0] != second:
+            self._ts_cache = (second, datetime.fromtimestamp(second).strftime('%Y-%m-%d %H:%M:%S'))
+        return self._ts_cache[1]
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.log_file, 'a', encoding='utf-8')
+            try:
+                self._size = self.log_file.stat().st_size
+            except OSError:
+                self._size = 0
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            finally:
+                self._file = None
+
+    def _rotate(self):
+        """ad_blocker.log -> ad_blocker.log.1 -> ... -> ad_blocker.log.N"""
+        self._close_file()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.log_file.with_name(f"{self.log_file.name}.{i}")
+            if src.exists():
+                os.replace(src, self.log_file.with_name(f"{self.log_file.name}.{i + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.log_file, self.log_file.with_name(f"{self.log_file.name}.1"))
+        else:
+            self.log_file.unlink()
+
+    @staticmethod
+    def _format(message: str, args: tuple) -> str:
+        if not args:
+            return message
+        try:
+            return message % args
+        except (TypeError, ValueError):
+            return f"{message} {args!r}"
+
+    def _write_batch(self, records: List[tuple]):
+        lines = ''.join(f"[{self._timestamp(ts)}] [{level}] {self._format(message, args)}\n"
+                        for ts, level, message, args in records)
+        if self.echo:
+            try:
+                sys.stdout.write(lines)
+                sys.stdout.flush()
+            except Exception:
+                pass
+        try:
+            self._open()
+            self._file.write(lines)
+            self._file.flush()
+            self._size += len(lines.encode('utf-8'))
+            self.written += len(records)
+            if self.max_bytes and self._size >= self.max_bytes:
+                self._rotate()
+        except Exception as e:
+            try:
+                sys.stderr.write(f"Ошибка записи лога: {e}\n")
+            except Exception:
+                pass
+            self._close_file()
+
+    def _run(self):
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+
+            if record is _STOP:
+                with self._lock:
+                    if pending:
+                        self._write_batch(pending)
+                    self._close_file()
+                return
+            if record is not None:
+                pending.append(record)
+
+            if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                with self._lock:
+                    self._write_batch(pending)
+                pending = []
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.flush_interval
+
+    def close(self, timeout: float = 2.0):
+        """Дописать очередь и остановить поток (повторный вызов безопасен)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
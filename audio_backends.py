@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Аудио бэкенды и анализ пиковых уровней звука Spotify
+
+Вместо AudioUtilities.GetAllSessions() на каждом тике сессия Spotify
+находится один раз и переиспользуется, пока не изменятся PID процессов
+Spotify. Если сессии нет (Spotify еще ничего не играл), повторный поиск -
+не чаще retry_interval, сразу - только при смене PID. С сессии снимается пиковый уровень (IAudioMeterInformation) в
+небольшой кольцевой буфер, по которому дешево определяются признаки
+рекламной паузы: скачок громкости и тишина на стыке рекламы и трека.
+
+AudioSessionPool обслуживает все экземпляры Spotify (сервер терминалов):
+сессии перебираются одним запросом на тик для всех PID, а экземпляры
+получают счетчики уровня своих процессов.
+
+SyntheticAudioBackend позволяет проверять анализ без Windows.
+"""
+
+import time
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+class AudioBackend:
+    """Интерфейс доступа к аудио сессии Spotify"""
+
+    def bind(self, pids: Iterable[int]) -> bool:
+        """Найти сессию процессов Spotify; True, если сессия есть"""
+        raise NotImplementedError
+
+    def peak(self) -> Optional[float]:
+        """Текущий пиковый уровень 0.0-1.0 или None, если сессии нет"""
+        raise NotImplementedError
+
+
+class PycawAudioBackend(AudioBackend):
+    """Сессия Windows Core Audio через pycaw, кэшируемая по PID Spotify"""
+
+    def __init__(self, audio_utilities, meter_interface=None, retry_interval: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.AudioUtilities = audio_utilities
+        if meter_interface is None:
+            from pycaw.pycaw import IAudioMeterInformation
+            meter_interface = IAudioMeterInformation
+        self.IAudioMeterInformation = meter_interface
+        self.session = None
+        self.meter = None
+        self.session_lookups = 0
+        self.retry_interval = retry_interval
+        self.clock = clock
+        self._pids: frozenset = frozenset()
+        self._retry_at = 0.0
+
+    def _find_session(self):
+        self.session_lookups += 1
+        self.session = None
+        self.meter = None
+        for session in self.AudioUtilities.GetAllSessions():
+            if session.Process and session.Process.pid in self._pids:
+                self.session = session
+                self.meter = session._ctl.QueryInterface(self.IAudioMeterInformation)
+                return
+
+    def bind(self, pids: Iterable[int]) -> bool:
+        pids = frozenset(pids)
+        if pids != self._pids:
+            # Другие процессы Spotify - сессия ищется сразу
+            self._pids = pids
+            self.session = None
+            self.meter = None
+            self._retry_at = 0.0
+        if self.meter is None and pids and self.clock() >= self._retry_at:
+            self._find_session()
+            if self.meter is None:
+                self._retry_at = self.clock() + self.retry_interval
+        return self.meter is not None
+
+    def peak(self) -> Optional[float]:
+        if self.meter is None:
+            return None
+        try:
+            return float(self.meter.GetPeakValue())
+        except Exception:
+            # Сессия закрылась - при следующем bind она будет найдена заново
+            self.session = None
+            self.meter = None
+            self._retry_at = 0.0
+            return None
+
+
+class SyntheticAudioBackend(AudioBackend):
+    """Синтетический уровень звука для тестов и симуляции
+
+    peak_source - функция времени, возвращающая уровень, либо
+    последовательность уровней, выдаваемых по одному на каждый вызов peak().
+    """
+
+    def __init__(self, peak_source, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        if callable(peak_source):
+            self._next = lambda: peak_source(self.clock())
+        else:
+            levels = iter(peak_source)
+            self._next = lambda: next(levels, 0.0)
+        self.bound = False
+        self.bind_calls = 0
+
+    def bind(self, pids: Iterable[int]) -> bool:
+        self.bind_calls += 1
+        self.bound = bool(list(pids))
+        return self.bound
+
+    def peak(self) -> Optional[float]:
+        return self._next() if self.bound else None
+
+
+class AudioSessionPool:
+    """Аудио сессии всех экземпляров Spotify: не больше одного перебора за тик
+
+    enumerate_meters(pids) перебирает сессии один раз и возвращает
+    {PID: функция пикового уровня} для сессий этих процессов. Перебор
+    запускается по запросу экземпляра, у которого нет сессии: сразу для
+    новых PID, для уже искавшихся - не чаще retry_interval.
+    """
+
+    def __init__(self, enumerate_meters: Callable[[Set[int]], Dict[int, Callable[[], float]]],
+                 retry_interval: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.enumerate_meters = enumerate_meters
+        self.retry_interval = retry_interval
+        self.clock = clock
+        self.enumerations = 0
+        self._live: Set[int] = set()
+        self._meters: Dict[int, Callable[[], float]] = {}
+        self._searched: Set[int] = set()
+        self._retry_at = 0.0
+        self._enumerated = False
+
+    def next_tick(self, pids: Iterable[int]):
+        """Начало тика: живые PID всех экземпляров Spotify"""
+        self._live = set(pids)
+        self._searched &= self._live
+        self._meters = {pid: meter for pid, meter in self._meters.items() if pid in self._live}
+        self._enumerated = False
+
+    def meter(self, pids: Iterable[int]) -> Optional[Callable[[], float]]:
+        """Функция пикового уровня сессии этих процессов или None"""
+        pids = set(pids)
+        for pid in pids:
+            if pid in self._meters:
+                return self._meters[pid]
+        if not pids or self._enumerated:
+            return None
+        if pids <= self._searched and self.clock() < self._retry_at:
+            return None
+        self.enumerations += 1
+        self._enumerated = True
+        self._meters = dict(self.enumerate_meters(self._live | pids))
+        self._searched |= self._live | pids
+        self._retry_at = self.clock() + self.retry_interval
+        return next((self._meters[pid] for pid in pids if pid in self._meters), None)
+
+    def forget(self, pids: Iterable[int]):
+        """Сессия закрылась - при следующем запросе искать сразу"""
+        for pid in pids:
+            self._meters.pop(pid, None)
+            self._searched.discard(pid)
+
+
+class PooledAudioBackend(AudioBackend):
+    """Аудио сессия одного экземпляра Spotify из общего AudioSessionPool"""
+
+    def __init__(self, pool: AudioSessionPool):
+        self.pool = pool
+        self._pids: Tuple[int, ...] = ()
+        self._meter: Optional[Callable[[], float]] = None
+
+    def bind(self, pids: Iterable[int]) -> bool:
+        self._pids = tuple(pids)
+        self._meter = self.pool.meter(self._pids)
+        return self._meter is not None
+
+    def peak(self) -> Optional[float]:
+        if self._meter is None:
+            return None
+        try:
+            return float(self._meter())
+        except Exception:
+            self.pool.forget(self._pids)
+            self._meter = None
+            return None
+
+
+class AudioPeakMonitor:
+    """Кольцевой буфер пиковых уровней и признаки рекламной паузы"""
+
+    def __init__(self, backend: AudioBackend, size: int = 64,
+                 silence_level: float = 0.02, min_silence: float = 0.3,
+                 jump_ratio: float = 2.0, window: float = 3.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.backend = backend
+        self.samples: deque = deque(maxlen=size)
+        self.silence_level = silence_level
+        self.min_silence = min_silence
+        self.jump_ratio = jump_ratio
+        self.window = window
+        self.clock = clock
+        self._pids: frozenset = frozenset()
+
+    def sample(self, pids: Iterable[int], now: Optional[float] = None) -> Optional[float]:
+        """Снять пиковый уровень и положить его в буфер"""
+        pids = frozenset(pids)
+        if pids != self._pids:
+            # Другой процесс Spotify - старая история уровней не относится к нему
+            self._pids = pids
+            self.samples.clear()
+        if not self.backend.bind(pids):
+            return None
+        level = self.backend.peak()
+        if level is not None:
+            self.samples.append((self.clock() if now is None else now, level))
+        return level
+
+    def push(self, level: float, now: Optional[float] = None):
+        """Добавить уже измеренный уровень (воспроизведение трассы)"""
+        self.samples.append((self.clock() if now is None else now, level))
+
+    def _split(self, now: float) -> Tuple[List[Tuple[float, float]], List[Tuple[float, float]]]:
+        cutoff = now - self.window
+        recent = [s for s in self.samples if s[0] >= cutoff]
+        older = [s for s in self.samples if s[0] < cutoff]
+        return older, recent
+
+    @staticmethod
+    def _mean(samples: Sequence[Tuple[float, float]]) -> float:
+        return sum(level for _, level in samples) / len(samples)
+
+    def loudness_jump(self, now: Optional[float] = None) -> bool:
+        """Средний уровень за последнее окно резко выше предыдущего"""
+        older, recent = self._split(self.clock() if now is None else now)
+        if not older or not recent:
+            return False
+        before = self._mean(older)
+        if before <= self.silence_level:
+            # После тишины любой звук - это скачок, это ловит silence_gap
+            return False
+        return self._mean(recent) / before >= self.jump_ratio
+
+    def silence_gap(self, now: Optional[float] = None) -> bool:
+        """В последнем окне был участок тишины, после которого снова пошел звук"""
+        _, recent = self._split(self.clock() if now is None else now)
+        silence_start = None
+        for ts, level in recent:
+            if level <= self.silence_level:
+                if silence_start is None:
+                    silence_start = ts
+            elif silence_start is not None:
+                if ts - silence_start >= self.min_silence:
+                    return True
+                silence_start = None
+        return False
+
+    def ad_like(self, now: Optional[float] = None) -> bool:
+        now = self.clock() if now is None else now
+        return self.loudness_jump(now) or self.silence_gap(now)
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Внешние списки блокировки: потоковый разбор и компактный индекс на диске
+
+Поддерживаемые форматы (определяются построчно, можно смешивать):
+    0.0.0.0 ads.example.com tracker.example.com   - hosts
+    ads.example.com                               - список доменов
+    ||example.com^                                - ABP/AdGuard (домен и поддомены)
+
+Файл читается построчно, текст целиком в память не загружается. Каждый
+источник компилируется в свой индекс: отсортированные без повторов
+ключи с метками в обратном порядке (com.example.ads) и флагами правила.
+Индекс открывается через mmap, поиск - двоичный поиск по ключу и его
+родительским доменам, так что при старте текст не разбирается заново, а
+сотни тысяч правил не превращаются в объекты Python. Источник
+перекомпилируется, только если изменилась его версия (ETag из файла
+<источник>.etag, если он есть, иначе mtime и размер).
+"""
+
+import os
+import sys
+import json
+import mmap
+import heapq
+import shutil
+import struct
+import hashlib
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from domain_blocklist import DomainBlocklist, normalize_entry, RULE_SUFFIX, RULE_WILDCARD
+
+INDEX_MAGIC = b'SABIDX01'
+_HEADER = struct.Struct('<8sII')  # magic, число записей, резерв
+# Запись промежуточного отсортированного куска: длина ключа, флаги, ключ
+_RUN_RECORD = struct.Struct('<HB')
+# Ключей в памяти при сортировке индекса; больше - сортировка кусками через диск
+INDEX_CHUNK_KEYS = 200_000
+
+# Флаги записи индекса
+FLAG_EXACT = 1    # заблокировано само имя
+FLAG_SUBTREE = 2  # заблокированы все поддомены
+
+# Имена из hosts-файлов, которые не являются рекламой
+_HOSTS_IGNORED = frozenset(['localhost', 'localhost.localdomain', 'local', 'broadcasthost',
+                            'ip6-localhost', 'ip6-loopback', '0.0.0.0', '127.0.0.1'])
+_HOSTS_ADDRESSES = frozenset(['0.0.0.0', '127.0.0.1', '::', '::1', '::0'])
+
+
+def parse_line(line: str) -> List[str]:
+    """Правила (в синтаксисе DomainBlocklist) из одной строки списка"""
+    line = line.strip()
+    if not line or line[0] in '#![':
+        return []
+    if line.startswith('@@'):
+        # Исключения ABP не поддерживаются - правило просто не добавляется
+        return []
+    if line.startswith('||'):
+        rule = line[2:]
+        if '$' in rule:
+            # Правила с опциями ($third-party, $domain=...) относятся к страницам, а не к DNS
+            return []
+        if rule.endswith('^'):
+            rule = rule[:-1]
+        if not rule or '^' in rule or '/' in rule:
+            return []
+        return ['.' + rule]
+
+    line = line.split('#', 1)[0]
+    fields = line.split()
+    if not fields:
+        return []
+    if fields[0] in _HOSTS_ADDRESSES:
+        return [name for name in fields[1:] if name.lower() not in _HOSTS_IGNORED]
+    if len(fields) == 1 and fields[0].lower() not in _HOSTS_IGNORED:
+        return [fields[0]]
+    return []
+
+
+def iter_entries(path: Path) -> Iterator[str]:
+    """Потоковое чтение правил из файла списка"""
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            yield from parse_line(line)
+
+
+def _reversed_key(name: str) -> bytes:
+    return '.'.join(reversed(name.split('.'))).encode('ascii')
+
+
+def _write_run(chunk: Dict[bytes, int]):
+    """Отсортированный кусок ключей во временный файл (удаляется при закрытии)"""
+    run = tempfile.TemporaryFile()
+    for key in sorted(chunk):
+        run.write(_RUN_RECORD.pack(len(key), chunk[key]))
+        run.write(key)
+    run.seek(0)
+    return run
+
+
+def _read_run(run) -> Iterator[Tuple[bytes, int]]:
+    while True:
+        head = run.read(_RUN_RECORD.size)
+        if not head:
+            return
+        length, flags = _RUN_RECORD.unpack(head)
+        yield run.read(length), flags
+
+
+def _merge_flags(records: Iterable[Tuple[bytes, int]]) -> Iterator[Tuple[bytes, int]]:
+    """Соседние записи с одним ключом (из разных кусков) - одна запись"""
+    current, merged = None, 0
+    for key, flags in records:
+        if key == current:
+            merged |= flags
+            continue
+        if current is not None:
+            yield current, merged
+        current, merged = key, flags
+    if current is not None:
+        yield current, merged
+
+
+def write_index(path: Path, records: Iterable[Tuple[bytes, int]],
+                chunk_keys: int = INDEX_CHUNK_KEYS) -> int:
+    """Записать индекс из (ключ, флаги); ключи сортируются, флаги повторов объединяются
+
+    В памяти держится не больше chunk_keys ключей: куски сортируются и
+    сбрасываются во временные файлы, затем сливаются (внешняя сортировка).
+    Записи индекса во время слияния тоже идут во временный файл, в памяти
+    остается только таблица смещений - по 4 байта на ключ.
+    """
+    runs = []
+    chunk: Dict[bytes, int] = {}
+    try:
+        for key, flags in records:
+            chunk[key] = chunk.get(key, 0) | flags
+            if len(chunk) >= chunk_keys:
+                runs.append(_write_run(chunk))
+                chunk = {}
+        if runs:
+            if chunk:
+                runs.append(_write_run(chunk))
+                chunk = {}
+            ordered = _merge_flags(heapq.merge(*(_read_run(run) for run in runs)))
+        else:
+            ordered = ((key, chunk[key]) for key in sorted(chunk))
+
+        offsets = array('I', [0])
+        with tempfile.TemporaryFile() as data:
+            for key, flags in ordered:
+                data.write(key)
+                data.write(bytes((flags,)))
+                offsets.append(offsets[-1] + len(key) + 1)
+            count = len(offsets) - 1
+            if sys.byteorder != 'little':
+                offsets.byteswap()
+
+            tmp_path = Path(str(path) + '.tmp')
+            with open(tmp_path, 'wb') as f:
+                f.write(_HEADER.pack(INDEX_MAGIC, count, 0))
+                offsets.tofile(f)
+                data.seek(0)
+                shutil.copyfileobj(data, f)
+        os.replace(tmp_path, path)
+    finally:
+        for run in runs:
+            run.close()
+    return count
+
+
+class BlocklistIndex:
+    """Индекс одного источника, открытый через mmap (только чтение)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.closed = False
+        with open(self.path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, _ = _HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"не индекс списка блокировки: {self.path}")
+        self._data = _HEADER.size + (self.count + 1) * 4
+        # Таблица смещений без копирования; на little-endian платформах (x86, ARM)
+        # cast('I') совпадает с форматом файла
+        self._offsets = memoryview(self._mmap)[_HEADER.size:self._data].cast('I')
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _record(self, i: int) -> Tuple[bytes, int]:
+        record = self._mmap[self._data + self._offsets[i]:self._data + self._offsets[i + 1]]
+        return record[:-1], record[-1]
+
+    def flags(self, key: bytes) -> int:
+        """Флаги записи с ключом или 0"""
+        mm, offsets, data = self._mmap, self._offsets, self._data
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data + offsets[mid]
+            mid_key = mm[start:data + offsets[mid + 1] - 1]
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                return mm[start + len(key)]
+        return 0
+
+    def is_blocked(self, host: str) -> bool:
+        labels = host.strip().lower().rstrip('.').split('.')
+        labels.reverse()
+        try:
+            for depth in range(1, len(labels) + 1):
+                flags = self.flags('.'.join(labels[:depth]).encode('ascii', 'replace'))
+                if depth == len(labels) and flags & FLAG_EXACT:
+                    return True
+                if depth < len(labels) and flags & FLAG_SUBTREE:
+                    return True
+        except ValueError:
+            # Индекс закрыт при перезагрузке во время поиска - уже действует новый набор
+            if not self.closed:
+                raise
+        return False
+
+    def iter_names(self, flag: int = FLAG_EXACT) -> Iterator[str]:
+        """Имена записей с флагом (для hosts-файла), в порядке индекса"""
+        for i in range(self.count):
+            try:
+                key, flags = self._record(i)
+            except ValueError:
+                if not self.closed:
+                    raise
+                return
+            if flags & flag:
+                yield '.'.join(reversed(key.decode('ascii').split('.')))
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._offsets.release()
+        self._mmap.close()
+
+
+def compile_source(source: Path, index_path: Path) -> Dict:
+    """Разобрать источник и записать его индекс; шаблоны возвращаются отдельно"""
+    stats = {'rules': 0, 'skipped': 0, 'globs': []}
+
+    def records():
+        for entry in iter_entries(source):
+            rule = normalize_entry(entry)
+            if rule is None:
+                stats['skipped'] += 1
+                continue
+            name, kind = rule
+            if kind == RULE_WILDCARD:
+                if name.startswith('*.') and '*' not in name[2:]:
+                    yield _reversed_key(name[2:]), FLAG_SUBTREE
+                else:
+                    # Шаблоны внутри метки редки - они остаются в памяти
+                    stats['globs'].append(name)
+                continue
+            flags = FLAG_EXACT | (FLAG_SUBTREE if kind == RULE_SUFFIX else 0)
+            yield _reversed_key(name), flags
+
+    stats['rules'] = write_index(index_path, records())
+    return stats
+
+
+def source_version(source: Path) -> str:
+    """Версия источника: ETag из соседнего файла .etag или mtime и размер"""
+    etag_file = Path(str(source) + '.etag')
+    if etag_file.exists():
+        return 'etag:' + etag_file.read_text(encoding='utf-8').strip()
+    stat = source.stat()
+    return f"mtime:{stat.st_mtime_ns}:{stat.st_size}"
+
+
+class ExternalBlocklists:
+    """Набор внешних списков с индексами в cache_dir и инкрементальной перезагрузкой"""
+
+    def __init__(self, sources: Iterable[Path], cache_dir: Path,
+                 log: Optional[Callable[..., None]] = None):
+        self.sources = [Path(source) for source in sources]
+        self.cache_dir = Path(cache_dir)
+        self.manifest_file = self.cache_dir / 'manifest.json'
+        self.log = log
+        self.indexes: Dict[str, BlocklistIndex] = {}
+        self.globs = DomainBlocklist()
+        # Файлы индексов, которые не удалось удалить: повтор при следующей перезагрузке
+        self.orphans: List[str] = []
+        self._lock = threading.Lock()
+
+    def _log(self, message: str, level: str = 'INFO'):
+        if self.log:
+            self.log(message, level)
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def reload(self) -> bool:
+        """Перекомпилировать изменившиеся источники; True, если что-то изменилось"""
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            manifest = self._load_manifest()
+            new_manifest = {}
+            indexes: Dict[str, BlocklistIndex] = {}
+            changed = set(self.indexes) - {str(source) for source in self.sources}
+
+            for source in self.sources:
+                key = str(source)
+                try:
+                    version = source_version(source)
+                except OSError as e:
+                    self._log(f"Список блокировки недоступен: {source}: {e}", "WARNING")
+                    continue
+                entry = manifest.get(key)
+                index_name = (hashlib.sha1(key.encode('utf-8')).hexdigest()[:12] + '-'
+                              + hashlib.sha1(version.encode('utf-8')).hexdigest()[:8] + '.idx')
+                index_path = self.cache_dir / index_name
+                if not entry or entry.get('version') != version or not index_path.exists():
+                    try:
+                        stats = compile_source(source, index_path)
+                    except (OSError, UnicodeError) as e:
+                        self._log(f"Не удалось разобрать список {source}: {e}", "WARNING")
+                        continue
+                    entry = {'version': version, 'index': index_name, 'rules': stats['rules'],
+                             'skipped': stats['skipped'], 'globs': stats['globs']}
+                    self._log(f"Список {source.name}: {stats['rules']} правил, пропущено {stats['skipped']}")
+                    changed.add(key)
+                elif key in self.indexes and self.indexes[key].path == index_path:
+                    indexes[key] = self.indexes[key]
+                    new_manifest[key] = entry
+                    continue
+                else:
+                    changed.add(key)
+                try:
+                    indexes[key] = BlocklistIndex(index_path)
+                    new_manifest[key] = entry
+                except (OSError, ValueError) as e:
+                    self._log(f"Индекс списка {source} поврежден: {e}", "WARNING")
+
+            if changed:
+                globs = DomainBlocklist()
+                for entry in new_manifest.values():
+                    globs.extend(entry.get('globs', []))
+                # Замена целиком: поиск из других потоков видит либо старый, либо новый набор
+                retired = [index for key, index in self.indexes.items() if indexes.get(key) is not index]
+                self.indexes, self.globs = indexes, globs
+                tmp_file = Path(str(self.manifest_file) + '.tmp')
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(new_manifest, f, ensure_ascii=False)
+                os.replace(tmp_file, self.manifest_file)
+                # mmap старых индексов закрывается, иначе на Windows их файлы не удалить
+                for index in retired:
+                    index.close()
+            if changed or self.orphans:
+                self._remove_unreferenced({entry['index'] for entry in new_manifest.values()})
+            return bool(changed)
+
+    def _remove_unreferenced(self, referenced: Set[str]):
+        """Удалить файлы индексов, на которые не ссылается манифест"""
+        orphans = []
+        for path in self.cache_dir.glob('*.idx'):
+            if path.name in referenced:
+                continue
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # Файл еще открыт (например, другим процессом) - повтор при следующей перезагрузке
+                orphans.append(path.name)
+                self._log(f"Не удалось удалить старый индекс {path.name}: {e}", "DEBUG")
+        self.orphans = orphans
+
+    def is_blocked(self, host: str) -> bool:
+        if len(self.globs) and self.globs.is_blocked(host):
+            return True
+        return any(index.is_blocked(host) for index in self.indexes.values())
+
+    def __len__(self) -> int:
+        return sum(len(index) for index in self.indexes.values()) + len(self.globs)
+
+    def iter_hosts_domains(self) -> Iterator[str]:
+        """Имена для hosts-файла из всех источников (возможны повторы между источниками)"""
+        for index in list(self.indexes.values()):
+            yield from index.iter_names(FLAG_EXACT)
+
+
+class CombinedBlocklist:
+    """Встроенный список плюс внешние: общий is_blocked для DNS-фильтра"""
+
+    def __init__(self, builtin: DomainBlocklist, external: Optional[ExternalBlocklists] = None):
+        self.builtin = builtin
+        self.external = external
+
+    def is_blocked(self, host: str) -> bool:
+        if self.builtin.is_blocked(host):
+            return True
+        return self.external is not None and self.external.is_blocked(host)
+
+    __contains__ = is_blocked
+
+    def __len__(self) -> int:
+        return len(self.builtin) + (len(self.external) if self.external is not None else 0)
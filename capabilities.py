@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Реестр платформенных возможностей
+
+Модули Windows (pywin32, pycaw) импортируются один раз при старте, а не
+внутри методов на каждом тике. Результат проверки запоминается: если
+модуля нет, об этом пишется одна строка в лог, а зависящие от него
+детекторы и действия отключаются навсегда и больше ничего не стоят.
+"""
+
+import importlib
+from types import ModuleType
+from typing import Callable, Dict, Optional, Tuple
+
+# Имя возможности -> (импортируемый модуль, пакет для pip install)
+PLATFORM_MODULES: Dict[str, Tuple[str, str]] = {
+    'win32gui': ('win32gui', 'pywin32'),
+    'win32con': ('win32con', 'pywin32'),
+    'win32api': ('win32api', 'pywin32'),
+    'win32process': ('win32process', 'pywin32'),
+    'pycaw': ('pycaw.pycaw', 'pycaw'),
+    'pythoncom': ('pythoncom', 'pywin32'),
+    'win32com': ('win32com.client', 'pywin32'),
+    'win32ts': ('win32ts', 'pywin32'),
+}
+
+# Функциональные возможности -> необходимые модули
+PLATFORM_FEATURES: Dict[str, Tuple[str, ...]] = {
+    # Перечисление окон и чтение заголовков
+    'windows': ('win32gui', 'win32con'),
+    # Эмуляция нажатий клавиш
+    'keyboard': ('win32gui', 'win32api', 'win32con'),
+    # Аудио сессии Windows
+    'audio': ('pycaw',),
+    # Уведомления WMI о запуске процессов
+    'process_events': ('pythoncom', 'win32com'),
+    # Сессии служб терминалов (ID сессии процесса)
+    'sessions': ('win32ts',),
+}
+
+
+class PlatformCapabilities:
+    """Результаты однократной проверки платформенных модулей"""
+
+    def __init__(self, log: Optional[Callable[..., None]] = None,
+                 modules: Optional[Dict[str, Tuple[str, str]]] = None):
+        self.log = log
+        self.modules: Dict[str, Optional[ModuleType]] = {}
+        for name, (module_name, package) in (modules or PLATFORM_MODULES).items():
+            self.modules[name] = self._probe(name, module_name, package)
+
+        # Привязанные ссылки для горячего пути (None, если модуль недоступен)
+        self.win32gui = self.modules.get('win32gui')
+        self.win32con = self.modules.get('win32con')
+        self.win32api = self.modules.get('win32api')
+        self.win32process = self.modules.get('win32process')
+        self.win32ts = self.modules.get('win32ts')
+        pycaw = self.modules.get('pycaw')
+        self.AudioUtilities = getattr(pycaw, 'AudioUtilities', None)
+        self.IAudioMeterInformation = getattr(pycaw, 'IAudioMeterInformation', None)
+
+    def _probe(self, name: str, module_name: str, package: str) -> Optional[ModuleType]:
+        try:
+            return importlib.import_module(module_name)
+        except ImportError:
+            if self.log:
+                self.log(f"Модуль {name} не найден (pip install {package}), зависящие от него функции отключены", "WARNING")
+        except Exception as e:
+            if self.log:
+                self.log(f"Модуль {name} не загружен: {e}", "WARNING")
+        return None
+
+    def has(self, feature: str) -> bool:
+        """Доступна ли функциональная возможность (или отдельный модуль)"""
+        required = PLATFORM_FEATURES.get(feature, (feature,))
+        return all(self.modules.get(name) is not None for name in required)
+
+    def summary(self) -> Dict[str, bool]:
+        return {feature: self.has(feature) for feature in PLATFORM_FEATURES}
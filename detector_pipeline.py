@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Конвейер детекторов рекламы с ранней остановкой
+
+Каждый детектор регистрируется с оценкой стоимости. Вычислитель
+запускает их от дешевых к дорогим и останавливается, как только правило
+принятия решения уже не может измениться, какими бы ни были результаты
+оставшихся детекторов. Например, если заголовок окна не похож на рекламу,
+дорогие проверки аудио сессии и процессов не запускаются вовсе.
+"""
+
+import time
+from itertools import product
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class Detector(NamedTuple):
+    """Зарегистрированный детектор"""
+    name: str
+    check: Callable[..., bool]
+    cost: float
+
+
+class DetectorPipeline:
+    """Реестр детекторов и вычислитель правила в порядке стоимости
+
+    decision_rule получает словарь {имя детектора: bool} со всеми
+    детекторами и возвращает итоговое решение. Для частично известных
+    результатов определенность правила проверяется перебором значений
+    неизвестных детекторов; ответ кэшируется по набору известных
+    результатов, поэтому на горячем пути это один поиск в словаре.
+    """
+
+    def __init__(self, decision_rule: Callable[[Dict[str, bool]], bool]):
+        self.decision_rule = decision_rule
+        self.detectors: List[Detector] = []
+        self.run_counts: Dict[str, int] = {}
+        # Наблюдатель времени работы детекторов: callback(имя, секунды)
+        self.on_timing: Optional[Callable[[str, float], None]] = None
+        self._outcomes: Dict[Tuple[Tuple[str, bool], ...], Optional[bool]] = {}
+
+    def register(self, name: str, check: Callable[..., bool], cost: float = 1.0):
+        """Добавить детектор; порядок запуска определяется стоимостью"""
+        self.detectors.append(Detector(name, check, cost))
+        self.detectors.sort(key=lambda detector: detector.cost)
+        self.run_counts.setdefault(name, 0)
+        self._outcomes.clear()
+
+    def unregister(self, name: str):
+        """Убрать детектор (например, если его зависимости недоступны)"""
+        self.detectors = [d for d in self.detectors if d.name != name]
+        self._outcomes.clear()
+
+    def outcome(self, known: Dict[str, bool]) -> Optional[bool]:
+        """Решение правила, если оно уже определено, иначе None"""
+        key = tuple(sorted(known.items()))
+        if key in self._outcomes:
+            return self._outcomes[key]
+
+        unknown = [d.name for d in self.detectors if d.name not in known]
+        results = set()
+        for values in product((False, True), repeat=len(unknown)):
+            full = dict(known)
+            full.update(zip(unknown, values))
+            results.add(bool(self.decision_rule(full)))
+            if len(results) > 1:
+                break
+        decided = results.pop() if len(results) == 1 else None
+        self._outcomes[key] = decided
+        return decided
+
+    def evaluate(self, *args) -> Tuple[bool, Dict[str, bool]]:
+        """Запустить детекторы от дешевых к дорогим до определенности решения
+
+        Возвращает решение и результаты только тех детекторов, что
+        действительно запускались.
+        """
+        known: Dict[str, bool] = {}
+        decided = self.outcome(known)
+        for detector in self.detectors:
+            if decided is not None:
+                break
+            if self.on_timing is not None:
+                started = time.perf_counter()
+                known[detector.name] = bool(detector.check(*args))
+                self.on_timing(detector.name, time.perf_counter() - started)
+            else:
+                known[detector.name] = bool(detector.check(*args))
+            self.run_counts[detector.name] += 1
+            decided = self.outcome(known)
+        return bool(decided), known
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный DNS-фильтр (sinkhole) на основе списка рекламных доменов
+
+Легкий DNS-сервер на asyncio (UDP и TCP) на localhost. Имена из
+DomainBlocklist получают NXDOMAIN (или 0.0.0.0 / :: в режиме 'null'),
+остальные запросы пересылаются вышестоящему серверу. Ответы кэшируются
+с учетом TTL: при выдаче из кэша TTL каждой записи уменьшается на
+прошедшее время, а запись удаляется, когда TTL истек. Заблокированные и
+закэшированные имена отвечаются без сетевых обращений.
+
+Сервер живет в отдельном потоке со своим циклом событий, поэтому его
+можно запускать из синхронного кода блокировщика:
+
+    sinkhole = DnsSinkhole(default_blocklist(), listen=('127.0.0.1', 53))
+    sinkhole.start()
+    ...
+    sinkhole.stop()
+
+Чтобы фильтр работал, 127.0.0.1 нужно указать DNS-сервером системы.
+"""
+
+import time
+import socket
+import struct
+import asyncio
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+# Константы DNS
+QTYPE_A = 1
+QTYPE_AAAA = 28
+QTYPE_SOA = 6
+QTYPE_OPT = 41
+QCLASS_IN = 1
+RCODE_NOERROR = 0
+RCODE_FORMERR = 1
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+FLAG_QR = 0x8000
+FLAG_TC = 0x0200
+FLAG_RD = 0x0100
+FLAG_RA = 0x0080
+
+MODE_NXDOMAIN = 'nxdomain'
+MODE_NULL = 'null'
+
+
+class DnsQuestion(NamedTuple):
+    """Вопрос DNS-запроса"""
+    qid: int
+    flags: int
+    name: str
+    qtype: int
+    qclass: int
+    end: int  # смещение конца секции вопроса
+
+
+def parse_query(data: bytes) -> DnsQuestion:
+    """Разбор заголовка и единственного вопроса запроса (ValueError - неверный формат)"""
+    question = _parse_question(data)
+    if question.flags & FLAG_QR:
+        raise ValueError("не запрос")
+    return question
+
+
+def parse_reply_question(data: bytes) -> Tuple[str, int, int]:
+    """(имя, тип, класс) вопроса, повторенного в ответе (ValueError - неверный формат)"""
+    question = _parse_question(data)
+    if not question.flags & FLAG_QR:
+        raise ValueError("не ответ")
+    return question.name, question.qtype, question.qclass
+
+
+def _parse_question(data: bytes) -> DnsQuestion:
+    if len(data) < 12:
+        raise ValueError("короткий пакет")
+    qid, flags, qdcount = struct.unpack('!3H', data[:6])
+    if qdcount != 1:
+        raise ValueError("не один вопрос")
+    labels = []
+    pos = 12
+    while True:
+        if pos >= len(data):
+            raise ValueError("обрезанное имя")
+        length = data[pos]
+        pos += 1
+        if length == 0:
+            break
+        if length & 0xC0 or pos + length > len(data):
+            raise ValueError("неверная метка")
+        labels.append(data[pos:pos + length].decode('ascii', 'replace'))
+        pos += length
+    if pos + 4 > len(data):
+        raise ValueError("обрезанный вопрос")
+    qtype, qclass = struct.unpack('!HH', data[pos:pos + 4])
+    return DnsQuestion(qid, flags, '.'.join(labels).lower(), qtype, qclass, pos + 4)
+
+
+def build_response(query: bytes, question: DnsQuestion, rcode: int,
+                   answers: bytes = b'', ancount: int = 0) -> bytes:
+    """Ответ на запрос: копия вопроса, заданный rcode и записи ответа"""
+    flags = FLAG_QR | (question.flags & 0x7900) | FLAG_RA | rcode
+    header = struct.pack('!6H', question.qid, flags, 1, ancount, 0, 0)
+    return header + query[12:question.end] + answers
+
+
+def _skip_name(data: bytes, pos: int) -> int:
+    while True:
+        length = data[pos]
+        if length == 0:
+            return pos + 1
+        if length & 0xC0 == 0xC0:
+            return pos + 2
+        pos += length + 1
+
+
+def ttl_offsets(response: bytes) -> List[Tuple[int, int]]:
+    """(смещение, TTL) всех записей ответа, кроме OPT"""
+    qdcount, ancount, nscount, arcount = struct.unpack('!4H', response[4:12])
+    pos = 12
+    for _ in range(qdcount):
+        pos = _skip_name(response, pos) + 4
+    offsets = []
+    for _ in range(ancount + nscount + arcount):
+        pos = _skip_name(response, pos)
+        rtype, _, ttl, rdlength = struct.unpack('!HHIH', response[pos:pos + 10])
+        if rtype != QTYPE_OPT:
+            offsets.append((pos + 4, ttl))
+        pos += 10 + rdlength
+    return offsets
+
+
+class _CacheEntry(NamedTuple):
+    response: bytes
+    stored: float
+    expires: float
+    offsets: List[Tuple[int, int]]
+
+
+class DnsCache:
+    """LRU-кэш ответов с учетом TTL"""
+
+    def __init__(self, max_entries: int = 10000, max_ttl: int = 3600,
+                 negative_ttl: int = 60, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._entries: 'OrderedDict[Tuple[str, int, int], _CacheEntry]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, key: Tuple[str, int, int], response: bytes):
+        flags = struct.unpack('!H', response[2:4])[0]
+        rcode = flags & 0x000F
+        if flags & FLAG_TC or rcode not in (RCODE_NOERROR, RCODE_NXDOMAIN):
+            return
+        try:
+            offsets = ttl_offsets(response)
+        except (IndexError, struct.error):
+            return
+        ttl = min((ttl for _, ttl in offsets), default=self.negative_ttl)
+        ttl = min(ttl, self.max_ttl)
+        if ttl <= 0:
+            return
+        now = self.clock()
+        self._entries[key] = _CacheEntry(response, now, now + ttl, offsets)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: Tuple[str, int, int], qid: int) -> Optional[bytes]:
+        """Ответ из кэша с id запроса и уменьшенными TTL или None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = self.clock()
+        if now >= entry.expires:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        elapsed = int(now - entry.stored)
+        data = bytearray(entry.response)
+        struct.pack_into('!H', data, 0, qid)
+        for offset, ttl in entry.offsets:
+            struct.pack_into('!I', data, offset, max(ttl - elapsed, 0))
+        return bytes(data)
+
+
+class _UpstreamProtocol(asyncio.DatagramProtocol):
+    def __init__(self, sinkhole: 'DnsSinkhole'):
+        self.sinkhole = sinkhole
+
+    def datagram_received(self, data, addr):
+        # Ответ принимается только от вышестоящего сервера, с ожидаемым id
+        # и тем же вопросом: подделка не попадет ни клиенту, ни в кэш
+        sinkhole = self.sinkhole
+        if len(data) < 12 or tuple(addr[:2]) != sinkhole._upstream_addr[:2]:
+            sinkhole.counters['upstream_rejected'] += 1
+            return
+        upstream_id = struct.unpack('!H', data[:2])[0]
+        pending = sinkhole._pending.get(upstream_id)
+        if pending is None:
+            sinkhole.counters['upstream_rejected'] += 1
+            return
+        key, future = pending
+        try:
+            matches = parse_reply_question(data) == key
+        except ValueError:
+            matches = False
+        if not matches:
+            sinkhole.counters['upstream_rejected'] += 1
+            return
+        del sinkhole._pending[upstream_id]
+        if not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+
+class _ServerProtocol(asyncio.DatagramProtocol):
+    def __init__(self, sinkhole: 'DnsSinkhole'):
+        self.sinkhole = sinkhole
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.sinkhole._spawn(self._answer(data, addr))
+
+    async def _answer(self, data, addr):
+        response = await self.sinkhole.resolve(data)
+        if response is not None:
+            self.transport.sendto(response, addr)
+
+
+class DnsSinkhole:
+    """DNS-сервер на localhost: блокировка по списку, пересылка, кэш"""
+
+    def __init__(self, blocklist, listen: Tuple[str, int] = ('127.0.0.1', 53),
+                 upstream: Tuple[str, int] = ('1.1.1.1', 53), mode: str = MODE_NXDOMAIN,
+                 timeout: float = 2.0, blocked_ttl: int = 300,
+                 cache: Optional[DnsCache] = None,
+                 log: Optional[Callable[..., None]] = None,
+                 on_timing: Optional[Callable[[str, float], None]] = None):
+        if mode not in (MODE_NXDOMAIN, MODE_NULL):
+            raise ValueError(f"неизвестный режим: {mode}")
+        self.blocklist = blocklist
+        self.listen = listen
+        self.upstream = upstream
+        self.mode = mode
+        self.timeout = timeout
+        self.blocked_ttl = blocked_ttl
+        self.cache = cache if cache is not None else DnsCache()
+        self.log = log
+        # Наблюдатель времени ответа: callback(вид ответа, секунды)
+        self.on_timing = on_timing
+        self.counters: Dict[str, int] = {
+            'queries': 0, 'blocked': 0, 'cache_hits': 0, 'forwarded': 0,
+            'upstream_errors': 0, 'upstream_rejected': 0, 'malformed': 0, 'tcp_queries': 0,
+        }
+        self.port: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._error: Optional[BaseException] = None
+        # id запроса к вышестоящему серверу -> (ключ вопроса, future ответа)
+        self._pending: Dict[int, Tuple[Tuple[str, int, int], asyncio.Future]] = {}
+        self._upstream_transport = None
+        # Задачи ответов UDP: ссылки держатся до завершения, иначе их соберет GC
+        self._tasks: Set[asyncio.Future] = set()
+        # Адрес вышестоящего сервера после getaddrinfo (имя и IPv6 в любой записи)
+        self._upstream_family = socket.AF_INET
+        self._upstream_addr: Tuple = tuple(upstream)
+
+    # --- разрешение имен ---
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Future):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and self.log:
+            self.log(f"DNS: ошибка обработки запроса: {error!r}", "ERROR")
+
+    def _blocked_response(self, query: bytes, question: DnsQuestion) -> bytes:
+        if self.mode == MODE_NXDOMAIN:
+            return build_response(query, question, RCODE_NXDOMAIN)
+        if question.qtype == QTYPE_A:
+            rdata = bytes(4)
+        elif question.qtype == QTYPE_AAAA:
+            rdata = bytes(16)
+        else:
+            # Другие типы - пустой ответ без ошибки
+            return build_response(query, question, RCODE_NOERROR)
+        answer = struct.pack('!HHHIH', 0xC00C, question.qtype, QCLASS_IN,
+                             self.blocked_ttl, len(rdata)) + rdata
+        return build_response(query, question, RCODE_NOERROR, answer, 1)
+
+    def _timing(self, kind: str, started: float):
+        if self.on_timing is not None:
+            self.on_timing(kind, time.perf_counter() - started)
+
+    async def resolve(self, query: bytes) -> Optional[bytes]:
+        """Ответ на один запрос (None - пакет не является DNS-запросом)"""
+        started = time.perf_counter()
+        self.counters['queries'] += 1
+        try:
+            question = parse_query(query)
+        except ValueError:
+            self.counters['malformed'] += 1
+            if len(query) < 12:
+                return None
+            qid, flags = struct.unpack('!HH', query[:4])
+            return struct.pack('!6H', qid, FLAG_QR | (flags & 0x7900) | RCODE_FORMERR, 0, 0, 0, 0)
+
+        if self.blocklist.is_blocked(question.name):
+            self.counters['blocked'] += 1
+            response = self._blocked_response(query, question)
+            self._timing('blocked', started)
+            return response
+
+        key = (question.name, question.qtype, question.qclass)
+        cached = self.cache.get(key, question.qid)
+        if cached is not None:
+            self.counters['cache_hits'] += 1
+            self._timing('cached', started)
+            return cached
+
+        try:
+            response = await self._forward(query, key)
+        except (asyncio.TimeoutError, OSError, EOFError, ValueError) as e:
+            # EOFError - TCP-соединение закрыто до конца ответа (IncompleteReadError),
+            # ValueError - ответ по TCP не разбирается или не на этот вопрос
+            self.counters['upstream_errors'] += 1
+            if self.log:
+                self.log("DNS: нет ответа от %s для %s: %r", "DEBUG", self.upstream[0], question.name, e)
+            return build_response(query, question, RCODE_SERVFAIL)
+        self.counters['forwarded'] += 1
+        self.cache.put(key, response)
+        self._timing('forwarded', started)
+        return response
+
+    async def _forward(self, query: bytes, key: Tuple[str, int, int]) -> bytes:
+        """Пересылка по UDP (по TCP, если ответ обрезан)"""
+        original_id = query[:2]
+        # Собственный случайный id: ответы разных клиентов не перепутаются,
+        # а подобрать id для поддельного ответа нельзя
+        if len(self._pending) >= 0x10000:
+            raise OSError("нет свободных id запросов")
+        upstream_id = secrets.randbits(16)
+        while upstream_id in self._pending:
+            upstream_id = secrets.randbits(16)
+        future = asyncio.get_event_loop().create_future()
+        self._pending[upstream_id] = (key, future)
+        try:
+            self._upstream_transport.sendto(struct.pack('!H', upstream_id) + query[2:], self._upstream_addr)
+            response = await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(upstream_id, None)
+        flags = struct.unpack('!H', response[2:4])[0]
+        if flags & FLAG_TC:
+            return await self._forward_tcp(query, key)
+        return original_id + response[2:]
+
+    async def _forward_tcp(self, query: bytes, key: Tuple[str, int, int]) -> bytes:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(*self._upstream_addr[:2]), self.timeout)
+        try:
+            writer.write(struct.pack('!H', len(query)) + query)
+            await writer.drain()
+            length = struct.unpack('!H', await asyncio.wait_for(reader.readexactly(2), self.timeout))[0]
+            response = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+        finally:
+            writer.close()
+        if response[:2] != query[:2] or parse_reply_question(response) != key:
+            raise ValueError("ответ по TCP не на этот запрос")
+        return response
+
+    async def _handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                header = await reader.readexactly(2)
+                query = await reader.readexactly(struct.unpack('!H', header)[0])
+                self.counters['tcp_queries'] += 1
+                response = await self.resolve(query)
+                if response is None:
+                    break
+                writer.write(struct.pack('!H', len(response)) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    # --- жизненный цикл ---
+
+    async def _serve(self):
+        loop = asyncio.get_event_loop()
+        host, port = self.listen
+        udp_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _ServerProtocol(self), local_addr=(host, port))
+        self.port = udp_transport.get_extra_info('sockname')[1]
+        tcp_server = await asyncio.start_server(self._handle_tcp, host, self.port)
+        self._upstream_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _UpstreamProtocol(self), family=self._upstream_family)
+        return udp_transport, tcp_server
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        asyncio.set_event_loop(loop)
+        try:
+            udp_transport, tcp_server = loop.run_until_complete(self._serve())
+        except BaseException as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            udp_transport.close()
+            tcp_server.close()
+            if self._upstream_transport is not None:
+                self._upstream_transport.close()
+            loop.run_until_complete(tcp_server.wait_closed())
+            loop.close()
+
+    def _resolve_upstream(self):
+        """Адрес вышестоящего сервера в том виде, в каком его вернет recvfrom"""
+        host, port = self.upstream
+        family, _, _, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_DGRAM)[0]
+        self._upstream_family = family
+        self._upstream_addr = tuple(sockaddr)
+
+    def start(self):
+        """Запустить сервер в фоновом потоке; OSError, если порт занят или upstream не разрешается"""
+        if self._thread is not None:
+            return
+        self._resolve_upstream()
+        self._thread = threading.Thread(target=self._run, name='DnsSinkhole', daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        if self._error is not None:
+            self._thread = None
+            raise self._error
+
+    def stop(self):
+        if self._thread is None or self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=2.0)
+        self._thread = None
+
+    def summary(self) -> str:
+        counters = self.counters
+        return (f"запросов={counters['queries']}, заблокировано={counters['blocked']}, "
+                f"из кэша={counters['cache_hits']}, переслано={counters['forwarded']}, "
+                f"ошибок={counters['upstream_errors']}, отклонено ответов={counters['upstream_rejected']}")
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Список рекламных доменов и движок проверки по нему
+
+Единственный источник рекламных доменов (AD_DOMAINS) для блокировщика,
+hosts-файла и установочного скрипта. Записи нормализуются (регистр,
+схема URL, завершающая точка, IDNA), дубликаты отбрасываются, а правила
+компилируются в дерево по меткам домена в обратном порядке
+(com -> spotify -> ads), поэтому is_blocked(host) проходит по дереву
+за число меток в имени, сколько бы правил ни было.
+
+Синтаксис правил:
+    ads.spotify.com       - точное имя
+    .doubleclick.net      - домен и все его поддомены
+    *.doubleclick.net     - только поддомены (любой глубины)
+    audio-sp-*.pscdn.co   - шаблон в пределах одной метки
+
+Записи с путем URL (facebook.com/tr) в DNS и hosts не выражаются:
+такие записи пропускаются и учитываются в skipped_count. Так же
+пропускаются суффиксы и шаблоны на публичном суффиксе (.com, *.co.uk,
+ads-*.com): одна ошибочная запись внешнего списка заблокировала бы
+целую зону.
+"""
+
+import re
+from fnmatch import translate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Рекламные и трекинговые домены Spotify (раньше - два расходящихся
+# списка в spotify_ad_blocker.py и setup.py)
+AD_DOMAINS: List[str] = [
+    # Основные рекламные домены Spotify
+    'media-match.com',
+    'adclick.g.doublecklick.net',
+    'www.googleadservices.com',
+    'pagead2.googlesyndication.com',
+    'desktop.spotify.com',
+    'googleads.g.doubleclick.net',
+    'pubads.g.doubleclick.net',
+    'audio2.spotify.com',
+    'bounceexchange.com',
+    'pagead46.l.doubleclick.net',
+    'pagead.l.doubleclick.net',
+    'video-ad-stats.googlesyndication.com',
+    'pagead-googlehosted.l.google.com',
+    'partnerad.l.doubleclick.net',
+    'adserver.adtechus.com',
+    'anycast.pixel.adsafeprotected.com',
+    'gads.pubmatic.com',
+    'securepubads.g.doubleclick.net',
+    'crashdump.spotify.com',
+    'adeventtracker.spotify.com',
+    'log.spotify.com',
+    'analytics.spotify.com',
+    'ads-fa.spotify.com',
+    'ads.pubmatic.com',
+    'www.googletagservices.com',
+    'b.scorecardresearch.com',
+    'bs.serving-sys.com',
+    'doubleclick.net',
+    'ds.serving-sys.com',
+    'googleadservices.com',
+    'js.moatads.com',
+    'longtail-dir.spotify.com',
+    'tpc.googlesyndication.com',
+    'partner.googleadservices.com',
+    'www.google-analytics.com',
+    'ssl.google-analytics.com',
+
+    # ДОПОЛНИТЕЛЬНЫЕ агрессивные блокировки
+    'ads.spotify.com',
+    'adnxs.com',
+    'adsystem.com',
+    'amazon-adsystem.com',
+    'googlesyndication.com',
+    'googletagmanager.com',
+    'connect.facebook.net',
+    'analytics.google.com',
+    'google-analytics.com',
+    'googletagservices.com',
+    'scorecardresearch.com',
+    'quantserve.com',
+    'outbrain.com',
+    'taboola.com',
+    'adsafeprotected.com',
+    'moatads.com',
+    'adsrvr.org',
+    'turn.com',
+    'rlcdn.com',
+    'rubiconproject.com',
+    'pubmatic.com',
+    'openx.net',
+    'contextweb.com',
+    'casalemedia.com',
+    'adsymptotic.com',
+
+    # Spotify-специфичные рекламные домены
+    'spclient.wg.spotify.com',
+    'audio-sp-*.pscdn.co',
+    'heads4-ak.spotify.com.edgesuite.net',
+    'heads-ak.spotify.com.edgesuite.net',
+    'audio-ak.spotify.com.edgesuite.net',
+    'audio4-ak.spotify.com.edgesuite.net',
+    'heads4-ak-spotify-com.akamaized.net',
+    'audio4-ak-spotify-com.akamaized.net',
+    'audio-ak-spotify-com.akamaized.net',
+    'heads-ak-spotify-com.akamaized.net',
+    'audio-akp-spotify-com.akamaized.net',
+    'audio4-akp-spotify-com.akamaized.net',
+    'gew1.ap.spotify.com',
+    'gew4.ap.spotify.com',
+
+    # Дополнительные блокировки для максимальной агрессивности
+    'spotify.map.fastly.net',
+    'spotify.map.fastlylb.net',
+    'fastly.com',
+    'fastlylb.net',
+    'akamai.net',
+    'akamaized.net',
+    'edgekey.net',
+    'edgesuite.net',
+    'cloudfront.net',
+]
+
+# Региональные серверы Spotify (audio/heads, audio4/heads4 по городам)
+AD_DOMAINS += [f'{prefix}-sp-{region}.spotify.com'
+               for region in ('sto', 'fra', 'lon', 'mia', 'sjc', 'sea', 'ash', 'dfw')
+               for prefix in ('audio', 'audio4', 'heads', 'heads4')]
+
+# Виды правил
+RULE_EXACT = 'exact'
+RULE_SUFFIX = 'suffix'
+RULE_WILDCARD = 'wildcard'
+
+# Многоуровневые публичные суффиксы, под которыми регистрируются домены
+# (любой домен первого уровня - публичный суффикс сам по себе)
+PUBLIC_SUFFIXES = frozenset([
+    'co.uk', 'org.uk', 'me.uk', 'ltd.uk', 'plc.uk', 'net.uk', 'ac.uk', 'gov.uk',
+    'com.au', 'net.au', 'org.au', 'edu.au', 'gov.au',
+    'co.nz', 'net.nz', 'org.nz', 'co.za', 'org.za',
+    'co.jp', 'ne.jp', 'or.jp', 'ac.jp', 'go.jp', 'co.kr', 'or.kr',
+    'co.in', 'net.in', 'org.in', 'co.id', 'co.il', 'co.th',
+    'com.br', 'net.br', 'org.br', 'com.ar', 'com.mx', 'com.co', 'com.pe',
+    'com.cn', 'net.cn', 'org.cn', 'com.hk', 'com.tw', 'com.sg', 'com.my',
+    'com.tr', 'com.ua', 'com.ru', 'com.pl', 'com.vn', 'com.ph', 'com.eg', 'com.sa',
+])
+
+_LABEL_RE = re.compile(r'^[a-z0-9_*-]{1,63}$')
+_SCHEME_RE = re.compile(r'^[a-z][a-z0-9+.-]*://')
+
+
+def normalize_entry(entry: str) -> Optional[Tuple[str, str]]:
+    """Нормализованное правило и его вид или None, если запись не выражается в DNS"""
+    entry = entry.strip().lower()
+    entry = _SCHEME_RE.sub('', entry)
+    if not entry or '/' in entry or ' ' in entry:
+        return None
+    entry = entry.rstrip('.')
+
+    kind = RULE_EXACT
+    if entry.startswith('.'):
+        kind = RULE_SUFFIX
+        entry = entry.lstrip('.')
+
+    labels = entry.split('.')
+    if len(labels) < 2:
+        return None
+    normalized = []
+    for label in labels:
+        if not label.isascii():
+            try:
+                label = label.encode('idna').decode('ascii')
+            except UnicodeError:
+                return None
+        if not _LABEL_RE.match(label):
+            return None
+        normalized.append(label)
+
+    if '*' in entry:
+        if kind == RULE_SUFFIX:
+            return None
+        kind = RULE_WILDCARD
+    if kind != RULE_EXACT and not _below_public_suffix(normalized):
+        # Суффикс или шаблон на публичном суффиксе заблокировал бы целую зону
+        return None
+    return '.'.join(normalized), kind
+
+
+def _below_public_suffix(labels: List[str]) -> bool:
+    """Постоянная часть правила (после последней метки-шаблона) длиннее публичного суффикса"""
+    fixed = labels
+    for index, label in enumerate(labels):
+        if '*' in label:
+            fixed = labels[index + 1:]
+    suffix = 2 if '.'.join(fixed[-2:]) in PUBLIC_SUFFIXES else 1
+    return len(fixed) > suffix
+
+
+class _Node:
+    """Узел дерева меток"""
+    __slots__ = ('children', 'globs', 'exact', 'subtree')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        self.globs: List[Tuple['re.Pattern', '_Node']] = []
+        self.exact = False     # заблокировано само имя
+        self.subtree = False   # заблокированы все поддомены
+
+
+class DomainBlocklist:
+    """Дерево правил блокировки по меткам домена в обратном порядке"""
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self.root = _Node()
+        self.rules: Dict[str, str] = {}
+        self.skipped: List[str] = []  # первые примеры пропущенных записей
+        self.skipped_count = 0
+        self.duplicates = 0
+        self.extend(entries)
+
+    def _child(self, node: _Node, label: str) -> _Node:
+        if '*' not in label:
+            child = node.children.get(label)
+            if child is None:
+                child = node.children[label] = _Node()
+            return child
+        for pattern, child in node.globs:
+            if pattern.pattern == translate(label):
+                return child
+        child = _Node()
+        node.globs.append((re.compile(translate(label)), child))
+        return child
+
+    def add(self, entry: str) -> bool:
+        """Добавить правило; False - дубликат или запись не выражается в DNS"""
+        rule = normalize_entry(entry)
+        if rule is None:
+            self.skipped_count += 1
+            if len(self.skipped) < 100:
+                self.skipped.append(entry)
+            return False
+        name, kind = rule
+        key = '.' + name if kind == RULE_SUFFIX else name
+        if key in self.rules:
+            self.duplicates += 1
+            return False
+        self.rules[key] = kind
+
+        labels = name.split('.')
+        subtree_only = labels[0] == '*'
+        if subtree_only:
+            labels = labels[1:]
+        node = self.root
+        for label in reversed(labels):
+            node = self._child(node, label)
+        if subtree_only:
+            node.subtree = True
+        else:
+            node.exact = True
+            if kind == RULE_SUFFIX:
+                node.subtree = True
+        return True
+
+    def extend(self, entries: Iterable[str]) -> int:
+        """Добавить правила; возвращает число новых"""
+        return sum(1 for entry in entries if self.add(entry))
+
+    def is_blocked(self, host: str) -> bool:
+        """Заблокировано ли имя хоста"""
+        labels = host.strip().lower().rstrip('.').split('.')
+        nodes = [self.root]
+        for label in reversed(labels):
+            next_nodes = []
+            for node in nodes:
+                if node.subtree:
+                    # Имя длиннее узла - это поддомен заблокированного домена
+                    return True
+                child = node.children.get(label)
+                if child is not None:
+                    next_nodes.append(child)
+                for pattern, glob_child in node.globs:
+                    if pattern.match(label):
+                        next_nodes.append(glob_child)
+            if not next_nodes:
+                return False
+            nodes = next_nodes
+        return any(node.exact for node in nodes)
+
+    __contains__ = is_blocked
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def hosts_domains(self) -> List[str]:
+        """Имена для hosts-файла: точные правила и корни суффиксных
+
+        Шаблоны и поддомены в hosts не выражаются и пропускаются.
+        """
+        return sorted({key.lstrip('.') for key, kind in self.rules.items() if kind != RULE_WILDCARD})
+
+    def stats(self) -> Dict[str, int]:
+        counts = {RULE_EXACT: 0, RULE_SUFFIX: 0, RULE_WILDCARD: 0}
+        for kind in self.rules.values():
+            counts[kind] += 1
+        counts.update(rules=len(self.rules), duplicates=self.duplicates, skipped=self.skipped_count)
+        return counts
+
+
+def default_blocklist() -> DomainBlocklist:
+    return DomainBlocklist(AD_DOMAINS)
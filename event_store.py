@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хранилище событий блокировщика в SQLite
+
+Смены заголовка окна, детекции рекламы (какие детекторы сработали и
+какие сигнатуры совпали) и действия с их длительностью пишутся в
+events.db вместо разбора мегабайтов ad_blocker.log регулярными
+выражениями. Горячий путь только кладет событие в очередь; фоновый
+поток пишет события пачками, одной транзакцией на пачку. База - в
+режиме WAL с synchronous=NORMAL: коммит не ждет fsync (сброс на диск -
+при контрольной точке), а чтение отчетов не блокирует запись.
+
+Таблицы индексированы по времени и заголовку. Отчет по базе:
+    python event_store.py ~/.spotify_ad_blocker/events.db [--hours 24]
+"""
+
+import sys
+import json
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_STOP = object()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS title_changes (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    instance INTEGER,
+    title TEXT,
+    previous TEXT
+);
+CREATE INDEX IF NOT EXISTS title_changes_ts ON title_changes (ts);
+CREATE INDEX IF NOT EXISTS title_changes_title ON title_changes (title);
+
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    instance INTEGER,
+    title TEXT,
+    detectors TEXT NOT NULL,
+    signatures TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_ts ON detections (ts);
+CREATE INDEX IF NOT EXISTS detections_title ON detections (title);
+
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    instance INTEGER,
+    action TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    ok INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS actions_ts ON actions (ts);
+CREATE INDEX IF NOT EXISTS actions_action ON actions (action, ts);
+"""
+
+_INSERTS = {
+    'title_changes': "INSERT INTO title_changes (ts, instance, title, previous) VALUES (?, ?, ?, ?)",
+    'detections': "INSERT INTO detections (ts, instance, title, detectors, signatures) VALUES (?, ?, ?, ?, ?)",
+    'actions': "INSERT INTO actions (ts, instance, action, seconds, ok) VALUES (?, ?, ?, ?, ?)",
+}
+
+
+class EventStore:
+    """Очередь событий + фоновый писатель SQLite с пакетными транзакциями"""
+
+    def __init__(self, path: Path, flush_interval: float = 1.0, batch_size: int = 500,
+                 max_queue: int = 10000, log: Optional[Callable[..., None]] = None):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.log = log or (lambda message, level='INFO': None)
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+        # Схема создается сразу: ошибка открытия базы видна при запуске, а не в потоке
+        connection = self._connect()
+        connection.close()
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='AdBlockerEvents', daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _put(self, table: str, row: tuple):
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            self.dropped += 1
+
+    def title_changed(self, ts: float, title: Optional[str], previous: Optional[str],
+                      instance: Optional[int] = None):
+        self._put('title_changes', (ts, instance, title, previous))
+
+    def detection(self, ts: float, title: Optional[str], detectors: Iterable[str],
+                  signatures: Iterable[str] = (), instance: Optional[int] = None):
+        """Детекция рекламы: сработавшие детекторы и совпавшие сигнатуры заголовка"""
+        self._put('detections', (ts, instance, title, ','.join(detectors), ','.join(signatures)))
+
+    def action(self, ts: float, name: str, seconds: float, ok: bool = True,
+               instance: Optional[int] = None):
+        self._put('actions', (ts, instance, name, seconds, int(ok)))
+
+    def _write_batch(self, connection: sqlite3.Connection, records: List[Tuple[str, tuple]]):
+        grouped: Dict[str, List[tuple]] = {}
+        for table, row in records:
+            grouped.setdefault(table, []).append(row)
+        try:
+            connection.execute("BEGIN")
+            for table, rows in grouped.items():
+                connection.executemany(_INSERTS[table], rows)
+            connection.execute("COMMIT")
+            self.written += len(records)
+            self.batches += 1
+        except sqlite3.Error as e:
+            try:
+                connection.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            self.dropped += len(records)
+            self.log(f"Ошибка записи событий в {self.path}: {e}", "WARNING")
+
+    def _run(self):
+        connection = self._connect()
+        pending = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    record = None
+
+                if record is _STOP:
+                    if pending:
+                        self._write_batch(connection, pending)
+                    return
+                if record is not None:
+                    pending.append(record)
+
+                if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                    self._write_batch(connection, pending)
+                    pending = []
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + self.flush_interval
+        finally:
+            connection.close()
+
+    def close(self, timeout: float = 5.0):
+        """Дописать очередь и остановить поток (повторный вызов безопасен)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def summary(self) -> str:
+        return f"записано={self.written}, пачек={self.batches}, отброшено={self.dropped}"
+
+
+class EventQuery:
+    """Отчеты по events.db (отдельное соединение, запись не блокируется)"""
+
+    def __init__(self, path: Path):
+        self.connection = sqlite3.connect(f"file:{Path(path)}?mode=ro", uri=True, timeout=5.0)
+        self.connection.row_factory = sqlite3.Row
+
+    def close(self):
+        self.connection.close()
+
+    def _rows(self, sql: str, params: tuple = ()) -> List[Dict]:
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def title_history(self, title: str, since: float = 0.0) -> List[Dict]:
+        """Смены заголовка окна на этот заголовок"""
+        return self._rows(
+            "SELECT ts, instance, title, previous FROM title_changes "
+            "WHERE title = ? AND ts >= ? ORDER BY ts", (title, since))
+
+    def detections(self, since: float = 0.0, until: Optional[float] = None,
+                   limit: int = 100) -> List[Dict]:
+        return self._rows(
+            "SELECT ts, instance, title, detectors, signatures FROM detections "
+            "WHERE ts >= ? AND ts <= ? ORDER BY ts DESC LIMIT ?",
+            (since, until if until is not None else float('inf'), limit))
+
+    def detected_titles(self, since: float = 0.0) -> List[Dict]:
+        """Заголовки, признанные рекламой, по числу детекций"""
+        return self._rows(
+            "SELECT title, COUNT(*) AS detections, MAX(ts) AS last_ts FROM detections "
+            "WHERE ts >= ? GROUP BY title ORDER BY detections DESC", (since,))
+
+    def detector_combinations(self, since: float = 0.0) -> List[Dict]:
+        """Какие наборы детекторов подтверждали рекламу"""
+        return self._rows(
+            "SELECT detectors, COUNT(*) AS detections FROM detections "
+            "WHERE ts >= ? GROUP BY detectors ORDER BY detections DESC", (since,))
+
+    def action_latencies(self, since: float = 0.0) -> List[Dict]:
+        return self._rows(
+            "SELECT action, COUNT(*) AS count, SUM(ok) AS ok, "
+            "AVG(seconds) * 1000 AS avg_ms, MAX(seconds) * 1000 AS max_ms "
+            "FROM actions WHERE ts >= ? GROUP BY action ORDER BY action", (since,))
+
+    def report(self, since: float = 0.0) -> Dict:
+        changes = self.connection.execute(
+            "SELECT COUNT(*) FROM title_changes WHERE ts >= ?", (since,)).fetchone()[0]
+        return {
+            'title_changes': changes,
+            'detected_titles': self.detected_titles(since),
+            'detector_combinations': self.detector_combinations(since),
+            'actions': self.action_latencies(since),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отчет по хранилищу событий блокировщика")
+    parser.add_argument('database', type=Path, help="файл events.db")
+    parser.add_argument('--hours', type=float, help="только события за последние N часов")
+    parser.add_argument('--title', help="история одного заголовка")
+    args = parser.parse_args()
+
+    if not args.database.exists():
+        print(f"❌ База событий не найдена: {args.database}")
+        sys.exit(1)
+
+    since = time.time() - args.hours * 3600 if args.hours else 0.0
+    store = EventQuery(args.database)
+    try:
+        report = store.title_history(args.title, since) if args.title else store.report(since)
+    finally:
+        store.close()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Запись hosts-файлов: атомарно и только при изменении содержимого
+
+Строки "адрес домен" генерируются дважды: первый проход только считает
+sha256, и если он совпадает с хешем, записанным в файле, файл не
+трогается (при старте - одно чтение заголовка вместо перезаписи). При
+изменении строки потоком пишутся во временный файл в той же папке,
+который затем атомарно заменяет целевой (os.replace), поэтому
+прерванная запись не оставляет обрезанный файл.
+
+Два режима:
+    write()        - файл целиком принадлежит блокировщику (user_hosts)
+    merge_block()  - управляемый блок между маркерами внутри чужого файла
+                     (системный hosts): строки пользователя не меняются
+"""
+
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence
+
+BLOCK_NAME = 'spotify-ad-blocker'
+
+
+def system_hosts_path() -> Path:
+    """Системный hosts-файл Windows (на других ОС - /etc/hosts)"""
+    if os.name == 'nt':
+        return Path(os.environ.get('SystemRoot', r'C:\Windows')) / 'System32' / 'drivers' / 'etc' / 'hosts'
+    return Path('/etc/hosts')
+
+
+class HostsFileWriter:
+    """Атомарная запись hosts-строк с пропуском неизмененного содержимого"""
+
+    def __init__(self, path: Path, address: str = '127.0.0.1', name: str = BLOCK_NAME,
+                 log: Optional[Callable[..., None]] = None):
+        self.path = Path(path)
+        self.address = address
+        self.begin_marker = f"# >>> {name}"
+        self.end_marker = f"# <<< {name}"
+        self.log = log or (lambda message, level='INFO': None)
+
+    def _lines(self, domains: Iterable[str]) -> Iterable[str]:
+        return (f"{self.address} {domain}\n" for domain in domains)
+
+    @staticmethod
+    def _header_lines(header: Sequence[str]) -> list:
+        return [f"# {line}\n" if line else "\n" for line in header]
+
+    def content_hash(self, domains: Iterable[str], header: Sequence[str] = ()) -> str:
+        """sha256 всего, что пишется в файл: заголовок, маркеры и строки доменов"""
+        digest = hashlib.sha256()
+        for line in self._header_lines(header):
+            digest.update(line.encode('utf-8'))
+        digest.update(f"{self.begin_marker}\n{self.end_marker}\n".encode('utf-8'))
+        for line in self._lines(domains):
+            digest.update(line.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _replace(self, write_body: Callable[[object], None]):
+        """Записать во временный файл рядом с целевым и атомарно заменить"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=str(self.path.parent), prefix=f'.{self.path.name}.',
+                                        suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                write_body(f)
+                f.flush()
+                os.fsync(f.fileno())
+            if self.path.exists():
+                # Системный hosts: сохраняем права исходного файла
+                os.chmod(tmp_name, self.path.stat().st_mode & 0o777)
+            os.replace(tmp_name, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+
+    def _read_hash(self, max_lines: int = 10) -> Optional[str]:
+        try:
+            with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+                for _, line in zip(range(max_lines), f):
+                    if line.startswith(self.begin_marker):
+                        return self._marker_hash(line)
+        except OSError:
+            pass
+        return None
+
+    @staticmethod
+    def _marker_hash(line: str) -> Optional[str]:
+        for field in line.split():
+            if field.startswith('sha256='):
+                return field[len('sha256='):]
+        return None
+
+    def write(self, domains: Callable[[], Iterable[str]], header: Sequence[str] = ()) -> bool:
+        """Записать файл целиком; False - содержимое не изменилось, запись пропущена
+
+        domains вызывается заново на каждый проход (хеш и запись).
+        """
+        digest = self.content_hash(domains(), header)
+        if self._read_hash() == digest:
+            return False
+
+        def body(f):
+            f.writelines(self._header_lines(header))
+            f.write(f"{self.begin_marker} sha256={digest}\n")
+            f.writelines(self._lines(domains()))
+            f.write(f"{self.end_marker}\n")
+
+        self._replace(body)
+        return True
+
+    def _find_block(self) -> Optional[str]:
+        """Хеш существующего целого блока или None"""
+        digest = None
+        try:
+            with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    if line.startswith(self.begin_marker):
+                        digest = self._marker_hash(line)
+                    elif line.startswith(self.end_marker) and digest is not None:
+                        return digest
+        except OSError:
+            pass
+        return None
+
+    def _merged(self, f, block: Optional[Callable[[], Iterable[str]]], digest: Optional[str]):
+        """Строки исходного файла без старого блока и новый блок на его месте"""
+
+        def write_block():
+            if block is None:
+                return
+            f.write(f"{self.begin_marker} sha256={digest} (управляется автоматически)\n")
+            f.writelines(self._lines(block()))
+            f.write(f"{self.end_marker}\n")
+
+        written = False
+        inside = False
+        # Строки после маркера начала: отбрасываются, только если блок закрыт
+        held = []
+        last_line = '\n'
+        try:
+            source = open(self.path, 'r', encoding='utf-8', errors='replace', newline='')
+        except FileNotFoundError:
+            source = None
+        if source is not None:
+            with source:
+                for line in source:
+                    if line.startswith(self.begin_marker):
+                        inside = True
+                        if not written:
+                            write_block()
+                            written = True
+                        continue
+                    if inside:
+                        if line.startswith(self.end_marker):
+                            inside = False
+                            held = []
+                        else:
+                            held.append(line)
+                        continue
+                    f.write(line)
+                    last_line = line
+        if inside:
+            # Маркера конца нет: строки после начала блока могут быть
+            # пользовательскими, поэтому они остаются как есть
+            self.log(f"В {self.path} нет маркера конца блока '{self.end_marker}': "
+                     f"строки после маркера начала сохранены", "WARNING")
+            f.writelines(held)
+            if held:
+                last_line = held[-1]
+        if not written and block is not None:
+            if not last_line.endswith('\n'):
+                f.write('\n')
+            write_block()
+
+    def merge_block(self, domains: Callable[[], Iterable[str]]) -> bool:
+        """Вставить или обновить управляемый блок; False - блок не изменился"""
+        digest = self.content_hash(domains())
+        if self._find_block() == digest:
+            return False
+        self._replace(lambda f: self._merged(f, domains, digest))
+        return True
+
+    def remove_block(self) -> bool:
+        """Убрать управляемый блок; False - блока не было"""
+        if self._read_hash(max_lines=1 << 30) is None:
+            return False
+        self._replace(lambda f: self._merged(f, None, None))
+        return True
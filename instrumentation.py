@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Инструментирование горячего пути блокировщика
+
+Гистограммы задержек в стиле HDR (логарифмические корзины с линейными
+подкорзинами, относительная точность ~6% во всем диапазоне от
+микросекунд до часов) для тика мониторинга, каждого детектора и каждого
+действия блокировки, плюс счетчики событий. Запись значения - O(1) и
+без выделения памяти на горячем пути после прогрева.
+"""
+
+import json
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class LatencyHistogram:
+    """Гистограмма задержек в микросекундах в стиле HdrHistogram"""
+
+    def __init__(self, sub_bucket_bits: int = 5):
+        self.bits = sub_bucket_bits
+        self.sub = 1 << sub_bucket_bits
+        self.half = self.sub >> 1
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value: int) -> int:
+        if value < self.sub:
+            return value
+        shift = value.bit_length() - self.bits
+        return self.sub + (shift - 1) * self.half + ((value >> shift) - self.half)
+
+    def _bucket_bounds(self, index: int):
+        if index < self.sub:
+            return index, index
+        shift = (index - self.sub) // self.half + 1
+        mantissa = (index - self.sub) % self.half + self.half
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        value = int(seconds * 1_000_000)
+        if value < 0:
+            value = 0
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> float:
+        """Значение перцентиля в миллисекундах (верхняя граница корзины)"""
+        if not self.count:
+            return 0.0
+        target = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                upper = min(self._bucket_bounds(index)[1], self.max)
+                return upper / 1000.0
+        return self.max / 1000.0
+
+    def cumulative(self, bounds_us) -> list:
+        """Число значений не больше каждой границы (мкс) - для корзин le экспорта"""
+        uppers = sorted((self._bucket_bounds(index)[1], count)
+                        for index, count in list(self.counts.items()))
+        result = []
+        seen = 0
+        position = 0
+        for bound in bounds_us:
+            while position < len(uppers) and uppers[position][0] <= bound:
+                seen += uppers[position][1]
+                position += 1
+            result.append(seen)
+        return result
+
+    @property
+    def mean(self) -> float:
+        """Среднее в миллисекундах"""
+        return self.total / self.count / 1000.0 if self.count else 0.0
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.mean, 3),
+            'min_ms': (self.min or 0) / 1000.0,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max / 1000.0,
+        }
+
+
+class Instrumentation:
+    """Реестр гистограмм и счетчиков блокировщика"""
+
+    def __init__(self):
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, int] = {}
+        self.started = time.time()
+        # Запись идет из потока мониторинга и из потоков действий
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Контекст замера: with instrumentation.timer('tick'): ..."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def histogram(self, name: str) -> Optional[LatencyHistogram]:
+        return self.histograms.get(name)
+
+    def summary_line(self) -> str:
+        """Короткая строка для периодического лога"""
+        uptime = max(time.time() - self.started, 1e-9)
+        ticks = self.counters.get('ticks', 0)
+        parts = [f"тиков={ticks} ({ticks / uptime:.2f}/с, пробуждений/мин={ticks * 60.0 / uptime:.1f})"]
+        tick = self.histograms.get('tick')
+        if tick and tick.count:
+            parts.append(f"тик p50={tick.percentile(50):.2f}мс p99={tick.percentile(99):.2f}мс")
+        parts.append(f"детекций={self.counters.get('ad_detections', 0)}")
+        parts.append(f"блокировок={self.counters.get('ads_blocked', 0)}")
+        parts.append(f"подавлено={self.counters.get('suppressed_window_switch', 0)}")
+
+        detectors = [(name[len('detector.'):], h) for name, h in self.histograms.items()
+                     if name.startswith('detector.') and h.count]
+        if detectors:
+            name, h = max(detectors, key=lambda item: item[1].total)
+            parts.append(f"самый дорогой детектор={name} ({h.total / 1000.0:.1f}мс всего)")
+        return ', '.join(parts)
+
+    def report(self) -> Dict:
+        """Полный снимок статистики (для --stats)"""
+        with self._lock:
+            return {
+                'uptime_s': round(time.time() - self.started, 1),
+                'wakeups_per_min': round(self.counters.get('ticks', 0) * 60.0
+                                         / max(time.time() - self.started, 1e-9), 1),
+                'counters': dict(self.counters),
+                'histograms': {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+            }
+
+    def dump(self, path) -> str:
+        """Записать отчет в JSON-файл и вернуть его текст"""
+        text = json.dumps(self.report(), ensure_ascii=False, indent=2)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return text
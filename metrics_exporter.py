@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный экспорт метрик в формате Prometheus/OpenMetrics
+
+HTTP-сервер из стандартной библиотеки в фоновом потоке отдает метрики
+блокировщика на /metrics - их собирает локальный коллектор (Prometheus,
+Grafana Agent, VictoriaMetrics). Формат выбирается по заголовку Accept:
+OpenMetrics 1.0 (application/openmetrics-text) или текстовый формат
+Prometheus 0.0.4.
+
+Метрики собираются функцией collect() в момент запроса, на горячем пути
+ничего не меняется. Гистограммы задержек строятся из гистограмм
+Instrumentation по фиксированным границам (le) в секундах.
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from instrumentation import LatencyHistogram
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                                      0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+OPENMETRICS_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+Labels = Dict[str, str]
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    # http.server.ThreadingHTTPServer появился только в Python 3.7
+    daemon_threads = True
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(str(value))}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricFamily:
+    """Семейство метрик: имя, тип (counter, gauge, histogram), описание и значения"""
+
+    def __init__(self, name: str, kind: str, help_text: str):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.samples: List[Tuple[str, Labels, float]] = []
+
+    def add(self, value: float, labels: Optional[Labels] = None, suffix: str = ''):
+        self.samples.append((suffix, dict(labels or {}), value))
+        return self
+
+    def add_histogram(self, histogram: LatencyHistogram, labels: Optional[Labels] = None,
+                      buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Значения гистограммы Instrumentation в корзинах le (секунды)"""
+        labels = dict(labels or {})
+        cumulative = histogram.cumulative([int(bound * 1_000_000) for bound in buckets])
+        for bound, count in zip(buckets, cumulative):
+            self.add(count, dict(labels, le=_format_value(bound)), '_bucket')
+        self.add(histogram.count, dict(labels, le='+Inf'), '_bucket')
+        self.add(histogram.count, labels, '_count')
+        self.add(histogram.total / 1_000_000, labels, '_sum')
+        return self
+
+    def render(self, openmetrics: bool) -> List[str]:
+        # В OpenMetrics имя семейства счетчика - без _total, в Prometheus 0.0.4 - с ним
+        family = self.name if openmetrics or self.kind != 'counter' else self.name + '_total'
+        lines = [f"# HELP {family} {self.help}", f"# TYPE {family} {self.kind}"]
+        for suffix, labels, value in self.samples:
+            if self.kind == 'counter' and not suffix:
+                suffix = '_total'
+            lines.append(f"{self.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+def render(families: Iterable[MetricFamily], openmetrics: bool = False) -> str:
+    lines: List[str] = []
+    for family in families:
+        if family.samples:
+            lines.extend(family.render(openmetrics))
+    if openmetrics:
+        lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsExporter:
+    """HTTP-эндпоинт /metrics в фоновом потоке"""
+
+    def __init__(self, collect: Callable[[], Iterable[MetricFamily]],
+                 listen: Tuple[str, int] = ('127.0.0.1', 9464),
+                 log: Optional[Callable[..., None]] = None):
+        self.collect = collect
+        self.listen = listen
+        self.log = log or (lambda message, level='INFO': None)
+        self.port: Optional[int] = None
+        self.scrapes = 0
+        self._server: Optional[_ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def _handler(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+                try:
+                    body = render(exporter.collect(), openmetrics).encode('utf-8')
+                except Exception as e:
+                    exporter.log(f"Ошибка сбора метрик: {e}", "ERROR")
+                    self.send_error(500)
+                    return
+                exporter.scrapes += 1
+                self.send_response(200)
+                self.send_header('Content-Type', OPENMETRICS_TYPE if openmetrics else PROMETHEUS_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Запросы коллектора каждые несколько секунд не пишутся в лог
+                pass
+
+        return Handler
+
+    def start(self):
+        """Запустить сервер; OSError - порт занят"""
+        host, port = self.listen
+        self._server = _ThreadingHTTPServer((host, port), self._handler())
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='AdBlockerMetrics',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Один блокировщик на все экземпляры Spotify (сервер терминалов)
+
+На узле RDS у каждого пользователя свой Spotify, и раньше на каждую
+сессию приходилось запускать отдельный блокировщик со своим обходом
+таблицы процессов. SpotifyInstanceScanner делает на тик один общий
+проход для всех экземпляров:
+
+- трекер процессов (закрепленные PID, полный обход только при
+  изменениях);
+- группировка процессов Spotify по дереву PID: корень - процесс, чей
+  родитель не Spotify; ID сессии корня запрашивается один раз;
+- один запрос окон по всем PID с разбором по процессу-владельцу;
+- не больше одного перебора аудио сессий (AudioSessionPool), счетчики
+  уровня раздаются экземплярам по PID.
+
+Стоимость обхода не растет с числом сессий. У каждого SpotifyInstance -
+свое состояние детекции (счетчики подтверждений, время последней
+блокировки, буфер уровней звука, выбор способа пропуска, планировщик
+опроса): блокировщик обрабатывает экземпляры по очереди, подставляя их
+состояние, и отправляет пропуск окну конкретного экземпляра.
+
+Окна и аудио сессии Windows видны только из своей сессии: экземпляры
+других сессий отслеживаются по процессам, аудио для них не замеряется, а
+детекция по заголовку работает, только если их окна доступны блокировщику.
+"""
+
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+
+from audio_backends import AudioSessionPool
+from platform_backends import Platform, SpotifyWindow
+from poll_scheduler import AdaptivePollScheduler, STATE_ACTIVE, STATE_IDLE, STATE_PAUSED
+from process_tracker import ProcessInfo, SpotifyProcessTracker
+
+# Атрибуты SpotifyAdBlocker, которые ведутся отдельно для каждого экземпляра
+INSTANCE_ATTRIBUTES = ('spotify_process', '_spotify_pids', 'audio_monitor', 'skip_selector',
+                       '_ad_detection_count', '_music_detection_count', '_last_ad_block_time',
+                       '_last_music_log', '_last_ad_detection', '_last_window_switch', '_last_title')
+
+
+def group_by_root(processes: Sequence[ProcessInfo]) -> Dict[int, List[ProcessInfo]]:
+    """Процессы Spotify по корню дерева PID; корень - первым в списке"""
+    by_pid = {info.pid: info for info in processes}
+    groups: Dict[int, List[ProcessInfo]] = {}
+    for info in processes:
+        root = info
+        seen = {info.pid}
+        while root.ppid in by_pid and root.ppid not in seen:
+            root = by_pid[root.ppid]
+            seen.add(root.pid)
+        groups.setdefault(root.pid, []).append(info)
+    for root_pid, members in groups.items():
+        members.sort(key=lambda member: member.pid != root_pid)
+    return groups
+
+
+class SpotifyInstance:
+    """Экземпляр Spotify (дерево процессов) со своим состоянием детекции"""
+
+    def __init__(self, root: ProcessInfo, session_id: Optional[int], state: Dict[str, object],
+                 scheduler: AdaptivePollScheduler):
+        self.root = root
+        self.session_id = session_id
+        self.processes: List[ProcessInfo] = [root]
+        self.windows: List[SpotifyWindow] = []
+        self.state = state
+        self.scheduler = scheduler
+        self.confirming = False
+        self.windows_warned = False
+
+    @property
+    def key(self) -> int:
+        return self.root.pid
+
+    @property
+    def pids(self) -> tuple:
+        return tuple(info.pid for info in self.processes)
+
+    @property
+    def title(self) -> Optional[str]:
+        return self.windows[0].title if self.windows else None
+
+    @property
+    def label(self) -> str:
+        if self.session_id is None:
+            return f"PID {self.key}"
+        return f"сессия {self.session_id}, PID {self.key}"
+
+    def bind(self, target) -> Dict[str, object]:
+        """Подставить состояние экземпляра в атрибуты target; вернуть прежние значения"""
+        saved = {name: target.__dict__[name] for name in INSTANCE_ATTRIBUTES if name in target.__dict__}
+        self._apply(target, self.state)
+        return saved
+
+    def unbind(self, target, saved: Dict[str, object]):
+        """Сохранить состояние экземпляра из target и вернуть прежние значения"""
+        self.state = {name: target.__dict__[name] for name in INSTANCE_ATTRIBUTES if name in target.__dict__}
+        self._apply(target, saved)
+
+    @staticmethod
+    def _apply(target, values: Dict[str, object]):
+        for name in INSTANCE_ATTRIBUTES:
+            if name in values:
+                setattr(target, name, values[name])
+            else:
+                # Отсутствующий атрибут - тоже состояние (см. hasattr в детекции)
+                target.__dict__.pop(name, None)
+
+
+class SpotifyInstanceScanner:
+    """Общий обход процессов и окон всех экземпляров Spotify за тик"""
+
+    def __init__(self, tracker: SpotifyProcessTracker, platform: Platform,
+                 new_state: Callable[[ProcessInfo, bool], Dict[str, object]],
+                 new_scheduler: Callable[[], AdaptivePollScheduler],
+                 log: Optional[Callable[..., None]] = None,
+                 audio_sessions: Optional[AudioSessionPool] = None):
+        self.tracker = tracker
+        self.platform = platform
+        # new_state(корень, экземпляр из чужой сессии) - начальное состояние детекции
+        self.new_state = new_state
+        self.new_scheduler = new_scheduler
+        self.audio_sessions = audio_sessions
+        self.log = log or (lambda message, level='INFO': None)
+        self.instances: Dict[int, SpotifyInstance] = {}
+        self.own_session = platform.process_session(os.getpid())
+        self.state = STATE_IDLE
+        self.scans = 0
+        self.peak_instances = 0
+
+    def scan(self) -> List[SpotifyInstance]:
+        """Экземпляры Spotify с процессами и окнами на этот тик"""
+        tracked = self.tracker.refresh()
+        current: Dict[int, SpotifyInstance] = {}
+        for root_pid, members in group_by_root(tracked).items():
+            root = members[0]
+            instance = self.instances.get(root_pid)
+            if instance is None or instance.root.create_time != root.create_time:
+                session_id = self.platform.process_session(root_pid)
+                instance = SpotifyInstance(root, session_id, self.new_state(root, self.foreign(session_id)),
+                                           self.new_scheduler())
+                self.log(f"Найден экземпляр Spotify: {instance.label}")
+            instance.processes = members
+            current[root_pid] = instance
+        for root_pid, instance in self.instances.items():
+            if current.get(root_pid) is not instance:
+                self.log(f"Экземпляр Spotify завершен: {instance.label}")
+        self.instances = current
+        self.peak_instances = max(self.peak_instances, len(current))
+        if self.audio_sessions is not None:
+            self.audio_sessions.next_tick(info.pid for info in tracked)
+
+        # Один запрос окон по всем PID, разбор по владельцу
+        by_pid: Dict[int, List[SpotifyWindow]] = {}
+        if current and self.platform.has('windows'):
+            try:
+                by_pid = self.platform.spotify_windows_by_pid(info.pid for info in tracked)
+            except Exception as e:
+                self.log(f"Ошибка получения окон Spotify: {e}", "ERROR")
+        for instance in current.values():
+            instance.windows = [window for pid in instance.pids for window in by_pid.get(pid, ())]
+            if self.foreign(instance.session_id) and not instance.windows and not instance.windows_warned:
+                instance.windows_warned = True
+                self.log(f"Окна Spotify ({instance.label}) не видны из сессии {self.own_session}: "
+                         f"детекция по заголовку для него недоступна", "WARNING")
+        self.scans += 1
+        return list(current.values())
+
+    def foreign(self, session_id: Optional[int]) -> bool:
+        """Экземпляр в другой сессии Windows: его окна и звук отсюда не видны"""
+        return session_id is not None and self.own_session is not None and session_id != self.own_session
+
+    def update_state(self) -> bool:
+        """Общий режим энергосбережения по планировщикам экземпляров; True, если сменился"""
+        previous = self.state
+        if not self.instances:
+            self.state = STATE_IDLE
+        elif any(instance.scheduler.state == STATE_ACTIVE for instance in self.instances.values()):
+            self.state = STATE_ACTIVE
+        else:
+            self.state = STATE_PAUSED
+        return self.state != previous
+
+    @property
+    def confirming(self) -> bool:
+        """Хотя бы один экземпляр ждет подтверждения рекламы"""
+        return any(instance.confirming for instance in self.instances.values())
+
+    def next_interval(self, idle_interval: float) -> float:
+        """Пауза до следующего тика - самая короткая среди экземпляров"""
+        intervals = [instance.scheduler.next_interval() for instance in self.instances.values()]
+        return min(intervals) if intervals else idle_interval
+
+    def summary(self) -> str:
+        return (f"экземпляров={len(self.instances)} (максимум {self.peak_instances}), "
+                f"обходов={self.scans}, полных обходов процессов={self.tracker.full_scans}"
+                + (f", переборов аудио сессий={self.audio_sessions.enumerations}"
+                   if self.audio_sessions is not None else ""))
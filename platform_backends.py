@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Платформенный слой: все обращения блокировщика к ОС
+
+Перечисление окон, таблица процессов, аудио сессии, эмуляция нажатий
+клавиш и корневые папки Spotify вынесены за интерфейс Platform.
+SpotifyAdBlocker работает только через него, поэтому вместо
+WindowsPlatform можно подставить SimulatedPlatform (simulated_spotify.py)
+и запускать блокировщик без Windows - для бенчмарков и длительных
+нагрузочных прогонов.
+"""
+
+import time
+import threading
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from audio_backends import AudioBackend, PycawAudioBackend
+from capabilities import PlatformCapabilities
+from skip_transports import (AppCommandTransport, KeyboardTransport, MediaKeyTransport,
+                             SkipTransport)
+from process_tracker import (ProcessProvider, ProcessStartWatcher, PsutilProcessProvider,
+                             WmiProcessStartWatcher)
+from title_events import TitleEventSource, create_title_event_source
+
+
+class SpotifyWindow(NamedTuple):
+    """Видимое окно Spotify, найденное за один проход EnumWindows"""
+    hwnd: int
+    title: str
+    rect: Tuple[int, int, int, int]
+    minimized: bool
+
+
+class Platform:
+    """Интерфейс доступа блокировщика к ОС"""
+
+    # True - действия с системой (DNS, загрузки, очистка кэша) не выполняются
+    simulated = False
+
+    def has(self, feature: str) -> bool:
+        """Доступна ли возможность ('windows', 'keyboard', 'audio')"""
+        raise NotImplementedError
+
+    def process_provider(self) -> ProcessProvider:
+        raise NotImplementedError
+
+    def spotify_windows(self, pids: Optional[Iterable[int]] = None) -> List[SpotifyWindow]:
+        """Видимые окна Spotify (pids - процессы Spotify, если известны)"""
+        raise NotImplementedError
+
+    def spotify_windows_by_pid(self, pids: Iterable[int]) -> Dict[int, List[SpotifyWindow]]:
+        """Видимые окна Spotify по PID владельца (пусто, если владельца не узнать)"""
+        return {}
+
+    def process_session(self, pid: int) -> Optional[int]:
+        """ID сессии служб терминалов процесса или None"""
+        return None
+
+    def playing_ad(self, pids: Iterable[int]) -> Optional[bool]:
+        """Истинная разметка для трассы: играет ли реклама (None - неизвестно)"""
+        return None
+
+    def visible_windows(self) -> List[Tuple[int, str]]:
+        """(hwnd, заголовок) всех видимых окон с непустым заголовком"""
+        raise NotImplementedError
+
+    def foreground_title(self) -> str:
+        raise NotImplementedError
+
+    def close_window(self, hwnd: int):
+        raise NotImplementedError
+
+    def skip_transports(self) -> List[SkipTransport]:
+        """Способы команды "следующий трек" в порядке предпочтения"""
+        return []
+
+    def terminate_process(self, pid: int) -> bool:
+        """Завершить процесс; False, если его уже нет или нет доступа"""
+        raise NotImplementedError
+
+    def screen_size(self) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def audio_backend(self) -> Optional[AudioBackend]:
+        """Бэкенд пиковых уровней звука или None, если аудио недоступно"""
+        return None
+
+    def audio_meters_by_pid(self, pids: Iterable[int]) -> Dict[int, Callable[[], float]]:
+        """Функции пикового уровня аудио сессий процессов за один перебор сессий"""
+        return {}
+
+    def title_event_source(self, log: Optional[Callable[..., None]] = None) -> TitleEventSource:
+        raise NotImplementedError
+
+    def process_start_watcher(self, on_start: Callable[[], None],
+                              log: Optional[Callable[..., None]] = None) -> Optional[ProcessStartWatcher]:
+        """Уведомления о запуске Spotify или None (тогда - редкий опрос)"""
+        return None
+
+    def spotify_roots(self, home: Path) -> List[Path]:
+        """Папки данных Spotify (кэш, рекламные файлы)"""
+        raise NotImplementedError
+
+    def summary(self) -> Optional[str]:
+        """Строка для итогового лога (None - нечего сообщить)"""
+        return None
+
+    def close(self):
+        """Освободить ресурсы платформы при остановке блокировщика"""
+
+
+class SpotifyWindowRegistry:
+    """HWND окон Spotify по PID с дешевой проверкой вместо EnumWindows
+
+    Главное окно Spotify живет столько же, сколько процесс: между тиками
+    HWND только проверяются (IsWindow и GetWindowThreadProcessId - HWND
+    мог достаться другому процессу). Полный обход - если проверка не
+    прошла, появились незакэшированные PID или истек rescan_interval
+    (новые окна того же процесса, например попапы). Если окон с заголовком
+    нет (Spotify свернут в трей или запускается), пустой результат для
+    тех же PID повторно проверяется не чаще empty_rescan_interval.
+    """
+
+    def __init__(self, win32gui, win32con, win32process, rescan_interval: float = 30.0,
+                 empty_rescan_interval: float = 2.0, clock: Callable[[], float] = time.monotonic):
+        self.win32gui = win32gui
+        self.win32con = win32con
+        self.win32process = win32process
+        self.rescan_interval = rescan_interval
+        self.empty_rescan_interval = empty_rescan_interval
+        self.clock = clock
+        self._hwnds: Dict[int, int] = {}  # hwnd -> pid
+        self._pids: FrozenSet[int] = frozenset()
+        self._scanned_at = float('-inf')
+        # Окна запрашивают и поток мониторинга, и потоки действий
+        self._lock = threading.Lock()
+        self.enumerations = 0
+        self.cache_hits = 0
+
+    def _window_pid(self, hwnd: int) -> Optional[int]:
+        try:
+            if not self.win32gui.IsWindow(hwnd):
+                return None
+            return self.win32process.GetWindowThreadProcessId(hwnd)[1]
+        except Exception:
+            return None
+
+    def _valid(self) -> bool:
+        if not self._hwnds:
+            return self.clock() - self._scanned_at < self.empty_rescan_interval
+        return all(self._window_pid(hwnd) == pid for hwnd, pid in self._hwnds.items())
+
+    def _enumerate(self, pids: FrozenSet[int]):
+        win32gui = self.win32gui
+
+        def enum_windows_callback(hwnd, found):
+            # Только окна с заголовком: у Spotify есть скрытые служебные окна без него
+            if win32gui.GetWindowText(hwnd):
+                pid = self._window_pid(hwnd)
+                if pid in pids:
+                    found[hwnd] = pid
+            return True
+
+        found: Dict[int, int] = {}
+        win32gui.EnumWindows(enum_windows_callback, found)
+        self._hwnds = found
+        self._pids = pids
+        self._scanned_at = self.clock()
+        self.enumerations += 1
+
+    def _describe(self, hwnd: int) -> Optional[SpotifyWindow]:
+        win32gui = self.win32gui
+        if not win32gui.IsWindowVisible(hwnd):
+            return None
+        title = win32gui.GetWindowText(hwnd)
+        if not title:
+            return None
+        placement = win32gui.GetWindowPlacement(hwnd)
+        return SpotifyWindow(hwnd, title, win32gui.GetWindowRect(hwnd),
+                             placement[1] == self.win32con.SW_SHOWMINIMIZED)
+
+    def _collect(self, pids: Iterable[int]) -> List[Tuple[int, SpotifyWindow]]:
+        pids = frozenset(pids)
+        if not pids:
+            return []
+        with self._lock:
+            # Подмножество закэшированных PID (один экземпляр из нескольких) - из того же кэша
+            stale = (not pids <= self._pids
+                     or self.clock() - self._scanned_at >= self.rescan_interval
+                     or not self._valid())
+            if stale:
+                self._enumerate(pids)
+            else:
+                self.cache_hits += 1
+            hwnds = [(hwnd, pid) for hwnd, pid in self._hwnds.items() if pid in pids]
+        found = []
+        for hwnd, pid in hwnds:
+            try:
+                window = self._describe(hwnd)
+            except Exception:
+                # Окно закрылось между проверкой и чтением - найдется при следующем обходе
+                with self._lock:
+                    self._hwnds.pop(hwnd, None)
+                continue
+            if window is not None:
+                found.append((pid, window))
+        return found
+
+    def windows(self, pids: Iterable[int]) -> List[SpotifyWindow]:
+        """Видимые окна процессов Spotify"""
+        return [window for _, window in self._collect(pids)]
+
+    def windows_by_pid(self, pids: Iterable[int]) -> Dict[int, List[SpotifyWindow]]:
+        """Видимые окна процессов Spotify по PID владельца"""
+        grouped: Dict[int, List[SpotifyWindow]] = {}
+        for pid, window in self._collect(pids):
+            grouped.setdefault(pid, []).append(window)
+        return grouped
+
+    def summary(self) -> str:
+        return f"перечислений окон={self.enumerations}, из кэша={self.cache_hits}"
+
+
+class WindowsPlatform(Platform):
+    """Реальная ОС: pywin32, psutil, pycaw"""
+
+    def __init__(self, caps: PlatformCapabilities):
+        self.caps = caps
+        self._provider: Optional[ProcessProvider] = None
+        self.window_registry: Optional[SpotifyWindowRegistry] = None
+        if caps.has('windows') and caps.win32process is not None:
+            self.window_registry = SpotifyWindowRegistry(caps.win32gui, caps.win32con, caps.win32process)
+
+    def has(self, feature: str) -> bool:
+        return self.caps.has(feature)
+
+    def process_provider(self) -> ProcessProvider:
+        if self._provider is None:
+            self._provider = PsutilProcessProvider()
+        return self._provider
+
+    def spotify_windows(self, pids: Optional[Iterable[int]] = None) -> List[SpotifyWindow]:
+        if pids is not None and self.window_registry is not None:
+            return self.window_registry.windows(pids)
+
+        # Без PID или без win32process - поиск по заголовку полным обходом
+        win32gui = self.caps.win32gui
+        win32con = self.caps.win32con
+
+        def enum_windows_callback(hwnd, found):
+            if win32gui.IsWindowVisible(hwnd):
+                window_text = win32gui.GetWindowText(hwnd)
+                if 'spotify' in window_text.lower():
+                    placement = win32gui.GetWindowPlacement(hwnd)
+                    found.append(SpotifyWindow(
+                        hwnd, window_text, win32gui.GetWindowRect(hwnd),
+                        placement[1] == win32con.SW_SHOWMINIMIZED))
+            return True
+
+        windows: List[SpotifyWindow] = []
+        win32gui.EnumWindows(enum_windows_callback, windows)
+        return windows
+
+    def spotify_windows_by_pid(self, pids: Iterable[int]) -> Dict[int, List[SpotifyWindow]]:
+        if self.window_registry is None:
+            return {}
+        return self.window_registry.windows_by_pid(pids)
+
+    def process_session(self, pid: int) -> Optional[int]:
+        if self.caps.win32ts is None:
+            return None
+        try:
+            return self.caps.win32ts.ProcessIdToSessionId(pid)
+        except Exception:
+            return None
+
+    def visible_windows(self) -> List[Tuple[int, str]]:
+        win32gui = self.caps.win32gui
+
+        def enum_windows_callback(hwnd, found):
+            if win32gui.IsWindowVisible(hwnd):
+                window_text = win32gui.GetWindowText(hwnd)
+                if window_text:
+                    found.append((hwnd, window_text))
+            return True
+
+        windows: List[Tuple[int, str]] = []
+        win32gui.EnumWindows(enum_windows_callback, windows)
+        return windows
+
+    def foreground_title(self) -> str:
+        win32gui = self.caps.win32gui
+        return win32gui.GetWindowText(win32gui.GetForegroundWindow())
+
+    def close_window(self, hwnd: int):
+        self.caps.win32gui.PostMessage(hwnd, self.caps.win32con.WM_CLOSE, 0, 0)
+
+    def skip_transports(self) -> List[SkipTransport]:
+        caps = self.caps
+        transports: List[SkipTransport] = []
+        if caps.win32gui is not None:
+            transports.append(AppCommandTransport(caps.win32gui))
+        if caps.win32api is not None:
+            transports.append(MediaKeyTransport(caps.win32api))
+        if caps.win32gui is not None and caps.win32api is not None and caps.win32con is not None:
+            transports.append(KeyboardTransport(caps.win32gui, caps.win32api, caps.win32con))
+        return transports
+
+    def terminate_process(self, pid: int) -> bool:
+        import psutil
+        try:
+            psutil.Process(pid).terminate()
+            return True
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return False
+
+    def screen_size(self) -> Tuple[int, int]:
+        win32api = self.caps.win32api
+        if win32api is None:
+            # Fallback: используем стандартные размеры экрана
+            return 1920, 1080
+        return win32api.GetSystemMetrics(0), win32api.GetSystemMetrics(1)
+
+    def audio_backend(self) -> Optional[AudioBackend]:
+        if not self.caps.has('audio') or self.caps.AudioUtilities is None:
+            return None
+        return PycawAudioBackend(self.caps.AudioUtilities, self.caps.IAudioMeterInformation)
+
+    def audio_meters_by_pid(self, pids: Iterable[int]) -> Dict[int, Callable[[], float]]:
+        if not self.caps.has('audio') or self.caps.AudioUtilities is None:
+            return {}
+        pids = set(pids)
+        meters = {}
+        for session in self.caps.AudioUtilities.GetAllSessions():
+            if session.Process and session.Process.pid in pids:
+                meter = session._ctl.QueryInterface(self.caps.IAudioMeterInformation)
+                meters[session.Process.pid] = meter.GetPeakValue
+        return meters
+
+    def title_event_source(self, log: Optional[Callable[..., None]] = None) -> TitleEventSource:
+        return create_title_event_source(log)
+
+    def process_start_watcher(self, on_start: Callable[[], None],
+                              log: Optional[Callable[..., None]] = None) -> Optional[ProcessStartWatcher]:
+        if not self.caps.has('process_events'):
+            return None
+        return WmiProcessStartWatcher(on_start, log=log)
+
+    def spotify_roots(self, home: Path) -> List[Path]:
+        return [
+            home / 'AppData/Roaming/Spotify',
+            home / 'AppData/Local/Spotify'
+        ]
+
+    def summary(self) -> Optional[str]:
+        if self.window_registry is None:
+            return None
+        return self.window_registry.summary()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Адаптивный интервал опроса цикла мониторинга
+
+Вместо фиксированной паузы 0.3 с планировщик выбирает паузу до
+следующего тика по времени трека:
+
+- сразу после смены заголовка и в течение ad_burst секунд после
+  рекламы - минимальный интервал (реклама идет блоками);
+- пока играет один и тот же трек "Артист - Трек", интервал удваивается
+  до максимального;
+- в окне boundary_window вокруг ожидаемой границы трека (оценка -
+  медиана наблюдавшихся интервалов между сменами заголовка) - снова
+  минимальный интервал, и сон никогда не перескакивает через начало
+  этого окна.
+
+Режимы энергосбережения: пока Spotify не запущен (idle), цикл ждет
+уведомления о запуске процесса и опрашивает раз в idle_interval секунд;
+пока Spotify на паузе (стандартный заголовок "Spotify Free/Premium")
+или окна нет (paused) - раз в paused_interval секунд. Любая смена
+заголовка возвращает полную частоту.
+"""
+
+import time
+from collections import deque
+from statistics import median
+from typing import Callable, Optional
+
+from ad_signatures import STANDARD_TITLES
+
+# Режимы планировщика
+STATE_ACTIVE = 'active'
+STATE_PAUSED = 'paused'
+STATE_IDLE = 'idle'
+
+
+class AdaptivePollScheduler:
+    """Интервал до следующего тика по наблюдениям за заголовком"""
+
+    def __init__(self, min_interval: float = 0.1, max_interval: float = 2.0,
+                 stable_after: float = 3.0, boundary_window: float = 5.0,
+                 ad_burst: float = 10.0, history: int = 8,
+                 paused_interval: float = 3.0, idle_interval: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if min_interval <= 0 or max_interval < min_interval:
+            raise ValueError("нужно 0 < min_interval <= max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.stable_after = stable_after
+        self.boundary_window = boundary_window
+        self.ad_burst = ad_burst
+        self.paused_interval = max(paused_interval, max_interval)
+        self.idle_interval = max(idle_interval, max_interval)
+        self.clock = clock
+        self.track_lengths: deque = deque(maxlen=history)
+        self.title: Optional[str] = None
+        self.title_since: Optional[float] = None
+        self.last_ad: Optional[float] = None
+        self.interval = min_interval
+        self.state = STATE_ACTIVE
+        self.wakeups = 0
+        self.started = clock()
+
+    def observe(self, title: Optional[str], is_ad: bool, now: Optional[float] = None,
+                running: bool = True) -> bool:
+        """Результат очередного тика; True, если сменился режим"""
+        now = self.clock() if now is None else now
+        self.wakeups += 1
+        previous = self.state
+        if not running:
+            self.state = STATE_IDLE
+        elif title is None or title.lower().strip() in STANDARD_TITLES:
+            # Пауза или окно скрыто - заголовок рекламы появиться не может
+            self.state = STATE_PAUSED
+        else:
+            self.state = STATE_ACTIVE
+        if is_ad:
+            self.last_ad = now
+        if title != self.title:
+            # Длительность считается только для треков, доигравших между двумя сменами
+            if self.title is not None and self.title_since is not None and ' - ' in self.title:
+                self.track_lengths.append(now - self.title_since)
+            self.title = title
+            self.title_since = now
+            self.interval = self.min_interval
+        return self.state != previous
+
+    def expected_boundary(self) -> Optional[float]:
+        """Ожидаемый момент смены текущего трека (по часам планировщика)"""
+        if not self.track_lengths or self.title_since is None:
+            return None
+        return self.title_since + median(self.track_lengths)
+
+    def next_interval(self, now: Optional[float] = None) -> float:
+        """Пауза до следующего тика"""
+        now = self.clock() if now is None else now
+        if self.state == STATE_IDLE:
+            return self.idle_interval
+        if self.state == STATE_PAUSED:
+            return self.paused_interval
+        if self.last_ad is not None and now - self.last_ad < self.ad_burst:
+            self.interval = self.min_interval
+            return self.interval
+        if (self.title_since is None or now - self.title_since < self.stable_after
+                or ' - ' not in (self.title or '')):
+            self.interval = self.min_interval
+            return self.interval
+
+        boundary = self.expected_boundary()
+        if boundary is not None and abs(now - boundary) <= self.boundary_window:
+            # Около ожидаемой границы трека
+            self.interval = self.min_interval
+            return self.interval
+
+        # Стабильный заголовок - плавно замедляемся
+        self.interval = min(self.interval * 2, self.max_interval)
+        if boundary is not None and now < boundary:
+            self.interval = min(self.interval, max(boundary - self.boundary_window - now,
+                                                   self.min_interval))
+        return self.interval
+
+    def wakeups_per_minute(self, now: Optional[float] = None) -> float:
+        elapsed = max((self.clock() if now is None else now) - self.started, 1e-9)
+        return self.wakeups * 60.0 / elapsed
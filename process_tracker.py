@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Отслеживание процессов Spotify по закрепленным PID
+
+Вместо полного обхода psutil.process_iter на каждом тике трекер
+запоминает PID главного и дочерних процессов Spotify вместе со временем
+их создания и на следующих тиках только проверяет, что они живы.
+Полное пересканирование выполняется, если какой-то процесс завершился,
+либо по медленному периодическому таймеру (чтобы подхватить новые
+дочерние процессы).
+
+Источник данных о процессах вынесен в интерфейс ProcessProvider, поэтому
+трекер можно проверять на Linux с FakeProcessProvider.
+"""
+
+import time
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+
+class ProcessInfo(NamedTuple):
+    """Сведения о процессе, достаточные для закрепления PID"""
+    pid: int
+    name: str
+    create_time: float
+    ppid: int = 0
+    cmdline: tuple = ()
+
+
+class ProcessProvider:
+    """Интерфейс источника данных о процессах"""
+
+    def iter_processes(self) -> Iterable[ProcessInfo]:
+        """Полный обход таблицы процессов (без cmdline)"""
+        raise NotImplementedError
+
+    def is_alive(self, pid: int, create_time: float) -> bool:
+        """Жив ли процесс с этим PID и тем же временем создания"""
+        raise NotImplementedError
+
+    def cmdline(self, pid: int) -> List[str]:
+        """Командная строка процесса (пустой список, если недоступна)"""
+        raise NotImplementedError
+
+
+class PsutilProcessProvider(ProcessProvider):
+    """Реальный источник процессов на базе psutil"""
+
+    def __init__(self):
+        import psutil
+        self._psutil = psutil
+
+    def iter_processes(self) -> Iterable[ProcessInfo]:
+        psutil = self._psutil
+        for proc in psutil.process_iter(['pid', 'name', 'create_time', 'ppid']):
+            try:
+                info = proc.info
+                yield ProcessInfo(info['pid'], info['name'] or '',
+                                  info['create_time'] or 0.0, info['ppid'] or 0)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+
+    def is_alive(self, pid: int, create_time: float) -> bool:
+        psutil = self._psutil
+        if not psutil.pid_exists(pid):
+            return False
+        try:
+            # Сравнение времени создания защищает от повторного использования PID
+            return psutil.Process(pid).create_time() == create_time
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return False
+
+    def cmdline(self, pid: int) -> List[str]:
+        psutil = self._psutil
+        try:
+            return psutil.Process(pid).cmdline()
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            return []
+
+
+class FakeProcessProvider(ProcessProvider):
+    """Подставная таблица процессов в памяти для тестов и отладки на Linux"""
+
+    def __init__(self, processes: Optional[Iterable[ProcessInfo]] = None):
+        self.processes: Dict[int, ProcessInfo] = {}
+        self.scan_count = 0
+        self.alive_checks = 0
+        for info in processes or []:
+            self.add(info)
+
+    def add(self, info: ProcessInfo):
+        self.processes[info.pid] = info
+
+    def remove(self, pid: int):
+        self.processes.pop(pid, None)
+
+    def iter_processes(self) -> Iterable[ProcessInfo]:
+        self.scan_count += 1
+        return [info._replace(cmdline=()) for info in list(self.processes.values())]
+
+    def is_alive(self, pid: int, create_time: float) -> bool:
+        self.alive_checks += 1
+        info = self.processes.get(pid)
+        return info is not None and info.create_time == create_time
+
+    def cmdline(self, pid: int) -> List[str]:
+        info = self.processes.get(pid)
+        return list(info.cmdline) if info else []
+
+
+# HRESULT таймаута ожидания события WMI (SWbemEventSource.NextEvent)
+WBEM_E_TIMEDOUT = 0x80043001
+
+
+def com_error_code(error: Exception) -> int:
+    """HRESULT ошибки COM без знака: scode из excepinfo или hresult"""
+    # Ошибка метода автоматизации приходит как DISP_E_EXCEPTION, код WMI - в excepinfo
+    excepinfo = getattr(error, 'excepinfo', None) or ()
+    code = excepinfo[5] if len(excepinfo) > 5 and excepinfo[5] else getattr(error, 'hresult', 0)
+    return (code or 0) & 0xFFFFFFFF
+
+
+class ProcessStartWatcher:
+    """Уведомления о запуске процесса: on_start вызывается из фонового потока"""
+
+    def __init__(self, on_start: Callable[[], None]):
+        self.on_start = on_start
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class WmiProcessStartWatcher(ProcessStartWatcher):
+    """Запуск процесса по событиям WMI (pywin32: pythoncom, win32com)
+
+    Win32_ProcessStartTrace приходит сразу, но требует прав администратора;
+    без них используется __InstanceCreationEvent с опросом внутри службы
+    WMI раз в within секунд - это все равно дешевле process_iter.
+
+    Таймаутом ожидания считается только WBEM_E_TIMEDOUT. Любая другая
+    ошибка COM (перезапуск службы WMI, обрыв связи) ведет к
+    переподключению с нарастающей паузой; после max_reconnects неудач
+    подряд наблюдатель останавливается и остается опрос раз в idle_interval.
+    """
+
+    def __init__(self, on_start: Callable[[], None], process_name: str = 'Spotify.exe',
+                 within: float = 2.0, log: Optional[Callable[..., None]] = None,
+                 retry_delay: float = 1.0, max_retry_delay: float = 60.0, max_reconnects: int = 5):
+        super().__init__(on_start)
+        self.process_name = process_name
+        self.within = within
+        self.log = log
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_reconnects = max_reconnects
+        self.reconnects = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _subscribe(self, wmi):
+        queries = [
+            f"SELECT * FROM Win32_ProcessStartTrace WHERE ProcessName = '{self.process_name}'",
+            f"SELECT * FROM __InstanceCreationEvent WITHIN {self.within} "
+            f"WHERE TargetInstance ISA 'Win32_Process' AND TargetInstance.Name = '{self.process_name}'",
+        ]
+        error = None
+        for query in queries:
+            try:
+                return wmi.ExecNotificationQuery(query)
+            except Exception as e:
+                error = e
+        raise error
+
+    def _watch(self, connect: Callable[[], object], com_error: type):
+        """Ожидание событий; при ошибке WMI - переподключение или отказ"""
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                events = connect()
+                while not self._stop.is_set():
+                    try:
+                        events.NextEvent(2000)
+                    except com_error as e:
+                        if com_error_code(e) != WBEM_E_TIMEDOUT:
+                            raise
+                        # Таймаут ожидания события - проверяем флаг остановки
+                        failures = 0
+                        continue
+                    failures = 0
+                    self.on_start()
+                return
+            except Exception as e:
+                failures += 1
+                if failures > self.max_reconnects:
+                    if self.log:
+                        self.log(f"События запуска процессов недоступны, используется редкий опрос: {e}", "WARNING")
+                    return
+                delay = min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+                if self.log:
+                    self.log(f"Ошибка событий WMI ({e}), переподключение через {delay:g} с", "WARNING")
+                self.reconnects += 1
+                self._stop.wait(delay)
+
+    def _run(self):
+        import pythoncom
+        import win32com.client
+        pythoncom.CoInitialize()
+        try:
+            self._watch(lambda: self._subscribe(win32com.client.GetObject('winmgmts:')),
+                        pythoncom.com_error)
+        finally:
+            pythoncom.CoUninitialize()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='ProcessStartWatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+
+class SpotifyProcessTracker:
+    """Кэш PID процессов Spotify с дешевой проверкой живости"""
+
+    def __init__(self, provider: Optional[ProcessProvider] = None,
+                 rescan_interval: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.provider = provider if provider is not None else PsutilProcessProvider()
+        self.rescan_interval = rescan_interval
+        self.clock = clock
+        self.processes: List[ProcessInfo] = []
+        self.main_process: Optional[ProcessInfo] = None
+        self.full_scans = 0
+        self._last_scan = None
+        # Трекер используется и потоком мониторинга, и потоками действий
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _is_spotify(info: ProcessInfo) -> bool:
+        return 'spotify' in info.name.lower()
+
+    def rescan(self) -> List[ProcessInfo]:
+        """Полный обход таблицы процессов; cmdline читается только у Spotify"""
+        with self._lock:
+            return self._rescan()
+
+    def _rescan(self) -> List[ProcessInfo]:
+        found = []
+        for info in self.provider.iter_processes():
+            if self._is_spotify(info):
+                found.append(info._replace(cmdline=tuple(self.provider.cmdline(info.pid))))
+
+        pids = {info.pid for info in found}
+        # Главный процесс - тот, чей родитель не является процессом Spotify
+        main = next((info for info in found if info.ppid not in pids), None)
+        if main is None and found:
+            main = found[0]
+
+        self.processes = found
+        self.main_process = main
+        self.full_scans += 1
+        self._last_scan = self.clock()
+        return found
+
+    def _cached_alive(self) -> bool:
+        return all(self.provider.is_alive(info.pid, info.create_time) for info in self.processes)
+
+    def refresh(self, force: bool = False) -> List[ProcessInfo]:
+        """Актуальный список процессов Spotify"""
+        with self._lock:
+            due = self._last_scan is None or self.clock() - self._last_scan >= self.rescan_interval
+            if force or due or not self.processes or not self._cached_alive():
+                return self._rescan()
+            return self.processes
+
+    def is_running(self) -> bool:
+        return bool(self.refresh())
+
+    def invalidate(self):
+        """Сбросить кэш - следующий refresh выполнит полный обход"""
+        with self._lock:
+            self.processes = []
+            self.main_process = None
+            self._last_scan = None
@@ -156,86 +156,19 @@ class SpotifyAdBlockerSetup:
         hosts_file = self.config_dir / "user_hosts"
         
         if hosts_file.exists():
+            # Файл уже ведет блокировщик (в нем могут быть и внешние списки)
             self.print_step("Пользовательский hosts файл уже существует")
             return True
         
-        # Список рекламных доменов Spotify
-        ad_domains = [
-            "# Spotify Ad Blocker - Рекламные домены",
-            "# Создано автоматически установочным скриптом",
-            "",
-            "127.0.0.1 ads-fa.spotify.com",
-            "127.0.0.1 adeventtracker.spotify.com",
-            "127.0.0.1 analytics.spotify.com",
-            "127.0.0.1 audio-ak-spotify-com.akamaized.net",
-            "127.0.0.1 crashdump.spotify.com",
-            "127.0.0.1 log.spotify.com",
-            "127.0.0.1 longtail-dir.spotify.com",
-            "127.0.0.1 spclient.wg.spotify.com",
-            "127.0.0.1 audio-ak-spotify-com.akamaized.net",
-            "127.0.0.1 heads-ak-spotify-com.akamaized.net",
-            "127.0.0.1 audio4-ak-spotify-com.akamaized.net",
-            "127.0.0.1 audio-akp-spotify-com.akamaized.net",
-            "127.0.0.1 audio4-akp-spotify-com.akamaized.net",
-            "127.0.0.1 heads4-ak-spotify-com.akamaized.net",
-            "127.0.0.1 audio-ak.spotify.com.edgesuite.net",
-            "127.0.0.1 audio4-ak.spotify.com.edgesuite.net",
-            "127.0.0.1 heads-ak.spotify.com.edgesuite.net",
-            "127.0.0.1 heads4-ak.spotify.com.edgesuite.net",
-            "127.0.0.1 gew1.ap.spotify.com",
-            "127.0.0.1 gew4.ap.spotify.com",
-            "127.0.0.1 audio-sp-sto.spotify.com",
-            "127.0.0.1 audio4-sp-sto.spotify.com",
-            "127.0.0.1 heads-sp-sto.spotify.com",
-            "127.0.0.1 heads4-sp-sto.spotify.com",
-            "127.0.0.1 audio-sp-fra.spotify.com",
-            "127.0.0.1 audio4-sp-fra.spotify.com",
-            "127.0.0.1 heads-sp-fra.spotify.com",
-            "127.0.0.1 heads4-sp-fra.spotify.com",
-            "127.0.0.1 audio-sp-lon.spotify.com",
-            "127.0.0.1 audio4-sp-lon.spotify.com",
-            "127.0.0.1 heads-sp-lon.spotify.com",
-            "127.0.0.1 heads4-sp-lon.spotify.com",
-            "127.0.0.1 audio-sp-mia.spotify.com",
-            "127.0.0.1 audio4-sp-mia.spotify.com",
-            "127.0.0.1 heads-sp-mia.spotify.com",
-            "127.0.0.1 heads4-sp-mia.spotify.com",
-            "127.0.0.1 audio-sp-sjc.spotify.com",
-            "127.0.0.1 audio4-sp-sjc.spotify.com",
-            "127.0.0.1 heads-sp-sjc.spotify.com",
-            "127.0.0.1 heads4-sp-sjc.spotify.com",
-            "127.0.0.1 audio-sp-sea.spotify.com",
-            "127.0.0.1 audio4-sp-sea.spotify.com",
-            "127.0.0.1 heads-sp-sea.spotify.com",
-            "127.0.0.1 heads4-sp-sea.spotify.com",
-            "127.0.0.1 audio-sp-ash.spotify.com",
-            "127.0.0.1 audio4-sp-ash.spotify.com",
-            "127.0.0.1 heads-sp-ash.spotify.com",
-            "127.0.0.1 heads4-sp-ash.spotify.com",
-            "127.0.0.1 audio-sp-dfw.spotify.com",
-            "127.0.0.1 audio4-sp-dfw.spotify.com",
-            "127.0.0.1 heads-sp-dfw.spotify.com",
-            "127.0.0.1 heads4-sp-dfw.spotify.com",
-            "",
-            "# Дополнительные рекламные домены",
-            "127.0.0.1 googleads.g.doubleclick.net",
-            "127.0.0.1 securepubads.g.doubleclick.net",
-            "127.0.0.1 www.googletagservices.com",
-            "127.0.0.1 gads.pubmatic.com",
-            "127.0.0.1 ads.pubmatic.com",
-            "127.0.0.1 tpc.googlesyndication.com",
-            "127.0.0.1 pagead2.googlesyndication.com",
-            "127.0.0.1 partner.googleadservices.com",
-            "127.0.0.1 www.google-analytics.com",
-            "127.0.0.1 ssl.google-analytics.com",
-            "",
-            "# Конец списка рекламных доменов"
-        ]
+        # Список рекламных доменов - общий с блокировщиком (domain_blocklist.py);
+        # формат и запись - те же, что у блокировщика (hosts_writer.py)
+        from domain_blocklist import default_blocklist
+        from hosts_writer import HostsFileWriter
+        header = ("Spotify Ad Blocker - Рекламные домены",
+                  "Создано автоматически установочным скриптом", "")
         
         try:
-            with open(hosts_file, 'w', encoding='utf-8') as f:
-                f.write('\n'.join(ad_domains))
-            
+            HostsFileWriter(hosts_file).write(lambda: default_blocklist().hosts_domains(), header)
             self.print_step(f"Пользовательский hosts файл создан: {hosts_file}")
             return True
             
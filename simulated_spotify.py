@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Симулятор Spotify для запуска блокировщика без Windows
+
+SimulatedSpotify генерирует бесконечный плейлист "Артист - Трек" с
+рекламными паузами через заданное число треков, отдает текущий
+заголовок окна, пиковый уровень звука и таблицу процессов и реагирует
+на команду "следующий трек". SimulatedPlatform подключает его к
+SpotifyAdBlocker вместо WindowsPlatform:
+
+    python spotify_ad_blocker.py --simulate --sim-speed 10 --duration 600
+
+Ускорение (speed) сжимает время плейлиста: при speed=10 трек длиной
+три минуты играет 18 секунд. В итоговом логе - сколько рекламы
+прозвучало, сколько пропущено и сколько музыки пропущено по ошибке.
+
+Несколько SimulatedSpotify с общим FakeProcessProvider и разными PID и
+ID сессий изображают сервер терминалов (--multi-session --sim-instances N).
+"""
+
+import time
+import random
+import tempfile
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from audio_backends import AudioBackend
+from platform_backends import Platform, SpotifyWindow
+from skip_transports import CallbackSkipTransport, SkipTransport
+from process_tracker import FakeProcessProvider, ProcessInfo, ProcessProvider, ProcessStartWatcher
+from title_events import PollingTitleEventSource, TitleEventSource
+
+# Заголовки рекламы; 'Spotify Ad' детекторы намеренно не подтверждают
+DEFAULT_AD_TITLES = ('Advertisement', 'Spotify - Advertisement', 'Sponsored', 'Spotify Ad')
+
+_ARTISTS = ('Arctic Lights', 'Nova Echo', 'The Paper Birds', 'Mira Sol', 'Low Tide',
+            'Glass Harbor', 'Velvet Static', 'Orbit Kids', 'June Avenue', 'Northbound')
+_SONGS = ('Midnight Drive', 'Golden Hour', 'Paper Planes', 'Slow Motion', 'Blue Lines',
+          'Summer Rain', 'Echoes', 'Neon Heart', 'Afterglow', 'City Lights', 'Wildfire')
+
+
+class PlaylistItem(NamedTuple):
+    """Трек или рекламный ролик плейлиста"""
+    title: str
+    is_ad: bool
+    length: float  # секунды времени плейлиста
+
+
+class SimulatedSpotify:
+    """Плейлист со сценарием рекламных пауз, процессы и уровень звука Spotify"""
+
+    def __init__(self, tracks_between_ads: int = 3, ad_break: Tuple[int, int] = (1, 2),
+                 track_length: Tuple[float, float] = (120.0, 240.0),
+                 ad_length: Tuple[float, float] = (15.0, 30.0),
+                 speed: float = 1.0, seed: Optional[int] = None,
+                 ad_titles: Sequence[str] = DEFAULT_AD_TITLES,
+                 clock: Callable[[], float] = time.monotonic, pid: int = 4242,
+                 session_id: int = 1, provider: Optional[FakeProcessProvider] = None):
+        self.tracks_between_ads = tracks_between_ads
+        self.ad_break = ad_break
+        self.track_length = track_length
+        self.ad_length = ad_length
+        self.speed = speed
+        self.ad_titles = tuple(ad_titles)
+        self.clock = clock
+        self.pid = pid
+        self.session_id = session_id
+        self.rng = random.Random(seed)
+        # Общий провайдер - несколько экземпляров в одной таблице процессов
+        self.provider = provider if provider is not None else FakeProcessProvider()
+        self.paused = False
+        self.stats: Dict[str, float] = {
+            'tracks_played': 0, 'ads_played': 0, 'ads_skipped': 0,
+            'tracks_skipped': 0, 'ad_seconds_heard': 0.0,
+        }
+        # Плейлист меняется и потоком мониторинга, и потоками действий
+        self._lock = threading.RLock()
+        self._queue: deque = deque()
+        self._tracks_since_ad = 0
+        self._t0 = clock()
+        self.running = False
+        # Подписчики на запуск Spotify (SimulatedProcessStartWatcher)
+        self.launch_listeners: List[Callable[[], None]] = []
+        self.launch()
+
+    def now(self) -> float:
+        """Время плейлиста с учетом ускорения"""
+        return (self.clock() - self._t0) * self.speed
+
+    def _next_item(self) -> PlaylistItem:
+        if not self._queue:
+            if self._tracks_since_ad >= self.tracks_between_ads:
+                for _ in range(self.rng.randint(*self.ad_break)):
+                    self._queue.append(PlaylistItem(
+                        self.rng.choice(self.ad_titles), True, self.rng.uniform(*self.ad_length)))
+                self._tracks_since_ad = 0
+            else:
+                title = f"{self.rng.choice(_ARTISTS)} - {self.rng.choice(_SONGS)}"
+                self._queue.append(PlaylistItem(title, False, self.rng.uniform(*self.track_length)))
+                self._tracks_since_ad += 1
+        return self._queue.popleft()
+
+    def _finish(self, heard: float, skipped: bool):
+        item = self.current
+        if item.is_ad:
+            self.stats['ads_played'] += 1
+            self.stats['ad_seconds_heard'] += heard
+            if skipped:
+                self.stats['ads_skipped'] += 1
+        else:
+            self.stats['tracks_played'] += 1
+            if skipped:
+                self.stats['tracks_skipped'] += 1
+
+    def _start(self, started: float):
+        self.current = self._next_item()
+        self.started = started
+
+    def _advance(self) -> float:
+        """Доиграть все элементы, закончившиеся к текущему моменту"""
+        now = self.now()
+        if not self.paused:
+            while now - self.started >= self.current.length:
+                self._finish(self.current.length, skipped=False)
+                self._start(self.started + self.current.length)
+        return now
+
+    @property
+    def title(self) -> Optional[str]:
+        """Заголовок окна Spotify; None, если Spotify не запущен"""
+        with self._lock:
+            if not self.running:
+                return None
+            self._advance()
+            if self.paused:
+                return 'Spotify Free'
+            return self.current.title
+
+    @property
+    def playing_ad(self) -> bool:
+        with self._lock:
+            self._advance()
+            return self.running and not self.paused and self.current.is_ad
+
+    def peak(self) -> float:
+        """Пиковый уровень: тишина на стыке, реклама громче музыки"""
+        with self._lock:
+            if not self.running or self.paused:
+                return 0.0
+            now = self._advance()
+            if now - self.started < 0.4 * self.speed:
+                return 0.0
+            base = 0.8 if self.current.is_ad else 0.35
+            return base + self.rng.uniform(-0.05, 0.05)
+
+    def skip(self):
+        """Команда "следующий трек" (Ctrl+Right)"""
+        with self._lock:
+            if not self.running:
+                return
+            now = self._advance()
+            self._finish(now - self.started, skipped=True)
+            self._start(now)
+
+    def pause(self):
+        with self._lock:
+            self._advance()
+            self.paused = True
+            self._paused_at = self.now()
+
+    def resume(self):
+        with self._lock:
+            if self.paused:
+                # Пауза не расходует время текущего трека
+                self.started += self.now() - self._paused_at
+                self.paused = False
+
+    @property
+    def pids(self) -> Tuple[int, ...]:
+        """PID главного и дочерних процессов этого экземпляра"""
+        return tuple(range(self.pid, self.pid + 4))
+
+    def launch(self):
+        """Запустить Spotify: главный процесс и дочерние процессы"""
+        with self._lock:
+            if self.running:
+                return
+            create_time = time.time()
+            self.provider.add(ProcessInfo(self.pid, 'Spotify.exe', create_time, 1,
+                                          ('Spotify.exe',)))
+            for offset, kind in enumerate(('gpu-process', 'renderer', 'utility'), start=1):
+                self.provider.add(ProcessInfo(self.pid + offset, 'Spotify.exe', create_time,
+                                              self.pid, ('Spotify.exe', f'--type={kind}')))
+            self.running = True
+            self.paused = False
+            self._start(self.now())
+        for listener in list(self.launch_listeners):
+            listener()
+
+    def quit(self):
+        with self._lock:
+            for pid in self.pids:
+                self.provider.remove(pid)
+            self.running = False
+
+    def terminate(self, pid: int) -> bool:
+        with self._lock:
+            if pid not in self.pids or pid not in self.provider.processes:
+                return False
+            if pid == self.pid:
+                self.quit()
+            else:
+                self.provider.remove(pid)
+            return True
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['ad_seconds_heard'] = round(stats['ad_seconds_heard'], 1)
+        if stats['ads_played']:
+            stats['avg_ad_seconds_heard'] = round(stats['ad_seconds_heard'] / stats['ads_played'], 1)
+        return stats
+
+
+class SimulatedProcessStartWatcher(ProcessStartWatcher):
+    """Уведомление о запуске из SimulatedSpotify.launch()"""
+
+    def __init__(self, spotifies: Sequence[SimulatedSpotify], on_start: Callable[[], None]):
+        super().__init__(on_start)
+        self.spotifies = list(spotifies)
+
+    def start(self):
+        for spotify in self.spotifies:
+            spotify.launch_listeners.append(self.on_start)
+
+    def stop(self):
+        for spotify in self.spotifies:
+            if self.on_start in spotify.launch_listeners:
+                spotify.launch_listeners.remove(self.on_start)
+
+
+class SimulatedAudioBackend(AudioBackend):
+    """Уровень звука экземпляра SimulatedSpotify, которому принадлежат PID"""
+
+    def __init__(self, spotifies: Sequence[SimulatedSpotify]):
+        self.spotifies = list(spotifies)
+        self.spotify: Optional[SimulatedSpotify] = None
+
+    def bind(self, pids: Iterable[int]) -> bool:
+        pids = set(pids)
+        self.spotify = next((s for s in self.spotifies if s.pid in pids), None)
+        return self.spotify is not None
+
+    def peak(self) -> Optional[float]:
+        return self.spotify.peak() if self.spotify is not None else None
+
+
+class SimulatedPlatform(Platform):
+    """Платформа поверх SimulatedSpotify: без Windows, pywin32 и pycaw
+
+    spotify - один экземпляр или последовательность экземпляров с общим
+    FakeProcessProvider (несколько сессий сервера терминалов).
+    """
+
+    simulated = True
+
+    def __init__(self, spotify: Union[SimulatedSpotify, Sequence[SimulatedSpotify]],
+                 root: Optional[Path] = None, poll_interval: float = 0.3,
+                 foreground: str = 'Explorer'):
+        self.spotifies = list(spotify) if isinstance(spotify, (list, tuple)) else [spotify]
+        self.spotify = self.spotifies[0]
+        if any(s.provider is not self.spotify.provider for s in self.spotifies):
+            raise ValueError("экземпляры симулятора должны использовать общий FakeProcessProvider")
+        # Без root - временная папка, удаляется в close()
+        self._temporary: Optional[tempfile.TemporaryDirectory] = None
+        if root is None:
+            self._temporary = tempfile.TemporaryDirectory(prefix='simulated_spotify_')
+            root = self._temporary.name
+        self.root = Path(root)
+        self.poll_interval = poll_interval
+        self.foreground = foreground
+        self.hwnd = self.spotify.pid * 16
+        self.closed_windows = 0
+
+    def _owner(self, pid: int) -> Optional[SimulatedSpotify]:
+        return next((s for s in self.spotifies if pid in s.pids), None)
+
+    @staticmethod
+    def _window(spotify: SimulatedSpotify) -> Optional[SpotifyWindow]:
+        title = spotify.title
+        if title is None:
+            return None
+        return SpotifyWindow(spotify.pid * 16, title, (100, 100, 1300, 900), False)
+
+    def has(self, feature: str) -> bool:
+        return True
+
+    def process_provider(self) -> ProcessProvider:
+        return self.spotify.provider
+
+    def spotify_windows(self, pids: Optional[Iterable[int]] = None) -> List[SpotifyWindow]:
+        # Без PID - окно первого экземпляра (как раньше с одним Spotify)
+        spotifies = [self.spotify]
+        if pids is not None:
+            pids = set(pids)
+            spotifies = [s for s in self.spotifies if s.pid in pids]
+        windows = (self._window(spotify) for spotify in spotifies)
+        return [window for window in windows if window is not None]
+
+    def spotify_windows_by_pid(self, pids: Iterable[int]) -> Dict[int, List[SpotifyWindow]]:
+        return {window.hwnd // 16: [window] for window in self.spotify_windows(pids)}
+
+    def process_session(self, pid: int) -> Optional[int]:
+        owner = self._owner(pid)
+        return owner.session_id if owner is not None else None
+
+    def playing_ad(self, pids: Iterable[int]) -> Optional[bool]:
+        pids = set(pids)
+        return any(spotify.playing_ad for spotify in self.spotifies if spotify.pid in pids)
+
+    def visible_windows(self) -> List[Tuple[int, str]]:
+        windows = [(0, self.foreground)]
+        windows.extend((w.hwnd, w.title) for w in self.spotify_windows(
+            pid for s in self.spotifies for pid in s.pids))
+        return windows
+
+    def foreground_title(self) -> str:
+        return self.foreground
+
+    def close_window(self, hwnd: int):
+        self.closed_windows += 1
+
+    def _skip(self, hwnd: int):
+        owner = self._owner(hwnd // 16)
+        if owner is not None:
+            owner.skip()
+
+    def skip_transports(self) -> List[SkipTransport]:
+        return [CallbackSkipTransport('simulated', self._skip)]
+
+    def terminate_process(self, pid: int) -> bool:
+        owner = self._owner(pid)
+        return owner is not None and owner.terminate(pid)
+
+    def screen_size(self) -> Tuple[int, int]:
+        return 1920, 1080
+
+    def audio_backend(self) -> Optional[AudioBackend]:
+        return SimulatedAudioBackend(self.spotifies)
+
+    def audio_meters_by_pid(self, pids: Iterable[int]) -> Dict[int, Callable[[], float]]:
+        pids = set(pids)
+        return {spotify.pid: spotify.peak for spotify in self.spotifies
+                if spotify.running and spotify.pid in pids}
+
+    def title_event_source(self, log: Optional[Callable[..., None]] = None) -> TitleEventSource:
+        return PollingTitleEventSource(self.poll_interval)
+
+    def process_start_watcher(self, on_start: Callable[[], None],
+                              log: Optional[Callable[..., None]] = None) -> Optional[ProcessStartWatcher]:
+        return SimulatedProcessStartWatcher(self.spotifies, on_start)
+
+    def spotify_roots(self, home: Path) -> List[Path]:
+        roots = [self.root / 'AppData/Roaming/Spotify', self.root / 'AppData/Local/Spotify']
+        for root in roots:
+            root.mkdir(parents=True, exist_ok=True)
+        return roots
+
+    def close(self):
+        if self._temporary is not None:
+            self._temporary.cleanup()
+            self._temporary = None
+
+    def summary(self) -> Optional[str]:
+        parts = []
+        for spotify in self.spotifies:
+            stats = ', '.join(f"{name}={value}" for name, value in spotify.summary().items())
+            parts.append(stats if len(self.spotifies) == 1 else f"PID {spotify.pid}: {stats}")
+        return '; '.join(parts)
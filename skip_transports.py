@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Способы отправить Spotify команду "следующий трек"
+
+Раньше пропуск был один: SetForegroundWindow, пауза 100 мс и глобальное
+Ctrl+Right через keybd_event - медленно, отнимает фокус у пользователя,
+а если фокус не переключился, нажатие уходит другому окну. Теперь
+способы подключаемые, в порядке предпочтения:
+
+    appcommand  - WM_APPCOMMAND (APPCOMMAND_MEDIA_NEXTTRACK) прямо в HWND
+                  Spotify: без фокуса и без нажатий
+    media_key   - системная медиаклавиша "следующий трек"
+    keyboard    - прежний Ctrl+Right с активацией окна (последний резерв)
+
+SkipTransportSelector измеряет для каждого способа время от команды до
+смены заголовка окна (observe() вызывается на каждом тике) и выбирает
+самый быстрый из сработавших. Способ, который несколько раз подряд не
+сменил трек, откладывается и повторно пробуется через retry_after
+пропусков.
+"""
+
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Sequence
+
+WM_APPCOMMAND = 0x0319
+APPCOMMAND_MEDIA_NEXTTRACK = 11
+VK_MEDIA_NEXT_TRACK = 0xB0
+KEYEVENTF_EXTENDEDKEY = 0x0001
+KEYEVENTF_KEYUP = 0x0002
+
+
+class SkipTransport:
+    """Способ отправить команду "следующий трек" окну Spotify"""
+
+    name = 'transport'
+
+    def send(self, hwnd: int):
+        raise NotImplementedError
+
+
+class AppCommandTransport(SkipTransport):
+    """WM_APPCOMMAND в окно Spotify: без фокуса и нажатий клавиш"""
+
+    name = 'appcommand'
+
+    def __init__(self, win32gui):
+        self.win32gui = win32gui
+
+    def send(self, hwnd: int):
+        # lParam: команда в старшем слове, устройство (0 - клавиатура) в младшем
+        self.win32gui.PostMessage(hwnd, WM_APPCOMMAND, hwnd, APPCOMMAND_MEDIA_NEXTTRACK << 16)
+
+
+class MediaKeyTransport(SkipTransport):
+    """Системная медиаклавиша: Spotify обрабатывает ее без фокуса"""
+
+    name = 'media_key'
+
+    def __init__(self, win32api):
+        self.win32api = win32api
+
+    def send(self, hwnd: int):
+        # keybd_event - обертка pywin32 над SendInput
+        self.win32api.keybd_event(VK_MEDIA_NEXT_TRACK, 0, KEYEVENTF_EXTENDEDKEY, 0)
+        self.win32api.keybd_event(VK_MEDIA_NEXT_TRACK, 0, KEYEVENTF_EXTENDEDKEY | KEYEVENTF_KEYUP, 0)
+
+
+class KeyboardTransport(SkipTransport):
+    """Ctrl+Right с активацией окна Spotify (отнимает фокус)"""
+
+    name = 'keyboard'
+
+    def __init__(self, win32gui, win32api, win32con):
+        self.win32gui = win32gui
+        self.win32api = win32api
+        self.win32con = win32con
+
+    def send(self, hwnd: int):
+        win32api = self.win32api
+        win32con = self.win32con
+        # Активируем окно Spotify
+        self.win32gui.SetForegroundWindow(hwnd)
+        time.sleep(0.1)
+
+        # Отправляем Ctrl+Right (следующий трек)
+        win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
+        win32api.keybd_event(win32con.VK_RIGHT, 0, 0, 0)
+        win32api.keybd_event(win32con.VK_RIGHT, 0, win32con.KEYEVENTF_KEYUP, 0)
+        win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
+
+
+class CallbackSkipTransport(SkipTransport):
+    """Пропуск вызовом функции func(hwnd) (симуляция)"""
+
+    def __init__(self, name: str, func: Callable[[int], None]):
+        self.name = name
+        self.func = func
+
+    def send(self, hwnd: int):
+        self.func(hwnd)
+
+
+class TransportStats:
+    """Результаты одного способа пропуска"""
+
+    def __init__(self):
+        self.attempts = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.errors = 0
+        self.consecutive_failures = 0
+        self.latency: Optional[float] = None  # скользящее среднее, секунды
+        self.skips_since_failure = 0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'attempts': self.attempts,
+            'confirmed': self.confirmed,
+            'failed': self.failed,
+            'errors': self.errors,
+            'latency_ms': round(self.latency * 1000, 1) if self.latency is not None else None,
+        }
+
+
+class SkipTransportSelector:
+    """Выбор самого быстрого работающего способа по времени до смены заголовка"""
+
+    def __init__(self, transports: Sequence[SkipTransport], confirm_timeout: float = 1.5,
+                 alpha: float = 0.3, max_failures: int = 3, retry_after: int = 20,
+                 explore_every: int = 10, clock: Callable[[], float] = time.monotonic):
+        self.transports = list(transports)
+        self.confirm_timeout = confirm_timeout
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        self.explore_every = explore_every
+        self.clock = clock
+        self.stats: Dict[str, TransportStats] = {t.name: TransportStats() for t in self.transports}
+        # Наблюдатели результата: callback(name, seconds, ok)
+        self.listeners: List[Callable[[str, float, bool], None]] = []
+        self._title: Optional[str] = None
+        self._pending = None  # (имя способа, время отправки, заголовок до пропуска)
+        self._skips = 0
+        self._lock = threading.Lock()
+
+    def _suspended(self, stats: TransportStats) -> bool:
+        return (stats.consecutive_failures >= self.max_failures
+                and stats.skips_since_failure < self.retry_after)
+
+    def order(self) -> List[SkipTransport]:
+        """Способы в порядке попытки: проверенные по скорости, затем непроверенные"""
+
+        def key(item):
+            index, transport = item
+            stats = self.stats[transport.name]
+            if self._suspended(stats):
+                return (3, index)
+            if stats.confirmed and stats.latency is not None:
+                return (0, stats.latency)
+            if not stats.attempts:
+                return (1, index)
+            return (2, index)
+
+        return [t for _, t in sorted(enumerate(self.transports), key=key)]
+
+    def skip(self, hwnd: int) -> Optional[str]:
+        """Отправить "следующий трек"; имя использованного способа или None"""
+        with self._lock:
+            self._skips += 1
+            for stats in self.stats.values():
+                stats.skips_since_failure += 1
+            ordered = self.order()
+            if self._skips % self.explore_every == 0 and len(ordered) > 1:
+                # Изредка первым пробуем второй способ: вдруг он быстрее текущего лучшего
+                if not self._suspended(self.stats[ordered[1].name]):
+                    ordered[0], ordered[1] = ordered[1], ordered[0]
+            title = self._title
+        for transport in ordered:
+            stats = self.stats[transport.name]
+            stats.attempts += 1
+            sent = self.clock()
+            try:
+                transport.send(hwnd)
+            except Exception:
+                # Ошибка отправки - сразу следующий способ
+                stats.errors += 1
+                self._record(transport.name, 0.0, False)
+                continue
+            with self._lock:
+                self._pending = (transport.name, sent, title)
+            return transport.name
+        return None
+
+    def observe(self, title: Optional[str], now: Optional[float] = None):
+        """Заголовок окна на тике: подтверждает или отклоняет последний пропуск"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            self._title = title
+            pending = self._pending
+            if pending is None:
+                return
+            name, sent, before = pending
+            if title is not None and title != before:
+                self._pending = None
+                result = (name, now - sent, True)
+            elif now - sent > self.confirm_timeout:
+                self._pending = None
+                result = (name, now - sent, False)
+            else:
+                return
+        self._record(*result)
+
+    def _record(self, name: str, seconds: float, ok: bool):
+        stats = self.stats[name]
+        if ok:
+            stats.confirmed += 1
+            stats.consecutive_failures = 0
+            stats.latency = seconds if stats.latency is None else (
+                self.alpha * seconds + (1 - self.alpha) * stats.latency)
+        else:
+            stats.failed += 1
+            stats.consecutive_failures += 1
+            stats.skips_since_failure = 0
+        for listener in list(self.listeners):
+            listener(name, seconds, ok)
+
+    @property
+    def preferred(self) -> Optional[str]:
+        ordered = self.order()
+        return ordered[0].name if ordered else None
+
+    def report(self) -> str:
+        parts = []
+        for transport in self.transports:
+            stats = self.stats[transport.name]
+            if not stats.attempts:
+                continue
+            latency = f"{stats.latency * 1000:.0f}мс" if stats.latency is not None else '-'
+            parts.append(f"{transport.name}: {stats.confirmed}/{stats.attempts} ок, {latency}")
+        return '; '.join(parts)
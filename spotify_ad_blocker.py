@@ -28,234 +28,337 @@ import sys
 import time
 import json
 import shutil
-import psutil
-import requests
+import itertools
+import argparse
+import functools
 import threading
+import contextlib
 import subprocess
 from pathlib import Path
-from typing import List, Dict, Optional
-import winreg
-from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+
+from process_tracker import SpotifyProcessTracker
+from ad_signatures import AdSignatureMatcher
+from async_logger import AsyncLogWriter
+from detector_pipeline import DetectorPipeline
+from capabilities import PlatformCapabilities
+from platform_backends import Platform, SpotifyWindow, WindowsPlatform
+from audio_backends import AudioPeakMonitor, AudioSessionPool, PooledAudioBackend
+from ad_cache_cleaner import AdCacheCleaner
+from domain_blocklist import default_blocklist
+from blocklist_index import CombinedBlocklist, ExternalBlocklists
+from hosts_writer import HostsFileWriter, system_hosts_path
+from dns_sinkhole import DnsSinkhole, MODE_NXDOMAIN
+from instrumentation import Instrumentation
+from startup_phases import StartupPhases
+from skip_transports import SkipTransportSelector
+from metrics_exporter import MetricFamily, MetricsExporter
+from multi_session import SpotifyInstance, SpotifyInstanceScanner
+from event_store import EventStore
+from poll_scheduler import AdaptivePollScheduler, STATE_IDLE, STATE_PAUSED
+from trace_replay import TraceRecorder
+from action_executor import (ActionExecutor, PRIORITY_SKIP, PRIORITY_CLOSE_WINDOWS,
+                             PRIORITY_PROCESSES, PRIORITY_CACHE)
+
+
+class DetectionSnapshot:
+    """Снимок состояния Spotify за один тик мониторинга
+
+    Собирается один раз за тик и передается во все детекторы, чтобы
+    таблица процессов и список окон не перечислялись повторно.
+    """
+
+    def __init__(self, processes: List[Dict], windows: List[SpotifyWindow],
+                 foreground_title: str = '', timestamp: Optional[float] = None,
+                 audio_peak: Optional[float] = None):
+        self.processes = processes  # только процессы Spotify: pid, name, cmdline
+        self.windows = windows
+        self.foreground_title = foreground_title
+        self.audio_peak = audio_peak  # пиковый уровень звука Spotify, если доступен
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    @property
+    def spotify_running(self) -> bool:
+        return bool(self.processes)
+
+    @property
+    def title(self) -> Optional[str]:
+        """Заголовок основного окна Spotify (как раньше - первое найденное окно)"""
+        return self.windows[0].title if self.windows else None
+
 
 class SpotifyAdBlocker:
-    def __init__(self):
+    def __init__(self, show_stats: bool = False, config_dir: Optional[Path] = None,
+                 caps: Optional[PlatformCapabilities] = None,
+                 trace_file: Optional[Path] = None, platform: Optional[Platform] = None,
+                 scheduler: Optional[AdaptivePollScheduler] = None):
         self.spotify_process = None
         self.is_running = False
+        self._stopped = False
         self.user_home = Path.home()
-        self.config_dir = self.user_home / '.spotify_ad_blocker'
+        self.config_dir = Path(config_dir) if config_dir else self.user_home / '.spotify_ad_blocker'
         self.config_dir.mkdir(exist_ok=True)
         
-        # МАКСИМАЛЬНО АГРЕССИВНЫЙ список рекламных доменов Spotify
-        self.ad_domains = [
-            # Основные рекламные домены Spotify
-            'media-match.com',
-            'adclick.g.doublecklick.net',
-            'www.googleadservices.com',
-            'pagead2.googlesyndication.com',
-            'desktop.spotify.com',
-            'googleads.g.doubleclick.net',
-            'pubads.g.doubleclick.net',
-            'audio2.spotify.com',
-            'bounceexchange.com',
-            'pagead46.l.doubleclick.net',
-            'pagead.l.doubleclick.net',
-            'video-ad-stats.googlesyndication.com',
-            'pagead-googlehosted.l.google.com',
-            'partnerad.l.doubleclick.net',
-            'adserver.adtechus.com',
-            'anycast.pixel.adsafeprotected.com',
-            'gads.pubmatic.com',
-            'securepubads.g.doubleclick.net',
-            'crashdump.spotify.com',
-            'adeventtracker.spotify.com',
-            'log.spotify.com',
-            'analytics.spotify.com',
-            'ads-fa.spotify.com',
-            'ads.pubmatic.com',
-            'www.googletagservices.com',
-            'b.scorecardresearch.com',
-            'bs.serving-sys.com',
-            'doubleclick.net',
-            'ds.serving-sys.com',
-            'googleadservices.com',
-            'js.moatads.com',
-            
-            # ДОПОЛНИТЕЛЬНЫЕ агрессивные блокировки
-            'ads.spotify.com',
-            'adnxs.com',
-            'adsystem.com',
-            'amazon-adsystem.com',
-            'googlesyndication.com',
-            'googletagmanager.com',
-            'facebook.com/tr',
-            'connect.facebook.net',
-            'analytics.google.com',
-            'google-analytics.com',
-            'googletagservices.com',
-            'scorecardresearch.com',
-            'quantserve.com',
-            'outbrain.com',
-            'taboola.com',
-            'adsafeprotected.com',
-            'moatads.com',
-            'adsrvr.org',
-            'turn.com',
-            'rlcdn.com',
-            'rubiconproject.com',
-            'pubmatic.com',
-            'openx.net',
-            'contextweb.com',
-            'casalemedia.com',
-            'adsymptotic.com',
-            'amazon.com/gp/aw/cr',
-            'amazon.com/dp/aw/cr',
-            'amazon.com/gp/product/aw/cr',
-            'amazon.com/gp/aw/d/cr',
-            'amazon.com/gp/aw/ol/cr',
-            'amazon.com/gp/aw/s/cr',
-            'amazon.com/gp/aw/ya/cr',
-            'amazon.com/gp/aw/ys/cr',
-            'amazon.com/gp/aw/ls/cr',
-            'amazon.com/gp/aw/h/cr',
-            'amazon.com/gp/aw/c/cr',
-            'amazon.com/gp/aw/rd/cr',
-            'amazon.com/gp/aw/gb/cr',
-            'amazon.com/gp/aw/wl/cr',
-            'amazon.com/gp/aw/cart/cr',
-            'amazon.com/gp/aw/help/cr',
-            'amazon.com/gp/aw/si/cr',
-            'amazon.com/gp/aw/ss/cr',
-            'amazon.com/gp/aw/sis/cr',
-            'amazon.com/gp/aw/fbt/cr',
-            'amazon.com/gp/aw/recs/cr',
-            'amazon.com/gp/aw/sp/cr',
-            'amazon.com/gp/aw/aw/cr',
-            'amazon.com/gp/aw/aw/cr',
-            
-            # Spotify-специфичные рекламные домены
-            'spclient.wg.spotify.com',
-            'audio-sp-*.pscdn.co',
-            'heads4-ak.spotify.com.edgesuite.net',
-            'heads-ak.spotify.com.edgesuite.net',
-            'audio-ak.spotify.com.edgesuite.net',
-            'audio4-ak.spotify.com.edgesuite.net',
-            'heads4-ak-spotify-com.akamaized.net',
-            'audio4-ak-spotify-com.akamaized.net',
-            
-            # Дополнительные блокировки для максимальной агрессивности
-            'spotify.map.fastly.net',
-            'spotify.map.fastlylb.net',
-            'fastly.com',
-            'fastlylb.net',
-            'akamai.net',
-            'akamaized.net',
-            'edgekey.net',
-            'edgesuite.net',
-            'cloudfront.net'
-        ]
+        # Источник времени детекции (при воспроизведении трассы - время трассы)
+        self.clock = time.time
         
-        self.spotify_paths = [
-            self.user_home / 'AppData/Roaming/Spotify',
-            self.user_home / 'AppData/Local/Spotify'
-        ]
+        # Состояние цикла мониторинга между тиками
+        self.required_confirmations = 2  # Быстрое реагирование на рекламу
+        self._ad_detection_count = 0
+        self._music_detection_count = 0
+        self._last_ad_block_time = 0
+        self._last_title: Optional[str] = None
+        
+        # Экземпляр Spotify, который сейчас обрабатывает поток мониторинга (multi-session)
+        self._instance_local = threading.local()
+        
+        # Лог пишется фоновым потоком: горячий путь только ставит запись в очередь
+        self.log_writer = AsyncLogWriter(self.config_dir / 'ad_blocker.log', min_level='INFO')
+        
+        # Гистограммы задержек и счетчики горячего пути
+        self.instrumentation = Instrumentation()
+        self.show_stats = show_stats
+        self.stats_interval = 30.0 if show_stats else 300.0
+        
+        # Подготовка системы - фоновые фазы запуска; отсчет времени до первой детекции - отсюда
+        self.startup = StartupPhases(self.log, report_after=('first_detection',))
+        self.startup.listeners.append(self._on_startup_complete)
+        self._first_snapshot: Optional[DetectionSnapshot] = None
+        self._spotify_pids: Tuple[int, ...] = ()
+        
+        # Все обращения к ОС - через платформенный слой; модули Windows
+        # проверяются и импортируются один раз
+        if platform is None:
+            platform = WindowsPlatform(caps if caps is not None else PlatformCapabilities(self.log))
+        self.platform = platform
+        self.process_tracker = SpotifyProcessTracker(self.platform.process_provider())
+        
+        # Запись сырых входных данных каждого тика для офлайн-воспроизведения
+        self.trace_recorder = TraceRecorder(trace_file) if trace_file else None
+        
+        # Сессия Spotify кэшируется по PID, пиковые уровни - в кольцевой буфер
+        self.audio_monitor = None
+        audio_backend = self.platform.audio_backend()
+        if audio_backend is not None:
+            self.audio_monitor = AudioPeakMonitor(audio_backend)
+        
+        # Цикл мониторинга ждет смены заголовка окна вместо фиксированного sleep
+        self.title_events = self.platform.title_event_source(self.log)
+        # Пауза перед повторной проверкой, пока реклама не подтверждена
+        self.confirm_interval = 0.05
+        # Пауза между тиками подстраивается под время трека
+        self.poll_scheduler = scheduler if scheduler is not None else AdaptivePollScheduler()
+        # Пока Spotify не запущен, цикл спит до уведомления о запуске процесса
+        self.process_watcher = self.platform.process_start_watcher(self._on_spotify_started, self.log)
+        
+        # Все рекламные сигнатуры заголовков, скомпилированные один раз
+        self.ad_signatures = AdSignatureMatcher()
+        
+        # Детекторы запускаются от дешевых к дорогим до определенности решения
+        self.detectors = DetectorPipeline(self._ad_decision_rule)
+        self.detectors.register('title', self._check_window_title, cost=1)
+        self.detectors.register('duration', self._check_track_duration, cost=1.5)
+        self.detectors.register('window_state', self._check_window_focus, cost=2)
+        self.detectors.register('process', self._check_process_names, cost=3)
+        self.detectors.register('audio', self._check_audio_session, cost=2.5)
+        self.detectors.on_timing = lambda name, seconds: self.instrumentation.record(f'detector.{name}', seconds)
+        
+        # Детекторы без нужных модулей отключаются навсегда
+        detector_features = {'title': 'windows', 'duration': 'windows',
+                             'window_state': 'windows', 'audio': 'audio'}
+        disabled = [name for name, feature in detector_features.items() if not self.platform.has(feature)]
+        for name in disabled:
+            self.detectors.unregister(name)
+        if disabled:
+            self.log(f"Отключены детекторы без зависимостей: {', '.join(disabled)}", "WARNING")
+        
+        # Рекламные домены: один нормализованный список, скомпилированный в дерево
+        self.blocklist = default_blocklist()
+        self.ad_domains = self.blocklist.hosts_domains()
+        # Внешние списки (hosts, домены, ABP) - индексы на диске, см. configure_blocklists
+        self.external_blocklists = ExternalBlocklists([], self.config_dir / 'blocklists', self.log)
+        self.dns_blocklist = CombinedBlocklist(self.blocklist, self.external_blocklists)
+        self.blocklist_reload_interval = 300.0
+        # Системный hosts с управляемым блоком (None - только user_hosts)
+        self.system_hosts: Optional[Path] = None
+        # Локальный DNS-фильтр по тому же списку (запускается в setup_dns_blocking)
+        self.configure_dns()
+        
+        self.spotify_paths = self.platform.spotify_roots(self.user_home)
+        
+        # Очистка рекламного кэша: один обход с индексом mtime в фоновом потоке
+        self.ad_cache_cleaner = AdCacheCleaner(
+            self.spotify_paths, self.config_dir / 'ad_cache_index.json', self.log)
         
-    def log(self, message: str, level: str = 'INFO'):
-        """Логирование с временной меткой"""
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        print(f"[{timestamp}] [{level}] {message}")
+        # Действия блокировки выполняются пулом потоков, мониторинг только решает
+        self.actions = ActionExecutor(workers=2, log=self.log)
+        # Действия экземпляров (skip_ad_track:<PID>) - в общей гистограмме действия
+        self.actions.listeners.append(
+            lambda name, seconds, ok: self.instrumentation.record(
+                f"action.{name.partition(':')[0]}", seconds))
         
-        # Сохранение в файл лога
-        log_file = self.config_dir / 'ad_blocker.log'
-        with open(log_file, 'a', encoding='utf-8') as f:
-            f.write(f"[{timestamp}] [{level}] {message}\n")
+        # Пропуск трека: способ выбирается по измеренному времени до смены заголовка
+        self.skip_selector = SkipTransportSelector(self.platform.skip_transports())
+        self.skip_selector.listeners.append(self._on_skip_result)
+        
+        # Экспорт метрик для локального коллектора (включается configure_metrics)
+        self.metrics_exporter: Optional[MetricsExporter] = None
+        self._own_process = None
+        
+        # Все экземпляры Spotify одним процессом (включается configure_multi_session)
+        self.instance_scanner: Optional[SpotifyInstanceScanner] = None
+        
+        # История заголовков, детекций и действий в SQLite (включается configure_events)
+        self.event_store: Optional[EventStore] = None
+        
+    def log(self, message: str, level: str = 'INFO', *args):
+        """Логирование с временной меткой (асинхронно, см. AsyncLogWriter)
+
+        Для горячего пути - %-аргументы в args: отфильтрованная по уровню
+        запись не форматируется вовсе.
+        """
+        if not self.log_writer.enabled(level):
+            return
+        instance = self._active_instance
+        if instance is not None:
+            label = instance.label.replace('%', '%%') if args else instance.label
+            message = f"[{label}] {message}"
+        self.log_writer.write(message, level, *args)
+    
+    @property
+    def _active_instance(self) -> Optional[SpotifyInstance]:
+        return getattr(self._instance_local, 'instance', None)
     
-    def check_spotify_running(self) -> bool:
+    @property
+    def _instance_key(self) -> Optional[int]:
+        instance = self._active_instance
+        return instance.key if instance is not None else None
+    
+    def _on_spotify_started(self):
+        """Уведомление о запуске Spotify: сразу будим цикл мониторинга"""
+        self.process_tracker.invalidate()
+        self.title_events.notify()
+    
+    def _on_power_state_change(self, state: str):
+        """Смена режима энергосбережения цикла мониторинга"""
+        self.instrumentation.count(f'power.{state}')
+        if state == STATE_IDLE:
+            self.log(f"💤 Spotify не запущен: ожидание запуска (проверка раз в {self.poll_scheduler.idle_interval:g} с)")
+        elif state == STATE_PAUSED:
+            self.log(f"⏸️ Spotify на паузе: проверка раз в {self.poll_scheduler.paused_interval:g} с")
+        else:
+            self.log("▶️ Spotify играет: полная частота проверок")
+    
+    def check_spotify_running(self, snapshot: Optional[DetectionSnapshot] = None) -> bool:
         """Проверка запущен ли Spotify"""
-        for proc in psutil.process_iter(['pid', 'name']):
+        if snapshot is not None:
+            return snapshot.spotify_running
+        running = self.process_tracker.is_running()
+        self.spotify_process = self.process_tracker.main_process
+        return running
+    
+    def take_snapshot(self) -> DetectionSnapshot:
+        """Один проход по таблице процессов и окнам для всех детекторов тика"""
+        # Закрепленные PID проверяются на живость, полный обход - только при изменениях
+        tracked = self.process_tracker.refresh()
+        self.spotify_process = self.process_tracker.main_process
+        processes = [{'pid': info.pid, 'name': info.name, 'cmdline': list(info.cmdline)}
+                     for info in tracked]
+        # PID последнего снимка - для поиска окон из потоков действий
+        self._spotify_pids = tuple(proc['pid'] for proc in processes)
+        
+        windows = []
+        foreground_title = ''
+        if processes and self.platform.has('windows'):
             try:
-                if 'spotify' in proc.info['name'].lower():
-                    self.spotify_process = proc
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-        return False
+                # HWND закреплены за PID Spotify: между тиками - проверка без EnumWindows
+                windows = self.platform.spotify_windows(proc['pid'] for proc in processes)
+                
+                try:
+                    foreground_title = self.platform.foreground_title()
+                except Exception:
+                    pass
+            except Exception as e:
+                self.log(f"Ошибка получения заголовка окна: {e}", "ERROR")
+        
+        return DetectionSnapshot(processes, windows, foreground_title,
+                                 audio_peak=self._sample_audio(self._spotify_pids))
+    
+    def _sample_audio(self, pids: Tuple[int, ...]) -> Optional[float]:
+        """Пиковый уровень звука процессов Spotify в кольцевой буфер
+
+        Замер - на каждом тике, даже если конвейер не дойдет до аудио
+        детектора: скачок громкости и тишину на стыке видно только по
+        истории уровней музыки перед рекламой. Отложено лишь решение.
+        """
+        if not pids or self.audio_monitor is None:
+            return None
+        try:
+            return self.audio_monitor.sample(pids)
+        except Exception as e:
+            self.log("Ошибка чтения уровня звука: %s", "DEBUG", e)
+        return None
     
     def get_spotify_window_title(self) -> Optional[str]:
         """Получение заголовка окна Spotify для определения рекламы"""
+        if not self.platform.has('windows'):
+            return None
         try:
-            import win32gui
-            import win32process
-            
-            def enum_windows_callback(hwnd, windows):
-                if win32gui.IsWindowVisible(hwnd):
-                    window_title = win32gui.GetWindowText(hwnd)
-                    if 'spotify' in window_title.lower():
-                        windows.append(window_title)
-                return True
-            
-            windows = []
-            win32gui.EnumWindows(enum_windows_callback, windows)
-            
+            windows = self.platform.spotify_windows(self._spotify_pids or None)
             if windows:
-                return windows[0]
-        except ImportError:
-            self.log("Модуль win32gui не найден. Установите: pip install pywin32", "WARNING")
+                return windows[0].title
         except Exception as e:
             self.log(f"Ошибка получения заголовка окна: {e}", "ERROR")
         
         return None
     
-    def is_ad_playing(self) -> bool:
+    def is_ad_playing(self, snapshot: Optional[DetectionSnapshot] = None) -> bool:
         """Улучшенное определение воспроизведения рекламы с множественными проверками"""
         try:
+            if snapshot is None:
+                snapshot = self.take_snapshot()
+            
             # Сначала проверяем, что Spotify вообще запущен и активен
-            if not self._is_spotify_running():
+            if not self._is_spotify_running(snapshot):
                 return False
             
-            # Метод 1: Проверка заголовка окна (самый надежный)
-            title_check = self._check_window_title()
-            
-            # Метод 2: Проверка аудио сессии
-            audio_check = self._check_audio_session()
-            
-            # Метод 3: Проверка процессов
-            process_check = self._check_process_names()
+            # Переключения окон отслеживаются на каждом тике, даже если
+            # детектор состояния окна не понадобится
+            self._track_window_switch(snapshot)
             
-            # Метод 4: Проверка длительности трека
-            duration_check = self._check_track_duration()
-            
-            # Метод 5: Проверка состояния окна (НЕ фокуса!)
-            window_state_check = self._check_window_focus()
-            
-            # ИСПРАВЛЕНО: Более консервативная логика для предотвращения ложных срабатываний
-            checks = [title_check, audio_check, process_check, duration_check, window_state_check]
-            confidence_score = sum(checks)
-            
-            # Очень строгая логика: требуем явные индикаторы рекламы
-            is_ad = False
-            
-            # Сильные индикаторы рекламы - требуем заголовок окна + дополнительное подтверждение
-            if title_check and duration_check:
-                # Заголовок окна содержит рекламу И паттерн трека подтверждает
-                is_ad = True
-            elif title_check and audio_check and process_check:
-                # Заголовок + аудио + процесс (тройное подтверждение)
-                is_ad = True
-            elif confidence_score >= 4 and title_check:
-                # 4+ методов + заголовок окна (очень высокая уверенность)
-                is_ad = True
+            # Детекторы: заголовок окна, длительность трека, состояние окна,
+            # процессы, аудио сессия - от дешевых к дорогим
+            is_ad, results = self.detectors.evaluate(snapshot)
+            for name, hit in results.items():
+                if hit:
+                    self.instrumentation.count(f'detector_hits.{name}')
             
             # Дополнительная защита от ложных срабатываний
             if is_ad:
                 # Проверяем, что это не ложное срабатывание из-за переключения окон
-                current_time = time.time()
+                current_time = self.clock()
                 if hasattr(self, '_last_window_switch') and (current_time - self._last_window_switch) < 2.0:
                     # Недавно было переключение окон, игнорируем
+                    self.instrumentation.count('suppressed_window_switch')
                     return False
+                self.instrumentation.count('ad_ticks')
             
             if is_ad and not hasattr(self, '_last_ad_detection'):
-                self.log(f"Реклама обнаружена: окно={title_check}, аудио={audio_check}, процесс={process_check}, длительность={duration_check}, состояние_окна={window_state_check}")
-                self._last_ad_detection = time.time()
+                # Одна детекция на рекламу, а не на каждый тик, пока она играет
+                self.instrumentation.count('ad_detections')
+                signatures = ()
+                if snapshot.title:
+                    # Сигнатуры детекторов заголовка и паттернов трека
+                    signatures = self.ad_signatures.match(snapshot.title).in_groups(
+                        'exact', 'promo', 'strong', 'explicit', 'url', 'action')
+                # Детекторы, которые конвейер не запускал, - прочерком
+                shown = {name: results.get(name, '-') for name in ('title', 'audio', 'process', 'duration', 'window_state')}
+                self.log(f"Реклама обнаружена: окно={shown['title']}, аудио={shown['audio']}, процесс={shown['process']}, длительность={shown['duration']}, состояние_окна={shown['window_state']}, сигнатуры={', '.join(signatures)}")
+                self._last_ad_detection = self.clock()
+                if self.event_store is not None:
+                    fired = [name for name, hit in results.items() if hit]
+                    self.event_store.detection(self._last_ad_detection, snapshot.title, fired,
+                                               signatures, self._instance_key)
             elif not is_ad and hasattr(self, '_last_ad_detection'):
                 delattr(self, '_last_ad_detection')
                 
@@ -265,156 +368,105 @@ class SpotifyAdBlocker:
             self.log(f"Ошибка определения рекламы: {e}", "ERROR")
             return False
     
-    def _get_spotify_window_title(self):
-        """Получение заголовка окна Spotify"""
-        try:
-            import win32gui
-            
-            def enum_windows_callback(hwnd, windows):
-                if win32gui.IsWindowVisible(hwnd):
-                    window_text = win32gui.GetWindowText(hwnd)
-                    if 'spotify' in window_text.lower():
-                        windows.append(window_text)
-                return True
-            
-            windows = []
-            win32gui.EnumWindows(enum_windows_callback, windows)
-            
-            return windows[0] if windows else None
-            
-        except ImportError:
-            return None
-        except Exception as e:
-            self.log(f"Ошибка получения заголовка окна: {e}", "ERROR")
-            return None
+    @staticmethod
+    def _ad_decision_rule(results: Dict[str, bool]) -> bool:
+        """Правило принятия решения по результатам всех детекторов"""
+        title_check = results.get('title', False)
+        audio_check = results.get('audio', False)
+        process_check = results.get('process', False)
+        duration_check = results.get('duration', False)
+        
+        # ИСПРАВЛЕНО: Более консервативная логика для предотвращения ложных срабатываний
+        confidence_score = sum(results.values())
+        
+        # Сильные индикаторы рекламы - требуем заголовок окна + дополнительное подтверждение
+        if title_check and duration_check:
+            # Заголовок окна содержит рекламу И паттерн трека подтверждает
+            return True
+        if title_check and audio_check and process_check:
+            # Заголовок + аудио + процесс (тройное подтверждение)
+            return True
+        if confidence_score >= 4 and title_check:
+            # 4+ методов + заголовок окна (очень высокая уверенность)
+            return True
+        return False
     
-    def _check_window_title(self) -> bool:
+    def _check_window_title(self, snapshot: DetectionSnapshot) -> bool:
         """Проверка заголовка окна на наличие рекламы"""
-        title = self._get_spotify_window_title()
+        title = snapshot.title
         if not title:
             return False
         
-        title_lower = title.lower().strip()
+        verdict = self.ad_signatures.match(title)
         
         # Точные индикаторы рекламы
-        exact_ad_indicators = [
-            'advertisement',
-            'spotify ad',
-            'sponsored',
-            'spotify - advertisement'
-        ]
-        
-        for indicator in exact_ad_indicators:
-            if indicator in title_lower:
-                return True
+        if verdict.has('exact'):
+            return True
         
         # ИСПРАВЛЕНО: НЕ считаем рекламой стандартные заголовки Spotify
         # Эти заголовки появляются при паузе или загрузке, но это НЕ реклама
-        standard_titles = ['spotify', 'spotify free', 'spotify premium']
-        if title_lower in standard_titles:
+        if verdict.is_standard:
             return False  # Это НЕ реклама!
             
-        # Проверка на рекламные паттерны только если нет музыкальной структуры
-        ad_patterns = [
-            'spotify.com',
-            'upgrade now',
-            'get premium',
-            'ad-free music'
-        ]
-        
         # Если заголовок содержит рекламные паттерны И нет структуры трека
-        if any(pattern in title_lower for pattern in ad_patterns) and ' - ' not in title:
+        if verdict.has('promo') and not verdict.has_separator:
             return True
             
         return False
     
-    def _check_audio_session(self) -> bool:
+    def _check_audio_session(self, snapshot: DetectionSnapshot) -> bool:
         """Проверка аудио сессии для определения рекламы"""
+        if self.audio_monitor is None or snapshot.audio_peak is None:
+            return False
         try:
-            from pycaw.pycaw import AudioUtilities
-            
-            sessions = AudioUtilities.GetAllSessions()
-            for session in sessions:
-                if session.Process and 'spotify' in session.Process.name().lower():
-                    # Проверяем состояние аудио сессии
-                    volume = session.SimpleAudioVolume
-                    if volume:
-                        # Если громкость очень низкая, это может быть реклама
-                        current_volume = volume.GetMasterVolume()
-                        if current_volume < 0.1:  # Очень тихо
-                            return True
-                            
-                        # Проверяем активность аудио потока
-                        # Если нет активного воспроизведения, но процесс активен
-                        if hasattr(session, 'State') and session.State == 0:  # Неактивен
-                            return True
-                            
-        except ImportError:
-            self.log("pycaw не установлен, пропуск проверки аудио сессии", "WARNING")
+            # Признаки рекламной паузы по пиковым уровням из кольцевого буфера:
+            # скачок громкости или тишина на стыке рекламы и трека
+            return self.audio_monitor.ad_like()
         except Exception as e:
-            self.log(f"Ошибка проверки аудио сессии: {e}", "DEBUG")
+            self.log("Ошибка проверки аудио сессии: %s", "DEBUG", e)
             
         return False
     
-    def _check_process_names(self) -> bool:
+    def _check_process_names(self, snapshot: DetectionSnapshot) -> bool:
         """Проверка имен процессов Spotify на наличие рекламных индикаторов"""
         try:
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                if 'spotify' in proc.info['name'].lower():
-                    cmdline = proc.info.get('cmdline', [])
-                    if cmdline:
-                        cmdline_str = ' '.join(cmdline).lower()
-                        # Проверяем командную строку на рекламные индикаторы
-                        if any(indicator in cmdline_str for indicator in 
-                               ['ad', 'advertisement', 'sponsored', 'promo']):
-                            return True
+            for proc_info in snapshot.processes:
+                cmdline = proc_info.get('cmdline', [])
+                if cmdline:
+                    cmdline_str = ' '.join(cmdline).lower()
+                    # Проверяем командную строку на рекламные индикаторы
+                    if any(indicator in cmdline_str for indicator in 
+                           ['ad', 'advertisement', 'sponsored', 'promo']):
+                        return True
             return False
         except Exception as e:
             self.log(f"Ошибка проверки процессов: {e}", "ERROR")
             return False
     
-    def _check_track_duration(self) -> bool:
+    def _check_track_duration(self, snapshot: DetectionSnapshot) -> bool:
         """Проверка паттернов трека для определения рекламы"""
         try:
             # Получаем заголовок окна для анализа
-            window_title = self._get_spotify_window_title()
+            window_title = snapshot.title
             if not window_title:
                 return False
             
-            window_title_lower = window_title.lower().strip()
+            verdict = self.ad_signatures.match(window_title)
             
             # ИСПРАВЛЕНО: Стандартные заголовки Spotify (НЕ реклама)
-            standard_titles = ['spotify', 'spotify free', 'spotify premium']
-            if window_title_lower in standard_titles:
+            if verdict.is_standard:
                 return False  # Это точно НЕ реклама!
             
             # Сильные индикаторы рекламы в заголовке
-            strong_ad_patterns = [
-                r'\b(advertisement|sponsored)\b',
-                r'spotify\s*-\s*advertisement\b',
-                r'\b(upgrade|subscribe)\s*(now|today)\b',
-                r'\b(get|try)\s*premium\b',
-                r'\bad[\s-]?free\s*music\b'
-            ]
-            
-            import re
-            
-            # Проверяем на сильные рекламные паттерны
-            for pattern in strong_ad_patterns:
-                if re.search(pattern, window_title_lower):
-                    return True
+            if verdict.has('strong'):
+                return True
             
             # ИСПРАВЛЕНО: Если есть разделитель " - ", это ТОЧНО музыка, НЕ реклама
-            if ' - ' in window_title:
+            if verdict.has_separator:
                 # Дополнительная проверка только на очень явные рекламные слова
-                parts = window_title.split(' - ')
-                if len(parts) == 2:
-                    artist, track = parts[0].strip(), parts[1].strip()
-                    
-                    # Проверяем только на очень явные рекламные индикаторы
-                    explicit_ad_keywords = ['advertisement', 'sponsored', 'spotify ad']
-                    if any(keyword in artist.lower() or keyword in track.lower() for keyword in explicit_ad_keywords):
-                        return True
+                # в артисте или треке
+                if len(window_title.split(' - ')) == 2 and verdict.has('explicit'):
+                    return True
                 
                 return False  # Структура "Артист - Трек" = это музыка!
             
@@ -424,74 +476,49 @@ class SpotifyAdBlocker:
                 return False  # Даже короткие заголовки могут быть названиями треков
             
             # Заголовки, содержащие только URL или промо-текст
-            url_patterns = [r'spotify\.com', r'www\.', r'http']
-            if any(re.search(pattern, window_title_lower) for pattern in url_patterns):
+            if verdict.has('url'):
                 return True
             
             # ИСПРАВЛЕНО: Более строгие паттерны призывов к действию
-            action_patterns = [
-                r'\bupgrade\s+to\s+premium\b',
-                r'\bget\s+spotify\s+premium\b',
-                r'\btry\s+premium\s+free\b'
-            ]
-            
-            for pattern in action_patterns:
-                if re.search(pattern, window_title_lower):
-                    return True
+            if verdict.has('action'):
+                return True
                 
             return False
         except Exception as e:
             self.log(f"Ошибка проверки паттернов трека: {e}", "ERROR")
             return False
     
-    def _is_spotify_running(self) -> bool:
+    def _is_spotify_running(self, snapshot: DetectionSnapshot) -> bool:
         """Проверка, что Spotify запущен и активен"""
-        try:
-            for proc in psutil.process_iter(['pid', 'name']):
-                if 'spotify' in proc.info['name'].lower():
-                    return True
-            return False
-        except Exception:
-            return False
+        return snapshot.spotify_running
     
-    def _check_window_focus(self) -> bool:
+    @staticmethod
+    def _is_console_foreground(snapshot: DetectionSnapshot) -> bool:
+        """Активно окно PowerShell или консоли"""
+        foreground_title = snapshot.foreground_title.lower()
+        return 'powershell' in foreground_title or 'cmd' in foreground_title
+    
+    def _track_window_switch(self, snapshot: DetectionSnapshot):
+        """Отслеживание переключений окон для защиты от ложных срабатываний"""
+        if self._is_console_foreground(snapshot):
+            self._last_window_switch = self.clock()
+    
+    def _check_window_focus(self, snapshot: DetectionSnapshot) -> bool:
         """Проверка состояния окна Spotify (НЕ фокуса, а внутреннего состояния)"""
         try:
-            import win32gui
-            import win32con
+            if self._is_console_foreground(snapshot):
+                return False  # Не считаем это индикатором рекламы
             
-            # Отслеживаем переключения окон
-            try:
-                foreground_window = win32gui.GetForegroundWindow()
-                foreground_title = win32gui.GetWindowText(foreground_window)
-                
-                # Если активно окно PowerShell или другое не-Spotify окно
-                if 'powershell' in foreground_title.lower() or 'cmd' in foreground_title.lower():
-                    self._last_window_switch = time.time()
-                    return False  # Не считаем это индикатором рекламы
-            except Exception:
-                pass
-            
-            def enum_windows_callback(hwnd, windows):
-                if win32gui.IsWindowVisible(hwnd):
-                    window_text = win32gui.GetWindowText(hwnd)
-                    if 'spotify' in window_text.lower():
-                        windows.append((hwnd, window_text))
-                return True
-            
-            windows = []
-            win32gui.EnumWindows(enum_windows_callback, windows)
-            
-            for hwnd, title in windows:
+            for window in snapshot.windows:
+                title = window.title
                 # Проверяем состояние окна
-                placement = win32gui.GetWindowPlacement(hwnd)
-                if placement[1] == win32con.SW_SHOWMINIMIZED:
+                if window.minimized:
                     # Окно свернуто, не проверяем размеры
                     continue
                 
                 # Проверяем размер окна только если окно видимо
                 # Реклама может создавать дополнительные маленькие окна
-                rect = win32gui.GetWindowRect(hwnd)
+                rect = window.rect
                 width = rect[2] - rect[0]
                 height = rect[3] - rect[1]
                 
@@ -502,27 +529,17 @@ class SpotifyAdBlocker:
                     if 'spotify' == title.lower().strip():
                         continue  # Это основное окно, пропускаем
                     # Дополнительная проверка на рекламные индикаторы в заголовке
-                    if any(ad_word in title.lower() for ad_word in ['ad', 'advertisement', 'premium', 'upgrade']):
+                    if self.ad_signatures.match(title).has('popup'):
                         return True
                     
                 # Проверяем на необычно большие окна (полноэкранная реклама)
-                try:
-                    import win32api
-                    screen_width = win32api.GetSystemMetrics(0)
-                    screen_height = win32api.GetSystemMetrics(1)
-                except ImportError:
-                    # Fallback: используем стандартные размеры экрана
-                    screen_width = 1920
-                    screen_height = 1080
+                screen_width, screen_height = self.platform.screen_size()
                 
                 if width > screen_width * 0.9 and height > screen_height * 0.9:
                     # Полноэкранное окно может быть рекламой
-                    if 'advertisement' in title.lower() or 'ad' in title.lower():
+                    if self.ad_signatures.match(title).has('fullscreen'):
                         return True
             
-            return False
-        except ImportError:
-            # win32gui не установлен, пропускаем эту проверку
             return False
         except Exception as e:
             self.log(f"Ошибка проверки состояния окна: {e}", "ERROR")
@@ -531,17 +548,22 @@ class SpotifyAdBlocker:
     def block_ad_aggressively(self):
         """Агрессивное блокирование рекламы БЕЗ отключения звука"""
         try:
-            # Метод 1: Закрытие рекламных окон
-            self._close_ad_windows()
+            # Действия выполняются в фоне, поток мониторинга не блокируется.
+            # Метод 1: Попытка пропустить рекламу (первым - быстрее всего убирает рекламу).
+            # Окно и способ пропуска - этого экземпляра Spotify, остальные действия общие
+            instance = self._active_instance
+            name = 'skip_ad_track' if instance is None else f'skip_ad_track:{instance.key}'
+            skip = functools.partial(self._skip_ad_track, self.skip_selector, self._spotify_pids)
+            self.actions.submit(name, skip, PRIORITY_SKIP, timeout=2.0)
             
-            # Метод 2: Попытка пропустить рекламу
-            self._skip_ad_track()
+            # Метод 2: Закрытие рекламных окон
+            self.actions.submit('close_ad_windows', self._close_ad_windows, PRIORITY_CLOSE_WINDOWS)
             
             # Метод 3: Блокировка рекламных процессов
-            self._block_ad_processes()
+            self.actions.submit('block_ad_processes', self._block_ad_processes, PRIORITY_PROCESSES)
             
             # Метод 4: Очистка рекламного кэша
-            self._clear_ad_cache()
+            self.actions.submit('clear_ad_cache', self._clear_ad_cache, PRIORITY_CACHE, timeout=30.0)
             
             self.log("🚫 Реклама заблокирована агрессивными методами (звук НЕ отключен)")
             
@@ -550,114 +572,71 @@ class SpotifyAdBlocker:
     
     def _close_ad_windows(self):
         """Закрытие рекламных окон и попапов"""
+        if not self.platform.has('windows'):
+            return
         try:
-            import win32gui
-            import win32con
-            
-            def enum_windows_callback(hwnd, windows):
-                if win32gui.IsWindowVisible(hwnd):
-                    window_text = win32gui.GetWindowText(hwnd)
-                    if window_text:
-                        window_text_lower = window_text.lower()
-                        # Ищем рекламные окна
-                        ad_keywords = ['advertisement', 'spotify ad', 'premium', 'upgrade', 'sponsored']
-                        if any(keyword in window_text_lower for keyword in ad_keywords):
-                            # Закрываем рекламное окно
-                            win32gui.PostMessage(hwnd, win32con.WM_CLOSE, 0, 0)
-                            self.log(f"🗙 Закрыто рекламное окно: {window_text}")
-                return True
-            
-            win32gui.EnumWindows(enum_windows_callback, [])
+            for hwnd, window_text in self.platform.visible_windows():
+                # Ищем рекламные окна
+                if self.ad_signatures.match(window_text).has('close'):
+                    # Закрываем рекламное окно
+                    self.platform.close_window(hwnd)
+                    self.log(f"🗙 Закрыто рекламное окно: {window_text}")
             
-        except ImportError:
-            self.log("win32gui не установлен, пропуск закрытия окон", "WARNING")
         except Exception as e:
             self.log(f"Ошибка закрытия рекламных окон: {e}", "ERROR")
     
-    def _skip_ad_track(self):
+    def _skip_ad_track(self, selector: Optional[SkipTransportSelector] = None,
+                       pids: Optional[Tuple[int, ...]] = None):
         """Попытка пропустить рекламный трек"""
+        selector = selector if selector is not None else self.skip_selector
+        pids = pids if pids is not None else self._spotify_pids
+        if not selector.transports:
+            return
         try:
-            # Отправляем команду "следующий трек" через клавиатурные сочетания
-            import win32api
-            import win32con
-            
-            # Находим окно Spotify
-            import win32gui
-            
-            def find_spotify_window():
-                def enum_windows_callback(hwnd, windows):
-                    if win32gui.IsWindowVisible(hwnd):
-                        window_text = win32gui.GetWindowText(hwnd)
-                        if 'spotify' in window_text.lower():
-                            windows.append(hwnd)
-                    return True
-                
-                windows = []
-                win32gui.EnumWindows(enum_windows_callback, windows)
-                return windows[0] if windows else None
-            
-            spotify_hwnd = find_spotify_window()
-            if spotify_hwnd:
-                # Активируем окно Spotify
-                win32gui.SetForegroundWindow(spotify_hwnd)
-                time.sleep(0.1)
-                
-                # Отправляем Ctrl+Right (следующий трек)
-                win32api.keybd_event(win32con.VK_CONTROL, 0, 0, 0)
-                win32api.keybd_event(win32con.VK_RIGHT, 0, 0, 0)
-                win32api.keybd_event(win32con.VK_RIGHT, 0, win32con.KEYEVENTF_KEYUP, 0)
-                win32api.keybd_event(win32con.VK_CONTROL, 0, win32con.KEYEVENTF_KEYUP, 0)
-                
-                self.log("⏭️ Попытка пропустить рекламный трек")
+            # Отправляем команду "следующий трек" окну Spotify
+            windows = self.platform.spotify_windows(pids or None)
+            if windows:
+                transport = selector.skip(windows[0].hwnd)
+                if transport is not None:
+                    self.log(f"⏭️ Попытка пропустить рекламный трек ({transport})")
+                else:
+                    self.log("Ни один способ пропуска трека не сработал", "WARNING")
                 
-        except ImportError:
-            self.log("win32api не установлен, пропуск команды skip", "WARNING")
         except Exception as e:
             self.log(f"Ошибка пропуска трека: {e}", "ERROR")
     
+    def _on_skip_result(self, transport: str, seconds: float, ok: bool,
+                        instance: Optional[int] = None):
+        if self.event_store is not None:
+            self.event_store.action(time.time(), f'skip.{transport}', seconds, ok, instance)
+        if ok:
+            self.instrumentation.record(f'skip.{transport}', seconds)
+        else:
+            self.instrumentation.count(f'skip.{transport}.failed')
+            self.log("Пропуск через %s не сменил трек", "DEBUG", transport)
+    
     def _block_ad_processes(self):
         """Блокировка рекламных процессов"""
         try:
-            # Ищем подозрительные процессы связанные с рекламой
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
-                try:
-                    proc_name = proc.info['name'].lower()
-                    cmdline = proc.info.get('cmdline', [])
-                    
-                    # Проверяем на рекламные процессы
-                    if 'spotify' in proc_name:
-                        cmdline_str = ' '.join(cmdline).lower() if cmdline else ''
-                        ad_indicators = ['ad', 'advertisement', 'sponsored', 'promo', 'banner']
-                        
-                        if any(indicator in cmdline_str for indicator in ad_indicators):
-                            # Завершаем рекламный процесс
-                            proc.terminate()
-                            self.log(f"🔪 Завершен рекламный процесс: {proc_name}")
-                            
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    continue
+            # Ищем подозрительные процессы среди уже отслеживаемых PID Spotify
+            for info in self.process_tracker.refresh():
+                proc_name = info.name.lower()
+                cmdline_str = ' '.join(info.cmdline).lower()
+                ad_indicators = ['ad', 'advertisement', 'sponsored', 'promo', 'banner']
+                
+                if any(indicator in cmdline_str for indicator in ad_indicators):
+                    # Завершаем рекламный процесс (процесса уже нет или нет доступа - пропускаем)
+                    if self.platform.terminate_process(info.pid):
+                        self.process_tracker.invalidate()
+                        self.log(f"🔪 Завершен рекламный процесс: {proc_name}")
                     
         except Exception as e:
             self.log(f"Ошибка блокировки процессов: {e}", "ERROR")
     
     def _clear_ad_cache(self):
-        """Очистка рекламного кэша"""
+        """Очистка рекламного кэша (в фоне, не блокирует мониторинг)"""
         try:
-            # Очищаем только рекламные файлы из кэша
-            for spotify_path in self.spotify_paths:
-                if spotify_path.exists():
-                    # Ищем рекламные файлы
-                    ad_cache_patterns = ['*ad*', '*advertisement*', '*promo*', '*banner*']
-                    
-                    for pattern in ad_cache_patterns:
-                        for cache_file in spotify_path.rglob(pattern):
-                            try:
-                                if cache_file.is_file():
-                                    cache_file.unlink()
-                                    self.log(f"🗑️ Удален рекламный файл: {cache_file.name}")
-                            except Exception:
-                                continue
-                                
+            self.ad_cache_cleaner.request_sweep()
         except Exception as e:
             self.log(f"Ошибка очистки рекламного кэша: {e}", "ERROR")
     
@@ -665,32 +644,289 @@ class SpotifyAdBlocker:
         """Создание пользовательского hosts файла"""
         user_hosts = self.config_dir / 'user_hosts'
         
-        hosts_content = "# Spotify Ad Blocker - User Hosts File\n"
-        hosts_content += "# Этот файл блокирует рекламные домены Spotify\n\n"
-        
-        for domain in self.ad_domains:
-            hosts_content += f"127.0.0.1 {domain}\n"
+        def domains():
+            return itertools.chain(self.ad_domains, self.external_blocklists.iter_hosts_domains())
         
-        with open(user_hosts, 'w', encoding='utf-8') as f:
-            f.write(hosts_content)
+        # Файл перезаписывается только при изменении списка (хеш в маркере блока)
+        header = ("Spotify Ad Blocker - User Hosts File",
+                  "Этот файл блокирует рекламные домены Spotify", "")
+        if HostsFileWriter(user_hosts).write(domains, header):
+            self.log(f"Создан пользовательский hosts файл: {user_hosts}")
+        else:
+            self.log("Пользовательский hosts файл не изменился: %s", "DEBUG", user_hosts)
         
-        self.log(f"Создан пользовательский hosts файл: {user_hosts}")
+        if self.system_hosts is not None:
+            try:
+                if HostsFileWriter(self.system_hosts, log=self.log).merge_block(domains):
+                    self.log(f"Обновлен блок рекламных доменов в {self.system_hosts}")
+            except OSError as e:
+                self.log(f"Не удалось обновить {self.system_hosts} (нужны права администратора): {e}",
+                         "WARNING")
         return user_hosts
     
+    def configure_dns(self, enabled: bool = True, listen: Tuple[str, int] = ('127.0.0.1', 53),
+                      upstream: Tuple[str, int] = ('1.1.1.1', 53), mode: str = MODE_NXDOMAIN):
+        """Параметры локального DNS-фильтра (до start)"""
+        if not enabled:
+            self.dns_sinkhole = None
+            return
+        self.dns_sinkhole = DnsSinkhole(
+            self.dns_blocklist, listen=listen, upstream=upstream, mode=mode, log=self.log,
+            on_timing=lambda kind, seconds: self.instrumentation.record(f'dns.{kind}', seconds))
+    
+    def configure_blocklists(self, sources: List[Path], system_hosts: bool = False):
+        """Внешние списки блокировки и запись в системный hosts (до start)"""
+        self.external_blocklists.sources = [Path(source) for source in sources]
+        self.system_hosts = system_hosts_path() if system_hosts else None
+    
+    def reload_blocklists(self) -> bool:
+        """Перечитать изменившиеся внешние списки; True, если набор правил изменился"""
+        if not self.external_blocklists.sources:
+            return False
+        started = time.perf_counter()
+        changed = self.external_blocklists.reload()
+        if changed:
+            self.log(f"Внешние списки блокировки: {len(self.external_blocklists)} правил "
+                     f"за {time.perf_counter() - started:.2f} с")
+        return changed
+    
+    def _reload_blocklists_and_hosts(self):
+        if self.reload_blocklists():
+            self.create_user_hosts_file()
+    
+    def configure_multi_session(self, enabled: bool = True):
+        """Обслуживать все экземпляры Spotify (сессии сервера терминалов; до start)"""
+        if not enabled:
+            self.instance_scanner = None
+            return
+        if not self.platform.has('win32process'):
+            self.log("Без win32process окна нельзя сопоставить экземплярам Spotify: "
+                     "детекция по заголовку недоступна", "WARNING")
+        if self.trace_recorder is not None:
+            self.log("Трасса записывается только в режиме одного экземпляра Spotify", "WARNING")
+        # Аудио сессии всех экземпляров - один перебор на тик, а не по бэкенду на экземпляр
+        audio_sessions = None
+        if self.audio_monitor is not None:
+            audio_sessions = AudioSessionPool(self.platform.audio_meters_by_pid)
+        self.instance_scanner = SpotifyInstanceScanner(
+            self.process_tracker, self.platform, self._new_instance_state,
+            self._new_instance_scheduler, self.log, audio_sessions)
+    
+    def _new_instance_state(self, root, foreign: bool = False) -> Dict[str, object]:
+        """Начальное состояние детекции нового экземпляра Spotify"""
+        audio_monitor = None
+        audio_sessions = self.instance_scanner.audio_sessions
+        if audio_sessions is not None and not foreign:
+            # Звук экземпляров других сессий Windows отсюда не виден
+            audio_monitor = AudioPeakMonitor(PooledAudioBackend(audio_sessions))
+        skip_selector = SkipTransportSelector(self.platform.skip_transports())
+        skip_selector.listeners.append(functools.partial(self._on_skip_result, instance=root.pid))
+        return {
+            'spotify_process': root,
+            '_spotify_pids': (),
+            'audio_monitor': audio_monitor,
+            'skip_selector': skip_selector,
+            '_ad_detection_count': 0,
+            '_music_detection_count': 0,
+            '_last_ad_block_time': 0,
+            '_last_title': None,
+        }
+    
+    def _new_instance_scheduler(self) -> AdaptivePollScheduler:
+        scheduler = self.poll_scheduler
+        return AdaptivePollScheduler(scheduler.min_interval, scheduler.max_interval,
+                                     paused_interval=scheduler.paused_interval,
+                                     idle_interval=scheduler.idle_interval)
+    
+    @contextlib.contextmanager
+    def _bound_instance(self, instance: SpotifyInstance):
+        """Состояние детекции экземпляра - в атрибутах блокировщика на время обработки"""
+        saved = instance.bind(self)
+        self._instance_local.instance = instance
+        try:
+            yield
+        finally:
+            self._instance_local.instance = None
+            instance.unbind(self, saved)
+    
+    def process_instances(self) -> DetectionSnapshot:
+        """Тик всех экземпляров: общий обход, затем детекция и действия по каждому"""
+        with self.instrumentation.timer('snapshot'):
+            instances = self.instance_scanner.scan()
+        foreground_title = ''
+        if instances and self.platform.has('windows'):
+            try:
+                foreground_title = self.platform.foreground_title()
+            except Exception:
+                pass
+        
+        processes = []
+        windows = []
+        for instance in instances:
+            instance_processes = [{'pid': info.pid, 'name': info.name, 'cmdline': list(info.cmdline)}
+                                  for info in instance.processes]
+            with self._bound_instance(instance):
+                self.spotify_process = instance.root
+                self._spotify_pids = instance.pids
+                snapshot = DetectionSnapshot(instance_processes, instance.windows, foreground_title,
+                                             audio_peak=self._sample_audio(instance.pids))
+                self.skip_selector.observe(snapshot.title)
+                is_ad = self.process_tick(snapshot)
+                instance.confirming = 0 < self._ad_detection_count < self.required_confirmations
+            instance.scheduler.observe(snapshot.title, is_ad)
+            processes.extend(instance_processes)
+            windows.extend(instance.windows)
+        
+        # Сводный снимок: все процессы и окна (ожидание событий, отчет о запуске, метрики)
+        self._spotify_pids = tuple(proc['pid'] for proc in processes)
+        return DetectionSnapshot(processes, windows, foreground_title)
+    
+    def configure_events(self, enabled: bool = True, path: Optional[Path] = None):
+        """Хранилище событий SQLite (по умолчанию events.db в папке настроек; до start)"""
+        if not enabled:
+            self.event_store = None
+            return
+        path = Path(path) if path else self.config_dir / 'events.db'
+        try:
+            self.event_store = EventStore(path, log=self.log)
+        except Exception as e:
+            self.event_store = None
+            self.log(f"Хранилище событий недоступно ({path}): {e}", "WARNING")
+            return
+        self.actions.listeners.append(self._record_action)
+        self.log(f"События пишутся в {path}")
+    
+    def _record_action(self, name: str, seconds: float, ok: bool):
+        if self.event_store is None:
+            return
+        # skip_ad_track:<PID> - действие экземпляра Spotify
+        action, _, instance = name.partition(':')
+        self.event_store.action(time.time(), action, seconds, ok, int(instance) if instance else None)
+    
+    def _record_title(self, snapshot: DetectionSnapshot):
+        """Смена заголовка окна Spotify - в хранилище событий"""
+        title = snapshot.title
+        if title is not None and title != self._last_title:
+            self.event_store.title_changed(snapshot.timestamp, title, self._last_title, self._instance_key)
+            self._last_title = title
+    
+    def configure_metrics(self, listen: Optional[Tuple[str, int]]):
+        """Адрес эндпоинта /metrics (None - экспорт выключен; до start)"""
+        self.metrics_exporter = MetricsExporter(self.collect_metrics, listen, self.log) if listen else None
+    
+    def collect_metrics(self) -> List[MetricFamily]:
+        """Метрики в момент запроса коллектора"""
+        report = self.instrumentation.report()
+        counters = report['counters']
+        histograms = dict(self.instrumentation.histograms)
+        uptime = max(report['uptime_s'], 1e-9)
+        prefix = 'spotify_ad_blocker_'
+        
+        def family(name, kind, help_text):
+            return MetricFamily(prefix + name, kind, help_text)
+        
+        def labelled(name, kind, help_text, group, label, histogram=False):
+            metric = family(name, kind, help_text)
+            for key in sorted(histograms if histogram else counters):
+                if key.startswith(group) and (histogram or not key.endswith('.failed')):
+                    labels = {label: key[len(group):]}
+                    if histogram:
+                        metric.add_histogram(histograms[key], labels)
+                    else:
+                        metric.add(counters[key], labels)
+            return metric
+        
+        families = [
+            family('ticks', 'counter', "Тики мониторинга").add(counters.get('ticks', 0)),
+            family('ticks_per_second', 'gauge', "Средняя частота тиков с запуска")
+            .add(counters.get('ticks', 0) / uptime),
+            labelled('detector_hits', 'counter', "Срабатывания детекторов", 'detector_hits.', 'detector'),
+            labelled('detector_duration_seconds', 'histogram', "Время детекторов",
+                     'detector.', 'detector', True),
+            family('ads_detected', 'counter', "Обнаружено рекламы").add(counters.get('ad_detections', 0)),
+            family('ad_ticks', 'counter', "Тики с рекламой").add(counters.get('ad_ticks', 0)),
+            family('ads_blocked', 'counter', "Блокировок рекламы").add(counters.get('ads_blocked', 0)),
+            family('detections_suppressed', 'counter', "Детекции, подавленные переключением окон")
+            .add(counters.get('suppressed_window_switch', 0)),
+            labelled('skip_latency_seconds', 'histogram', "Время от пропуска до смены заголовка",
+                     'skip.', 'transport', True),
+            labelled('action_duration_seconds', 'histogram', "Время действий блокировки",
+                     'action.', 'action', True),
+            family('log_queue_depth', 'gauge', "Записи в очереди лога").add(self.log_writer.queue_depth),
+            family('log_dropped', 'counter', "Записи лога, отброшенные при переполнении очереди")
+            .add(self.log_writer.dropped),
+            family('spotify_up', 'gauge', "Spotify запущен (1) или нет (0)").add(1 if self._spotify_pids else 0),
+            family('power_state', 'gauge', "Режим планировщика опроса").add(
+                1, {'state': (self.instance_scanner or self.poll_scheduler).state}),
+            family('uptime_seconds', 'gauge', "Время работы блокировщика").add(uptime),
+        ]
+        if self.instance_scanner is not None:
+            sessions: Dict[str, int] = {}
+            for instance in list(self.instance_scanner.instances.values()):
+                session = str(instance.session_id) if instance.session_id is not None else ''
+                sessions[session] = sessions.get(session, 0) + 1
+            instances = family('spotify_instances', 'gauge', "Экземпляры Spotify по сессиям")
+            for session, count in sorted(sessions.items()):
+                instances.add(count, {'session': session})
+            families.append(instances)
+        if self.event_store is not None:
+            families.append(family('event_queue_depth', 'gauge', "События в очереди записи")
+                            .add(self.event_store.queue_depth))
+            families.append(family('events_written', 'counter', "События, записанные в SQLite")
+                            .add(self.event_store.written))
+            families.append(family('events_dropped', 'counter', "События, отброшенные при переполнении")
+                            .add(self.event_store.dropped))
+        tick = family('tick_duration_seconds', 'histogram', "Длительность тика мониторинга")
+        if 'tick' in histograms:
+            tick.add_histogram(histograms['tick'])
+        families.append(tick)
+        # Пропуски трека без смены заголовка - по способам
+        failed = family('skip_failures', 'counter', "Пропуски, не сменившие трек")
+        for key in sorted(counters):
+            if key.startswith('skip.') and key.endswith('.failed'):
+                failed.add(counters[key], {'transport': key[len('skip.'):-len('.failed')]})
+        families.append(failed)
+        
+        try:
+            import psutil
+            if self._own_process is None:
+                self._own_process = psutil.Process(os.getpid())
+            cpu = self._own_process.cpu_times()
+            families.append(family('process_resident_memory_bytes', 'gauge', "RSS блокировщика")
+                            .add(self._own_process.memory_info().rss))
+            families.append(family('process_cpu_seconds', 'counter', "Процессорное время блокировщика")
+                            .add(cpu.user + cpu.system))
+        except Exception as e:
+            self.log("Метрики процесса недоступны: %s", "DEBUG", e)
+        
+        if self.dns_sinkhole is not None and self.dns_sinkhole.port is not None:
+            dns = family('dns_requests', 'counter', "Запросы локального DNS-фильтра")
+            for name, value in sorted(self.dns_sinkhole.counters.items()):
+                dns.add(value, {'result': name})
+            families.append(dns)
+            families.append(labelled('dns_duration_seconds', 'histogram', "Время ответа DNS-фильтра",
+                                     'dns.', 'kind', True))
+        return families
+    
     def setup_dns_blocking(self):
         """Настройка блокировки DNS без прав администратора"""
         try:
+            self.reload_blocklists()
+            
             # Создаем пользовательский hosts файл
             user_hosts = self.create_user_hosts_file()
             
-            # Попытка изменить DNS через реестр (может не работать без прав админа)
-            try:
-                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                                   r"Software\Microsoft\Windows\CurrentVersion\Internet Settings")
-                # Здесь можно добавить настройки прокси для блокировки доменов
-                winreg.CloseKey(key)
-            except Exception as e:
-                self.log(f"Не удалось изменить настройки DNS: {e}", "WARNING")
+            # Локальный DNS-фильтр: рекламные домены получают NXDOMAIN
+            if self.dns_sinkhole is not None:
+                host, port = self.dns_sinkhole.listen
+                try:
+                    self.dns_sinkhole.start()
+                    upstream_host, upstream_port = self.dns_sinkhole.upstream
+                    self.log(f"DNS-фильтр запущен на {host}:{self.dns_sinkhole.port} "
+                             f"(пересылка на {upstream_host}:{upstream_port}); "
+                             f"укажите {host} DNS-сервером системы")
+                except OSError as e:
+                    self.log(f"Не удалось запустить DNS-фильтр на {host}:{port}: {e}", "WARNING")
             
             self.log("DNS блокировка настроена")
             
@@ -727,6 +963,8 @@ class SpotifyAdBlocker:
         
         try:
             self.log("Загрузка NirCmd...")
+            # requests нужен только здесь - не замедляет импорт блокировщика
+            import requests
             url = "https://www.nirsoft.net/utils/nircmd.zip"
             response = requests.get(url, timeout=30)
             
@@ -753,55 +991,111 @@ class SpotifyAdBlocker:
         
         return None
     
+    def process_tick(self, snapshot: DetectionSnapshot) -> bool:
+        """Один шаг автомата мониторинга по снимку; True, если играет реклама"""
+        if not self.check_spotify_running(snapshot):
+            # Spotify не запущен
+            self._ad_detection_count = 0
+            self._music_detection_count = 0
+            if hasattr(self, '_last_music_log'):
+                delattr(self, '_last_music_log')
+            return False
+        
+        if self.event_store is not None:
+            self._record_title(snapshot)
+        is_ad = self.is_ad_playing(snapshot)
+        
+        if is_ad:
+            self._ad_detection_count += 1
+            self._music_detection_count = 0
+            
+            # АГРЕССИВНАЯ блокировка рекламы (БЕЗ отключения звука)
+            if self._ad_detection_count >= self.required_confirmations:
+                current_time = self.clock()
+                # Блокируем не чаще чем раз в 3 секунды
+                if current_time - self._last_ad_block_time > 3.0:
+                    self.block_ad_aggressively()
+                    self.instrumentation.count('ads_blocked')
+                    self._last_ad_block_time = current_time
+                    self.log(f"🔥 АГРЕССИВНАЯ блокировка рекламы после {self._ad_detection_count} проверок")
+        else:
+            self._music_detection_count += 1
+            self._ad_detection_count = 0
+            
+            # Логируем обнаружение музыки
+            if self._music_detection_count >= self.required_confirmations:
+                if hasattr(self, '_last_music_log'):
+                    current_time = self.clock()
+                    if current_time - self._last_music_log > 30:  # Логируем раз в 30 сек
+                        self.log(f"🎵 Музыка играет нормально (звук НЕ блокирован)")
+                        self._last_music_log = current_time
+                else:
+                    self.log(f"🎵 Музыка обнаружена после {self._music_detection_count} проверок")
+                    self._last_music_log = self.clock()
+        
+        return is_ad
+    
     def monitor_spotify(self):
         """АГРЕССИВНЫЙ мониторинг Spotify БЕЗ блокировки звука"""
         self.log("🚀 Начат АГРЕССИВНЫЙ мониторинг Spotify (звук НЕ блокируется!)")
         
-        # Более агрессивные настройки для быстрого реагирования
-        ad_detection_count = 0
-        music_detection_count = 0
-        required_confirmations = 2  # Быстрое реагирование на рекламу
-        last_ad_block_time = 0
+        last_stats_log = time.time()
+        last_blocklist_check = time.time()
         
+        self.title_events.start()
+        if self.process_watcher is not None:
+            self.process_watcher.start()
         while self.is_running:
             try:
-                if self.check_spotify_running():
-                    is_ad = self.is_ad_playing()
-                    
-                    if is_ad:
-                        ad_detection_count += 1
-                        music_detection_count = 0
-                        
-                        # АГРЕССИВНАЯ блокировка рекламы (БЕЗ отключения звука)
-                        if ad_detection_count >= required_confirmations:
-                            current_time = time.time()
-                            # Блокируем не чаще чем раз в 3 секунды
-                            if current_time - last_ad_block_time > 3.0:
-                                self.block_ad_aggressively()
-                                last_ad_block_time = current_time
-                                self.log(f"🔥 АГРЕССИВНАЯ блокировка рекламы после {ad_detection_count} проверок")
-                    else:
-                        music_detection_count += 1
-                        ad_detection_count = 0
-                        
-                        # Логируем обнаружение музыки
-                        if music_detection_count >= required_confirmations:
-                            if hasattr(self, '_last_music_log'):
-                                current_time = time.time()
-                                if current_time - self._last_music_log > 30:  # Логируем раз в 30 сек
-                                    self.log(f"🎵 Музыка играет нормально (звук НЕ блокирован)")
-                                    self._last_music_log = current_time
-                            else:
-                                self.log(f"🎵 Музыка обнаружена после {music_detection_count} проверок")
-                                self._last_music_log = time.time()
+                tick_started = time.perf_counter()
+                if self.instance_scanner is not None:
+                    # Все экземпляры Spotify - за один обход процессов и окон
+                    snapshot = self.process_instances()
+                    if self.instance_scanner.update_state():
+                        self._on_power_state_change(self.instance_scanner.state)
                 else:
-                    # Spotify не запущен
-                    ad_detection_count = 0
-                    music_detection_count = 0
-                    if hasattr(self, '_last_music_log'):
-                        delattr(self, '_last_music_log')
+                    # Один снимок процессов и окон на весь тик
+                    with self.instrumentation.timer('snapshot'):
+                        snapshot = self.take_snapshot()
+                    # Разметка (известна симулятору) - на момент снимка, до пропуска
+                    label = self.platform.playing_ad(self._spotify_pids) if self.trace_recorder else None
+                    self.skip_selector.observe(snapshot.title)
+                    
+                    is_ad = self.process_tick(snapshot)
+                    if self.trace_recorder is not None:
+                        # После тика: в снимке уже есть замер звука, если он понадобился
+                        self.trace_recorder.record(snapshot, label)
+                    if self.poll_scheduler.observe(snapshot.title, is_ad, running=snapshot.spotify_running):
+                        self._on_power_state_change(self.poll_scheduler.state)
+                if self._first_snapshot is None:
+                    self._first_snapshot = snapshot
+                    self.startup.mark('first_detection')
+                
+                self.instrumentation.record('tick', time.perf_counter() - tick_started)
+                self.instrumentation.count('ticks')
+                if time.time() - last_stats_log >= self.stats_interval:
+                    self.log(f"📊 Статистика: {self.instrumentation.summary_line()}")
+                    last_stats_log = time.time()
+                if (self.external_blocklists.sources
+                        and time.time() - last_blocklist_check >= self.blocklist_reload_interval):
+                    # Проверка версий - stat файлов; разбор изменившихся - в пуле действий
+                    self.actions.submit('reload_blocklists', self._reload_blocklists_and_hosts,
+                                        PRIORITY_CACHE, timeout=120.0)
+                    last_blocklist_check = time.time()
                 
-                time.sleep(0.3)  # Еще более частая проверка для агрессивного реагирования
+                # Ждем смены заголовка окна Spotify или паузы планировщика.
+                # Пока реклама не подтверждена, повторная проверка - почти сразу
+                self.title_events.set_target_pids(proc['pid'] for proc in snapshot.processes)
+                if self.instance_scanner is not None:
+                    confirming = self.instance_scanner.confirming
+                else:
+                    confirming = 0 < self._ad_detection_count < self.required_confirmations
+                if confirming and self.title_events.event_driven:
+                    self.title_events.wait(self.confirm_interval)
+                elif self.instance_scanner is not None:
+                    self.title_events.wait(self.instance_scanner.next_interval(self.poll_scheduler.idle_interval))
+                else:
+                    self.title_events.wait(self.poll_scheduler.next_interval())
                 
             except KeyboardInterrupt:
                 break
@@ -809,6 +1103,30 @@ class SpotifyAdBlocker:
                 self.log(f"Ошибка мониторинга: {e}", "ERROR")
                 time.sleep(2)  # Меньшая пауза при ошибке для быстрого восстановления
     
+    def _declare_startup_phases(self):
+        """Фазы подготовки системы: выполняются в фоне, мониторинг их не ждет"""
+        # Загрузка NirCmd для дополнительных функций (без сети - до 30 с таймаута)
+        self.startup.add('nircmd', self.download_nircmd)
+        # Настройка АГРЕССИВНОЙ DNS блокировки
+        self.startup.add('dns', self.setup_dns_blocking)
+        # Очистка кэша Spotify - после первого снимка, по нему видно, запущен ли Spotify
+        self.startup.add('cache', self._clear_cache_if_stopped, after=('first_detection',))
+    
+    def _clear_cache_if_stopped(self):
+        if self._first_snapshot is not None and self._first_snapshot.spotify_running:
+            self.log("Spotify запущен, пропуск очистки кэша", "WARNING")
+            return
+        self.clear_spotify_cache()
+    
+    def _on_startup_complete(self, report: str):
+        for name, seconds, _ in self.startup.timings():
+            if seconds is not None:
+                self.instrumentation.record(f'startup.{name}', seconds)
+        first_detection = self.startup.elapsed('first_detection')
+        if first_detection is not None:
+            self.instrumentation.record('startup.first_detection', first_detection)
+        self.log(f"⏱️ Запуск: {report}")
+    
     def start(self):
         """Запуск АГРЕССИВНОГО блокировщика рекламы (БЕЗ блокировки звука)"""
         self.log("=== АГРЕССИВНЫЙ Spotify Ad Blocker запущен ===")
@@ -817,34 +1135,25 @@ class SpotifyAdBlocker:
         self.log("")
         
         try:
-            # Проверка зависимостей
-            self.log("Проверка зависимостей...")
-            
-            # Загрузка NirCmd для дополнительных функций
-            try:
-                self.download_nircmd()
-            except Exception as e:
-                self.log(f"Предупреждение при загрузке NirCmd: {e}", "WARNING")
+            if self.platform.simulated:
+                # Симуляция: система не меняется (без загрузок, DNS и очистки кэша)
+                self.log("Режим симуляции: настройка системы пропущена")
+            else:
+                self._declare_startup_phases()
             
-            # Настройка АГРЕССИВНОЙ DNS блокировки
-            try:
-                self.setup_dns_blocking()
-            except Exception as e:
-                self.log(f"Предупреждение при настройке DNS: {e}", "WARNING")
-            
-            # Очистка кэша Spotify
-            try:
-                if not self.check_spotify_running():
-                    self.clear_spotify_cache()
-                else:
-                    self.log("Spotify запущен, пропуск очистки кэша", "WARNING")
-            except Exception as e:
-                self.log(f"Предупреждение при очистке кэша: {e}", "WARNING")
-            
-            # Запуск АГРЕССИВНОГО мониторинга
+            # Запуск АГРЕССИВНОГО мониторинга - первым, фазы подготовки идут следом в фоне
             self.is_running = True
             monitor_thread = threading.Thread(target=self.monitor_spotify, daemon=True)
             monitor_thread.start()
+            self.startup.mark('monitor_started')
+            if self.metrics_exporter is not None:
+                host, port = self.metrics_exporter.listen
+                try:
+                    self.metrics_exporter.start()
+                    self.log(f"Метрики: http://{host}:{self.metrics_exporter.port}/metrics")
+                except OSError as e:
+                    self.log(f"Не удалось запустить экспорт метрик на {host}:{port}: {e}", "WARNING")
+            self.startup.start()
             
             self.log("🔥 АГРЕССИВНЫЙ блокировщик рекламы активен! (звук НЕ блокируется)")
             self.log("Нажмите Ctrl+C для остановки")
@@ -869,13 +1178,117 @@ class SpotifyAdBlocker:
     
     def stop(self):
         """Остановка АГРЕССИВНОГО блокировщика"""
+        if self._stopped:
+            return
+        self._stopped = True
         self.log("🛑 Остановка АГРЕССИВНОГО блокировщика рекламы...")
         self.is_running = False
+        self.startup.cancel()
+        if not self.startup.complete:
+            self.log(f"⏱️ Запуск не завершен: {self.startup.report()}", "WARNING")
+        self.title_events.stop()
+        if self.process_watcher is not None:
+            self.process_watcher.stop()
+        self.ad_cache_cleaner.stop()
+        self.actions.stop()
+        if self.event_store is not None:
+            self.event_store.close()
+            self.log(f"События ({self.event_store.path}): {self.event_store.summary()}")
+        if self.dns_sinkhole is not None and self.dns_sinkhole.port is not None:
+            self.dns_sinkhole.stop()
+            self.log(f"DNS-фильтр: {self.dns_sinkhole.summary()}")
+        if self.trace_recorder is not None:
+            self.trace_recorder.close()
+            self.log(f"Трасса ({self.trace_recorder.path}): тиков={self.trace_recorder.ticks}, "
+                     f"размеченных рекламных интервалов={self.trace_recorder.spans}")
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+        if self.actions.stats:
+            self.log(f"Задержки действий: {self.actions.latency_report()}")
+        skip_report = self.skip_selector.report()
+        if skip_report:
+            self.log(f"Способы пропуска: {skip_report}")
+        if self.instance_scanner is not None:
+            for instance in self.instance_scanner.instances.values():
+                skip_report = instance.state['skip_selector'].report()
+                if skip_report:
+                    self.log(f"Способы пропуска ({instance.label}): {skip_report}")
+            self.log(f"Экземпляры Spotify: {self.instance_scanner.summary()}")
+        self.log(f"📊 Статистика: {self.instrumentation.summary_line()}")
+        platform_summary = self.platform.summary()
+        if platform_summary:
+            self.log(f"Платформа: {platform_summary}")
+        self.platform.close()
+        if self.show_stats:
+            try:
+                stats_file = self.config_dir / 'stats.json'
+                report = self.instrumentation.dump(stats_file)
+                self.log(f"Полная статистика ({stats_file}):\n{report}")
+            except Exception as e:
+                self.log(f"Не удалось сохранить статистику: {e}", "WARNING")
         
         self.log("✅ АГРЕССИВНЫЙ блокировщик остановлен (звук остался нетронутым)")
+        self.log_writer.close()
+
+def _host_port(value: str) -> Tuple[str, int]:
+    """Разбор HOST:PORT для аргументов командной строки"""
+    host, _, port = value.rpartition(':')
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"ожидается HOST:PORT, получено {value!r}")
+    return host.strip('[]'), int(port)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="АГРЕССИВНЫЙ Spotify Ad Blocker")
+    parser.add_argument('--stats', action='store_true',
+                        help="сводка статистики каждые 30 с и полный отчет stats.json при остановке")
+    parser.add_argument('--record-trace', metavar='PATH', type=Path,
+                        help="записывать входные данные каждого тика в трассу JSONL (см. trace_replay.py)")
+    parser.add_argument('--min-interval', type=float, default=0.1, metavar='SECONDS',
+                        help="минимальная пауза между проверками (около границ треков и после рекламы)")
+    parser.add_argument('--max-interval', type=float, default=2.0, metavar='SECONDS',
+                        help="максимальная пауза между проверками посреди трека")
+    parser.add_argument('--events', nargs='?', const='', metavar='PATH',
+                        help="писать смены заголовков, детекции и действия в SQLite "
+                             "(по умолчанию ~/.spotify_ad_blocker/events.db; см. event_store.py)")
+    parser.add_argument('--multi-session', action='store_true',
+                        help="обслуживать все экземпляры Spotify на узле (сессии сервера терминалов) "
+                             "одним общим обходом процессов и окон")
+    parser.add_argument('--metrics', type=_host_port, metavar='HOST:PORT',
+                        help="метрики Prometheus/OpenMetrics на http://HOST:PORT/metrics "
+                             "(например 127.0.0.1:9464)")
+    dns = parser.add_argument_group("DNS-фильтр (см. dns_sinkhole.py)")
+    dns.add_argument('--no-dns', action='store_true', help="не запускать локальный DNS-фильтр")
+    dns.add_argument('--dns-listen', type=_host_port, default=('127.0.0.1', 53), metavar='HOST:PORT',
+                     help="адрес DNS-фильтра (по умолчанию 127.0.0.1:53)")
+    dns.add_argument('--dns-upstream', type=_host_port, default=('1.1.1.1', 53), metavar='HOST:PORT',
+                     help="вышестоящий DNS-сервер (по умолчанию 1.1.1.1:53)")
+    dns.add_argument('--blocklist', action='append', type=Path, default=[], metavar='PATH',
+                     help="внешний список блокировки (hosts, домены или ABP ||domain^); "
+                          "можно указать несколько раз")
+    dns.add_argument('--system-hosts', action='store_true',
+                     help="добавить блок рекламных доменов в системный hosts "
+                          "(нужны права администратора; строки пользователя не меняются)")
+    dns.add_argument('--dns-mode', choices=('nxdomain', 'null'), default='nxdomain',
+                     help="ответ на рекламные домены: NXDOMAIN или 0.0.0.0")
+    simulation = parser.add_argument_group("симуляция (без Windows, см. simulated_spotify.py)")
+    simulation.add_argument('--simulate', action='store_true',
+                            help="запустить против симулятора Spotify вместо реальной системы")
+    simulation.add_argument('--sim-speed', type=float, default=1.0, metavar='X',
+                            help="ускорение времени плейлиста (по умолчанию 1.0)")
+    simulation.add_argument('--sim-ad-every', type=int, default=3, metavar='N',
+                            help="рекламная пауза после каждых N треков (по умолчанию 3)")
+    simulation.add_argument('--sim-seed', type=int, metavar='SEED',
+                            help="зерно генератора плейлиста для воспроизводимых прогонов")
+    simulation.add_argument('--sim-instances', type=int, default=1, metavar='N',
+                            help="число экземпляров Spotify в разных сессиях (с --multi-session)")
+    simulation.add_argument('--duration', type=float, metavar='SECONDS',
+                            help="остановиться через SECONDS секунд (для бенчмарков)")
+    return parser.parse_args(argv)
 
 def main():
     """Главная функция с улучшенной обработкой ошибок"""
+    args = parse_args()
     try:
         print("")
         print("╔══════════════════════════════════════════════════════════════╗")
@@ -905,13 +1318,13 @@ def main():
             sys.exit(1)
         
         # Проверка операционной системы
-        if os.name != 'nt':
+        if os.name != 'nt' and not args.simulate:
             print("❌ Этот скрипт работает только на Windows")
             input("Нажмите Enter для выхода...")
             sys.exit(1)
         
         # Проверка зависимостей
-        required_modules = ['psutil', 'requests']
+        required_modules = ['psutil']
         missing_modules = []
         
         for module in required_modules:
@@ -927,8 +1340,30 @@ def main():
             input("Нажмите Enter для выхода...")
             sys.exit(1)
         
+        platform = None
+        if args.simulate:
+            from simulated_spotify import SimulatedSpotify, SimulatedPlatform
+            from process_tracker import FakeProcessProvider
+            provider = FakeProcessProvider()
+            platform = SimulatedPlatform([SimulatedSpotify(
+                tracks_between_ads=args.sim_ad_every, speed=args.sim_speed,
+                seed=None if args.sim_seed is None else args.sim_seed + index,
+                pid=4242 + 100 * index, session_id=index + 1, provider=provider)
+                for index in range(max(args.sim_instances, 1))])
+        
         # Запуск блокировщика
-        blocker = SpotifyAdBlocker()
+        blocker = SpotifyAdBlocker(show_stats=args.stats, trace_file=args.record_trace,
+                                   platform=platform,
+                                   scheduler=AdaptivePollScheduler(args.min_interval, args.max_interval))
+        blocker.configure_dns(not args.no_dns, args.dns_listen, args.dns_upstream, args.dns_mode)
+        blocker.configure_blocklists(args.blocklist, args.system_hosts)
+        blocker.configure_metrics(args.metrics)
+        blocker.configure_multi_session(args.multi_session)
+        blocker.configure_events(args.events is not None, Path(args.events) if args.events else None)
+        if args.duration:
+            timer = threading.Timer(args.duration, blocker.stop)
+            timer.daemon = True
+            timer.start()
         
         try:
             blocker.start()
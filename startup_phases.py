@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Фазы запуска блокировщика вне критического пути
+
+Подготовка системы (загрузка NirCmd, DNS-фильтр, очистка кэша) раньше
+выполнялась последовательно до старта мониторинга: без сети первая
+реклама могла пройти за 30 секунд таймаута загрузки. Теперь фазы
+объявляются заранее и выполняются параллельно в фоновых потоках, а
+мониторинг стартует первым. Фаза может ждать другие фазы или отметки
+(mark) - например, очистка кэша ждет первую детекцию, чтобы узнать,
+запущен ли Spotify, не трогая трекер процессов из второго потока.
+
+Отчет о запуске - длительность каждой фазы и время до отметок
+(monitor_started, first_detection) от начала запуска.
+"""
+
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class StartupPhase:
+    """Объявленная фаза запуска"""
+
+    def __init__(self, name: str, func: Callable[[], None], after: Sequence[str] = ()):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.error: Optional[str] = None
+        self.skipped = False
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+
+class StartupPhases:
+    """Параллельное выполнение фаз запуска с зависимостями и отчетом по времени"""
+
+    def __init__(self, log: Optional[Callable[..., None]] = None,
+                 clock: Callable[[], float] = time.perf_counter,
+                 report_after: Sequence[str] = ()):
+        self.log = log or (lambda message, level='INFO': None)
+        self.clock = clock
+        self.phases: Dict[str, StartupPhase] = {}
+        self.marks: Dict[str, float] = {}
+        # Отчет выдается, когда завершены все фазы и поставлены эти отметки
+        self.report_after = tuple(report_after)
+        # Наблюдатели завершения запуска: callback(report)
+        self.listeners: List[Callable[[str], None]] = []
+        self.t0 = clock()
+        self._events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._started = False
+        self._reported = False
+
+    def _event(self, name: str) -> threading.Event:
+        with self._lock:
+            event = self._events.get(name)
+            if event is None:
+                event = self._events[name] = threading.Event()
+                if self._cancelled:
+                    event.set()
+            return event
+
+    def add(self, name: str, func: Callable[[], None], after: Sequence[str] = ()):
+        """Объявить фазу; after - имена фаз или отметок, которых она ждет"""
+        self.phases[name] = StartupPhase(name, func, after)
+
+    def start(self):
+        """Запустить все фазы в фоновых потоках (отсчет времени - от создания)"""
+        self._started = True
+        for phase in self.phases.values():
+            threading.Thread(target=self._run, args=(phase,), name=f'AdBlockerStartup-{phase.name}',
+                             daemon=True).start()
+        self._check_complete()
+
+    def mark(self, name: str):
+        """Отметка события запуска (учитывается только первая)"""
+        with self._lock:
+            if name in self.marks:
+                return
+            self.marks[name] = self.clock()
+        self._event(name).set()
+        self._check_complete()
+
+    def elapsed(self, name: str) -> Optional[float]:
+        """Время от начала запуска до отметки или конца фазы"""
+        if name in self.marks:
+            return self.marks[name] - self.t0
+        phase = self.phases.get(name)
+        if phase is not None and phase.finished is not None:
+            return phase.finished - self.t0
+        return None
+
+    def _run(self, phase: StartupPhase):
+        for dependency in phase.after:
+            self._event(dependency).wait()
+        if self._cancelled:
+            phase.skipped = True
+        else:
+            phase.started = self.clock()
+            try:
+                phase.func()
+            except Exception as e:
+                phase.error = str(e)
+                self.log(f"Фаза запуска {phase.name}: {e}", "WARNING")
+        phase.finished = self.clock()
+        self._event(phase.name).set()
+        self._check_complete()
+
+    @property
+    def complete(self) -> bool:
+        return (self._started
+                and all(phase.finished is not None for phase in self.phases.values())
+                and all(name in self.marks for name in self.report_after))
+
+    def _check_complete(self):
+        with self._lock:
+            if self._reported or not self.complete:
+                return
+            self._reported = True
+        report = self.report()
+        for listener in list(self.listeners):
+            listener(report)
+
+    def cancel(self):
+        """Остановка: фазы, ждущие зависимостей, пропускаются"""
+        self._cancelled = True
+        with self._lock:
+            events = list(self._events.values())
+        for event in events:
+            event.set()
+
+    def timings(self) -> List[Tuple[str, Optional[float], str]]:
+        """(имя, секунды, состояние) фаз в порядке объявления"""
+        rows = []
+        for phase in self.phases.values():
+            if phase.skipped:
+                state = 'пропущена'
+            elif phase.error:
+                state = 'ошибка'
+            elif phase.finished is None:
+                state = 'выполняется' if phase.started is not None else 'ожидает'
+            else:
+                state = 'ok'
+            rows.append((phase.name, phase.duration, state))
+        return rows
+
+    def report(self) -> str:
+        parts = [f"{name} {seconds:.3f} с" for name, seconds in
+                 sorted(((name, mark - self.t0) for name, mark in self.marks.items()),
+                        key=lambda item: item[1])]
+        for name, seconds, state in self.timings():
+            duration = f"{seconds:.3f} с" if seconds is not None else '-'
+            parts.append(f"{name} {duration}" + ('' if state == 'ok' else f" ({state})"))
+        return ', '.join(parts)
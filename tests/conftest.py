@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""Модули блокировщика лежат в корне репозитория; общие фикстуры тестов"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def simulated_blocker(tmp_path):
+    """Фабрика блокировщиков поверх SimulatedPlatform; остановка после теста"""
+    from process_tracker import FakeProcessProvider
+    from simulated_spotify import SimulatedPlatform, SimulatedSpotify
+    from spotify_ad_blocker import SpotifyAdBlocker
+
+    blockers = []
+
+    def factory(instances: int = 1, **spotify_options):
+        provider = FakeProcessProvider()
+        spotifies = [SimulatedSpotify(pid=4242 + 100 * index, session_id=index + 1, provider=provider,
+                                      **spotify_options) for index in range(instances)]
+        platform = SimulatedPlatform(spotifies, root=tmp_path / 'spotify')
+        blocker = SpotifyAdBlocker(config_dir=tmp_path / f'config{len(blockers)}', platform=platform)
+        blocker.log_writer.echo = False
+        blockers.append(blocker)
+        return blocker, platform
+
+    yield factory
+    for blocker in blockers:
+        blocker.stop()
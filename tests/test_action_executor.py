@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""ActionExecutor: приоритеты, дедупликация и отброс устаревших на внедренных часах"""
+
+import threading
+
+import pytest
+
+from action_executor import ActionExecutor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def held():
+    """(пул из одного потока, часы, release): поток занят заглушкой до release()"""
+    clock = Clock()
+    executor = ActionExecutor(workers=1, clock=clock)
+    gate = threading.Event()
+    started = threading.Event()
+
+    def hold():
+        started.set()
+        gate.wait(5.0)
+
+    executor.submit('hold', hold, priority=-1)
+    assert started.wait(5.0)
+    yield executor, clock, gate.set
+    gate.set()
+    executor.stop()
+
+
+def drain(executor):
+    done = threading.Event()
+    executor.submit('drain', done.set, priority=100, timeout=float('inf'))
+    assert done.wait(5.0)
+
+
+def test_actions_run_by_priority(held):
+    executor, _, release = held
+    order = []
+    executor.submit('cache', lambda: order.append('cache'), priority=3)
+    executor.submit('windows', lambda: order.append('windows'), priority=1)
+    executor.submit('skip', lambda: order.append('skip'), priority=0)
+    release()
+    drain(executor)
+    assert order == ['skip', 'windows', 'cache']
+
+
+def test_pending_duplicate_is_ignored(held):
+    executor, _, release = held
+    calls = []
+    assert executor.submit('skip', lambda: calls.append(1))
+    assert not executor.submit('skip', lambda: calls.append(2))
+    release()
+    drain(executor)
+    assert calls == [1]
+    assert executor.stats['skip'].deduplicated == 1
+    # После выполнения то же действие снова принимается
+    assert executor.submit('skip', lambda: calls.append(3))
+    drain(executor)
+    assert calls == [1, 3]
+
+
+def test_stale_action_is_dropped(held):
+    executor, clock, release = held
+    calls = []
+    executor.submit('skip', lambda: calls.append('skip'), timeout=1.0)
+    executor.submit('cache', lambda: calls.append('cache'), timeout=10.0)
+    clock.now += 2.0
+    release()
+    drain(executor)
+    assert calls == ['cache']
+    assert executor.stats['skip'].dropped == 1
+    assert executor.stats['skip'].count == 0
+    assert executor.stats['cache'].total_wait == pytest.approx(2.0)
+
+
+def test_slow_action_is_counted_not_interrupted():
+    clock = Clock()
+    executor = ActionExecutor(workers=1, clock=clock)
+    done = threading.Event()
+
+    def slow():
+        clock.now += 7.0
+        done.set()
+
+    try:
+        executor.submit('skip', slow, timeout=5.0)
+        assert done.wait(5.0)
+        drain(executor)
+        assert executor.stats['skip'].count == 1
+        assert executor.stats['skip'].timeouts == 1
+    finally:
+        executor.stop()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""AdCacheCleaner на дереве кэша в tmp_path: правила удаления, индекс mtime, фоновый поток"""
+
+import os
+import threading
+
+from ad_cache_cleaner import AdCacheCleaner
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_tree(root):
+    files = {
+        'Data/ad_banner.bin': True,
+        'Data/Advertisement.json': True,
+        'Data/promo-2024.dat': True,
+        'Data/track.ogg': False,
+        'Storage/nested/BANNER.png': True,
+        'Storage/nested/music.idx': False,
+    }
+    for relative in files:
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'x')
+    (root / 'Storage/ads_dir').mkdir()
+    return files
+
+
+def make_cleaner(tmp_path, clock=None):
+    root = tmp_path / 'Spotify'
+    root.mkdir()
+    files = make_tree(root)
+    cleaner = AdCacheCleaner([root, tmp_path / 'missing'], tmp_path / 'index.json',
+                             clock=clock or Clock())
+    return cleaner, root, files
+
+
+def test_sweep_deletes_only_matching_files(tmp_path):
+    cleaner, root, files = make_cleaner(tmp_path)
+    assert cleaner.sweep() == 4
+    for relative, is_ad in files.items():
+        assert (root / relative).exists() != is_ad, relative
+    # Папки с подходящим именем не удаляются
+    assert (root / 'Storage/ads_dir').is_dir()
+
+
+def test_unchanged_dirs_are_not_rescanned(tmp_path):
+    cleaner, root, _ = make_cleaner(tmp_path)
+    cleaner.sweep()
+    scanned = cleaner.stats['dirs_scanned']
+    cleaner.sweep()
+    assert cleaner.stats['dirs_scanned'] == scanned
+    assert cleaner.stats['dirs_skipped'] == scanned
+
+    # Новый файл меняет mtime только своей папки
+    data = root / 'Data'
+    (data / 'new_ad.tmp').write_bytes(b'x')
+    os.utime(data, ns=(0, os.stat(data).st_mtime_ns + 1_000_000))
+    assert cleaner.sweep() == 1
+    assert cleaner.stats['dirs_scanned'] == scanned + 1
+
+
+def test_index_is_persisted_and_pruned(tmp_path):
+    cleaner, root, _ = make_cleaner(tmp_path)
+    cleaner.sweep()
+    nested = str(root / 'Storage/nested')
+    assert nested in cleaner.index
+
+    reloaded = AdCacheCleaner([root], tmp_path / 'index.json')
+    assert reloaded.index == cleaner.index
+    reloaded.sweep()
+    assert reloaded.stats['dirs_scanned'] == 0
+
+    for path in (root / 'Storage/nested').iterdir():
+        path.unlink()
+    (root / 'Storage/nested').rmdir()
+    reloaded.sweep()
+    assert nested not in reloaded.index
+
+
+def test_quick_requests_start_one_sweep(tmp_path):
+    clock = Clock()
+    cleaner, _, _ = make_cleaner(tmp_path, clock)
+    gate = threading.Event()
+    started = threading.Event()
+    sweeps = []
+    cleaner.sweep = lambda: sweeps.append(1) or started.set() or gate.wait(5.0)
+    try:
+        results = []
+        callers = [threading.Thread(target=lambda: results.append(cleaner.request_sweep()))
+                   for _ in range(8)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        assert results.count(True) == 1
+        assert started.wait(5.0)
+        assert cleaner.busy
+        assert not cleaner.request_sweep()
+    finally:
+        gate.set()
+        cleaner.stop()
+    assert sweeps == [1]
+    assert not cleaner.busy
+    assert not cleaner.request_sweep()
+
+
+def test_stop_waits_for_running_sweep(tmp_path):
+    cleaner, _, _ = make_cleaner(tmp_path)
+    started = threading.Event()
+    finished = []
+
+    def slow_sweep():
+        started.set()
+        threading.Event().wait(0.2)
+        finished.append(1)
+
+    cleaner.sweep = slow_sweep
+    assert cleaner.request_sweep()
+    assert started.wait(5.0)
+    cleaner.stop()
+    assert finished == [1]
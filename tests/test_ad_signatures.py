@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""AdSignatureMatcher против прежних списков ключевых слов и вызовов re.search"""
+
+import re
+
+import pytest
+
+from ad_signatures import AD_KEYWORDS, AD_PATTERNS, AdSignatureMatcher
+
+TITLES = [
+    'Advertisement', 'Spotify - Advertisement', 'Sponsored', 'Spotify Ad', 'spotify ad break',
+    'Spotify', 'Spotify Free', 'SPOTIFY PREMIUM', '  Spotify  ', 'Spotify Premium Family',
+    'Arctic Lights - Midnight Drive', 'Nova Echo - Golden Hour (Remix)', 'AC/DC - T.N.T.',
+    'Sponsored Artist - Song', 'Artist - Advertisement Jingle', 'The Ad - Libs - Boy From NY',
+    'Upgrade now', 'Get Premium today', 'Try premium free for 30 days', 'upgrade to premium',
+    'Enjoy ad-free music', 'Ad free music with Premium', 'www.spotify.com/premium',
+    'https://spotify.com', 'spotify.com', 'Visit spotify.com - now', 'Subscribe today',
+    'Get Spotify Premium', 'Mad World', 'Adele', 'Premium', 'Ad', 'http', 'Hi', '',
+    'Radio - Ads are everywhere', 'Bad Advertisements - Live', 'Нова - Песня',
+]
+
+
+def old_window_title(title):
+    """Детектор заголовка до компиляции сигнатур"""
+    if not title:
+        return False
+    title_lower = title.lower().strip()
+    for indicator in ['advertisement', 'spotify ad', 'sponsored', 'spotify - advertisement']:
+        if indicator in title_lower:
+            return True
+    if title_lower in ['spotify', 'spotify free', 'spotify premium']:
+        return False
+    ad_patterns = ['spotify.com', 'upgrade now', 'get premium', 'ad-free music']
+    return any(pattern in title_lower for pattern in ad_patterns) and ' - ' not in title
+
+
+def old_track_duration(title):
+    """Детектор паттернов трека до компиляции сигнатур"""
+    if not title:
+        return False
+    title_lower = title.lower().strip()
+    if title_lower in ['spotify', 'spotify free', 'spotify premium']:
+        return False
+    for pattern in AD_PATTERNS['strong']:
+        if re.search(pattern, title_lower):
+            return True
+    if ' - ' in title:
+        parts = title.split(' - ')
+        if len(parts) == 2:
+            artist, track = parts[0].strip(), parts[1].strip()
+            if any(keyword in artist.lower() or keyword in track.lower()
+                   for keyword in ['advertisement', 'sponsored', 'spotify ad']):
+                return True
+        return False
+    if len(title.strip()) < 5:
+        return False
+    if any(re.search(pattern, title_lower) for pattern in [r'spotify\.com', r'www\.', r'http']):
+        return True
+    return any(re.search(pattern, title_lower) for pattern in AD_PATTERNS['action'])
+
+
+@pytest.fixture(scope='module')
+def matcher():
+    return AdSignatureMatcher()
+
+
+@pytest.mark.parametrize('title', TITLES)
+def test_groups_match_keyword_and_pattern_search(matcher, title):
+    verdict = matcher.match(title)
+    title_lower = title.lower().strip()
+    for group, keywords in AD_KEYWORDS.items():
+        assert verdict.has(group) == any(keyword in title_lower for keyword in keywords), group
+    for group, patterns in AD_PATTERNS.items():
+        assert verdict.has(group) == any(re.search(pattern, title_lower) for pattern in patterns), group
+    assert verdict.is_standard == (title_lower in ('spotify', 'spotify free', 'spotify premium'))
+
+
+def test_detectors_agree_with_old_keyword_logic(tmp_path):
+    from platform_backends import SpotifyWindow
+    from spotify_ad_blocker import DetectionSnapshot
+    from trace_replay import create_replay_blocker
+
+    blocker = create_replay_blocker(tmp_path)
+    try:
+        for title in TITLES:
+            windows = [SpotifyWindow(1, title, (0, 0, 800, 600), False)] if title else []
+            snapshot = DetectionSnapshot([], windows, title)
+            assert blocker._check_window_title(snapshot) == old_window_title(title), title
+            assert blocker._check_track_duration(snapshot) == old_track_duration(title), title
+    finally:
+        blocker.stop()
+
+
+def test_signature_names_and_cache(matcher):
+    verdict = matcher.match('Spotify - Advertisement')
+    assert 'exact:spotify - advertisement' in verdict.signatures
+    assert verdict.first('exact') == 'exact:advertisement'
+    assert verdict.in_groups('url') == ()
+    before = matcher.cache_info().hits
+    assert matcher.match('Spotify - Advertisement') is verdict
+    assert matcher.cache_info().hits == before + 1
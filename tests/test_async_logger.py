@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Фильтрация уровня до форматирования и отложенная подстановка аргументов"""
+
+from async_logger import AsyncLogWriter
+
+
+class Counted:
+    """Аргумент, считающий свои форматирования"""
+
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return 'counted'
+
+
+def test_filtered_record_is_never_formatted(tmp_path):
+    writer = AsyncLogWriter(tmp_path / 'ad_blocker.log', min_level='INFO', echo=False)
+    argument = Counted()
+    writer.write("Действие %s", "DEBUG", argument)
+    writer.close()
+    assert argument.formatted == 0
+    assert writer.written == 0
+
+
+def test_args_are_formatted_by_writer(tmp_path):
+    writer = AsyncLogWriter(tmp_path / 'ad_blocker.log', echo=False)
+    writer.write("Действие %s: %.1f мс", "INFO", 'skip_ad_track', 12.345)
+    writer.write("100% без аргументов", "INFO")
+    writer.write("неверный формат %d", "INFO", 'x')
+    writer.close()
+    text = (tmp_path / 'ad_blocker.log').read_text(encoding='utf-8')
+    assert "Действие skip_ad_track: 12.3 мс" in text
+    assert "100% без аргументов" in text
+    assert "неверный формат %d ('x',)" in text
+
+
+def test_blocker_skips_instance_prefix_for_filtered_level(simulated_blocker):
+    blocker, _ = simulated_blocker()
+    argument = Counted()
+    blocker.log("Ошибка чтения уровня звука: %s", "DEBUG", argument)
+    assert not blocker.log_writer.enabled('DEBUG')
+    assert argument.formatted == 0
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""Кэш аудио сессии, повтор поиска по таймеру и анализ пиковых уровней"""
+
+from types import SimpleNamespace
+
+from audio_backends import AudioPeakMonitor, PycawAudioBackend, SyntheticAudioBackend
+
+
+class FakeMeter:
+    def __init__(self, level=0.5):
+        self.level = level
+
+    def GetPeakValue(self):
+        return self.level
+
+
+class FakeAudioUtilities:
+    """Сессии Core Audio: процесс + интерфейс, отдающий счетчик уровня"""
+
+    def __init__(self):
+        self.sessions = []
+        self.enumerations = 0
+
+    def add(self, pid, meter):
+        control = SimpleNamespace(QueryInterface=lambda interface: meter)
+        self.sessions.append(SimpleNamespace(Process=SimpleNamespace(pid=pid), _ctl=control))
+
+    def GetAllSessions(self):
+        self.enumerations += 1
+        return list(self.sessions)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_backend(retry_interval=5.0):
+    utilities = FakeAudioUtilities()
+    clock = Clock()
+    backend = PycawAudioBackend(utilities, meter_interface=object(),
+                                retry_interval=retry_interval, clock=clock)
+    return backend, utilities, clock
+
+
+def test_session_is_cached_while_pids_are_unchanged():
+    backend, utilities, _ = make_backend()
+    utilities.add(10, FakeMeter(0.7))
+    for _ in range(5):
+        assert backend.bind([10, 11])
+        assert backend.peak() == 0.7
+    assert utilities.enumerations == 1
+
+
+def test_missing_session_is_retried_on_backoff():
+    backend, utilities, clock = make_backend(retry_interval=5.0)
+    for _ in range(10):
+        clock.now += 0.1
+        assert not backend.bind([10])
+    assert utilities.enumerations == 1
+
+    utilities.add(10, FakeMeter())
+    clock.now += 5.0
+    assert backend.bind([10])
+    assert utilities.enumerations == 2
+
+
+def test_pid_change_looks_up_session_immediately():
+    backend, utilities, clock = make_backend()
+    assert not backend.bind([10])
+    utilities.add(20, FakeMeter())
+    assert backend.bind([20])
+    assert utilities.enumerations == 2
+    assert not backend.bind([])
+    assert utilities.enumerations == 2
+
+
+def test_closed_session_is_looked_up_again():
+    backend, utilities, _ = make_backend()
+    meter = FakeMeter()
+    utilities.add(10, meter)
+    assert backend.bind([10])
+
+    def closed():
+        raise OSError("session closed")
+
+    meter.GetPeakValue = closed
+    assert backend.peak() is None
+    assert backend.bind([10])
+    assert utilities.enumerations == 2
+
+
+def test_monitor_detects_loudness_jump():
+    clock = Clock()
+    levels = [0.2] * 10 + [0.8] * 10
+    monitor = AudioPeakMonitor(SyntheticAudioBackend(levels, clock=clock), window=1.0, clock=clock)
+    for _ in levels:
+        clock.now += 0.1
+        monitor.sample([1])
+    assert monitor.loudness_jump()
+    assert monitor.ad_like()
+
+
+def test_monitor_detects_silence_gap():
+    clock = Clock()
+    levels = [0.5] * 5 + [0.0] * 5 + [0.5] * 3
+    monitor = AudioPeakMonitor(SyntheticAudioBackend(levels, clock=clock), window=3.0, clock=clock)
+    for _ in levels:
+        clock.now += 0.1
+        monitor.sample([1])
+    assert monitor.silence_gap()
+    assert not monitor.loudness_jump()
+
+
+def test_monitor_forgets_history_of_other_process():
+    clock = Clock()
+    monitor = AudioPeakMonitor(SyntheticAudioBackend(lambda now: 0.5, clock=clock), clock=clock)
+    monitor.sample([1])
+    monitor.sample([1])
+    monitor.sample([2])
+    assert len(monitor.samples) == 1
+    assert monitor.sample([]) is None
+
+
+def test_audio_detector_sees_music_before_ad(simulated_blocker):
+    clock = Clock()
+    # Трек 10 с, затем громкая реклама; по заголовку "Spotify Ad" решает аудио детектор
+    blocker, _ = simulated_blocker(tracks_between_ads=1, ad_break=(1, 1), track_length=(10.0, 10.0),
+                                   ad_length=(20.0, 20.0), ad_titles=('Spotify Ad',), clock=clock)
+    blocker.clock = clock
+    backend = SyntheticAudioBackend(lambda now: 0.9 if now >= 10.0 else 0.3, clock=clock)
+    blocker.audio_monitor = AudioPeakMonitor(backend, window=0.5, clock=clock)
+
+    music_ticks = 0
+    while clock.now < 10.0:
+        assert not blocker.is_ad_playing(blocker.take_snapshot())
+        music_ticks += 1
+        clock.now += 0.2
+    # На музыке конвейер до аудио не доходит, но уровни копятся каждый тик
+    assert blocker.detectors.run_counts['audio'] == 0
+    assert len(blocker.audio_monitor.samples) == music_ticks
+
+    while clock.now < 11.0:
+        blocker.is_ad_playing(blocker.take_snapshot())
+        clock.now += 0.2
+    assert blocker.detectors.run_counts['audio'] > 0
+    assert blocker.instrumentation.counters.get('detector_hits.audio', 0) > 0
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""Индексы внешних списков: поиск, перекомпиляция и уборка старых файлов"""
+
+import os
+from pathlib import Path
+
+from blocklist_index import (FLAG_EXACT, FLAG_SUBTREE, BlocklistIndex, ExternalBlocklists,
+                             compile_source, write_index)
+
+
+def write_source(path: Path, lines, mtime=None):
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def idx_files(cache_dir: Path):
+    return sorted(path.name for path in cache_dir.glob('*.idx'))
+
+
+def test_index_lookup_formats(tmp_path):
+    source = tmp_path / 'list.txt'
+    write_source(source, ['0.0.0.0 ads.example.com tracker.example.com', '||adnet.example^',
+                          '*.cdn.example', '# comment', 'localhost'])
+    compile_source(source, tmp_path / 'list.idx')
+    index = BlocklistIndex(tmp_path / 'list.idx')
+    try:
+        assert index.is_blocked('ads.example.com')
+        assert not index.is_blocked('sub.ads.example.com')
+        assert index.is_blocked('adnet.example')
+        assert index.is_blocked('x.adnet.example')
+        assert index.is_blocked('img.cdn.example')
+        assert not index.is_blocked('example.com')
+        assert not index.is_blocked('localhost')
+        assert set(index.iter_names()) == {'ads.example.com', 'tracker.example.com', 'adnet.example'}
+    finally:
+        index.close()
+
+
+def test_closed_index_answers_false(tmp_path):
+    source = tmp_path / 'list.txt'
+    write_source(source, ['ads.example.com'])
+    compile_source(source, tmp_path / 'list.idx')
+    index = BlocklistIndex(tmp_path / 'list.idx')
+    index.close()
+    index.close()
+    assert not index.is_blocked('ads.example.com')
+    assert list(index.iter_names()) == []
+
+
+def test_reload_closes_and_removes_replaced_index(tmp_path):
+    source = tmp_path / 'list.txt'
+    cache = tmp_path / 'cache'
+    write_source(source, ['ads.example.com'], mtime=1_000_000)
+    blocklists = ExternalBlocklists([source], cache)
+    assert blocklists.reload()
+    assert not blocklists.reload()
+    old_index = next(iter(blocklists.indexes.values()))
+    old_files = idx_files(cache)
+    assert len(old_files) == 1
+
+    write_source(source, ['tracker.example.com'], mtime=2_000_000)
+    assert blocklists.reload()
+    assert old_index.closed
+    assert blocklists.is_blocked('tracker.example.com')
+    assert not blocklists.is_blocked('ads.example.com')
+    new_files = idx_files(cache)
+    assert len(new_files) == 1 and new_files != old_files
+
+
+def test_removed_source_index_is_closed_and_deleted(tmp_path):
+    first, second = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    write_source(first, ['ads.example.com'])
+    write_source(second, ['tracker.example.com'])
+    cache = tmp_path / 'cache'
+    blocklists = ExternalBlocklists([first, second], cache)
+    blocklists.reload()
+    dropped = blocklists.indexes[str(second)]
+
+    blocklists.sources = [first]
+    assert blocklists.reload()
+    assert dropped.closed
+    assert len(idx_files(cache)) == 1
+
+
+def test_undeletable_index_is_retried_on_next_reload(tmp_path, monkeypatch):
+    source = tmp_path / 'list.txt'
+    cache = tmp_path / 'cache'
+    write_source(source, ['ads.example.com'])
+    blocklists = ExternalBlocklists([source], cache)
+    cache.mkdir()
+    stale = cache / '0123456789ab-deadbeef.idx'
+    stale.write_bytes(b'')
+
+    unlink = Path.unlink
+
+    def locked_unlink(path, *args, **kwargs):
+        if path == stale:
+            raise PermissionError("файл открыт другим процессом")
+        return unlink(path, *args, **kwargs)
+
+    monkeypatch.setattr(Path, 'unlink', locked_unlink)
+    blocklists.reload()
+    assert stale.exists()
+    assert blocklists.orphans == [stale.name]
+
+    monkeypatch.setattr(Path, 'unlink', unlink)
+    assert not blocklists.reload()
+    assert not stale.exists()
+    assert blocklists.orphans == []
+
+
+def test_chunked_sort_matches_in_memory_sort(tmp_path):
+    records = [(f'com.example.host{n % 37:03d}'.encode('ascii'), FLAG_EXACT) for n in range(100)]
+    records += [(b'com.example.host005', FLAG_SUBTREE), (b'com.aaa', FLAG_EXACT)]
+    assert write_index(tmp_path / 'memory.idx', iter(records)) == 38
+    assert write_index(tmp_path / 'chunked.idx', iter(records), chunk_keys=4) == 38
+    assert (tmp_path / 'memory.idx').read_bytes() == (tmp_path / 'chunked.idx').read_bytes()
+
+    index = BlocklistIndex(tmp_path / 'chunked.idx')
+    try:
+        assert index.flags(b'com.example.host005') == FLAG_EXACT | FLAG_SUBTREE
+        assert index.is_blocked('deep.host005.example.com')
+        assert index.is_blocked('aaa.com')
+        assert not index.is_blocked('host037.example.com')
+        names = list(index.iter_names())
+        assert names[0] == 'aaa.com' and len(names) == 38
+    finally:
+        index.close()
+
+
+def test_empty_index(tmp_path):
+    assert write_index(tmp_path / 'empty.idx', iter([])) == 0
+    index = BlocklistIndex(tmp_path / 'empty.idx')
+    try:
+        assert not index.is_blocked('ads.example.com')
+    finally:
+        index.close()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""DetectorPipeline: порядок по стоимости и ранняя остановка"""
+
+from detector_pipeline import DetectorPipeline
+
+
+def make_pipeline(values, rule):
+    calls = []
+    pipeline = DetectorPipeline(rule)
+    for name, cost in (('expensive', 3), ('cheap', 1), ('middle', 2)):
+        pipeline.register(name, lambda name=name: calls.append(name) or values[name], cost=cost)
+    return pipeline, calls
+
+
+def test_detectors_run_cheapest_first_until_decided():
+    rule = lambda results: results.get('cheap', False) and (results.get('middle', False)
+                                                           or results.get('expensive', False))
+    pipeline, calls = make_pipeline({'cheap': False, 'middle': True, 'expensive': True}, rule)
+    assert pipeline.evaluate() == (False, {'cheap': False})
+    assert calls == ['cheap']
+
+    pipeline, calls = make_pipeline({'cheap': True, 'middle': True, 'expensive': False}, rule)
+    assert pipeline.evaluate() == (True, {'cheap': True, 'middle': True})
+    assert calls == ['cheap', 'middle']
+    assert pipeline.run_counts == {'cheap': 1, 'middle': 1, 'expensive': 0}
+
+
+def test_undecided_rule_runs_everything():
+    rule = lambda results: sum(results.values()) >= 2
+    pipeline, calls = make_pipeline({'cheap': True, 'middle': False, 'expensive': True}, rule)
+    assert pipeline.evaluate() == (True, {'cheap': True, 'middle': False, 'expensive': True})
+    assert calls == ['cheap', 'middle', 'expensive']
+
+
+def test_skipped_detectors_are_logged_as_dash(tmp_path):
+    from platform_backends import SpotifyWindow
+    from spotify_ad_blocker import DetectionSnapshot
+    from trace_replay import create_replay_blocker
+
+    blocker = create_replay_blocker(tmp_path)
+    lines = []
+    blocker.log = lambda message, level='INFO', *args: lines.append(message)
+    processes = [{'pid': 10, 'name': 'Spotify.exe', 'cmdline': ['Spotify.exe']}]
+    try:
+        window = SpotifyWindow(1, 'Advertisement', (0, 0, 800, 600), False)
+        assert blocker.is_ad_playing(DetectionSnapshot(processes, [window], 'Advertisement'))
+    finally:
+        blocker.stop()
+    line = next(line for line in lines if line.startswith('Реклама обнаружена'))
+    assert 'окно=True' in line and 'длительность=True' in line
+    assert 'аудио=-' in line and 'процесс=-' in line
+    assert 'None' not in line
+
+
+def test_ad_is_counted_once_per_ad_not_per_tick(tmp_path):
+    from platform_backends import SpotifyWindow
+    from spotify_ad_blocker import DetectionSnapshot
+    from trace_replay import create_replay_blocker
+
+    blocker = create_replay_blocker(tmp_path)
+    processes = [{'pid': 10, 'name': 'Spotify.exe', 'cmdline': ['Spotify.exe']}]
+    try:
+        for title in ['Advertisement'] * 5 + ['Artist - Song'] + ['Advertisement'] * 3:
+            window = SpotifyWindow(1, title, (0, 0, 800, 600), False)
+            blocker.is_ad_playing(DetectionSnapshot(processes, [window], title))
+    finally:
+        blocker.stop()
+    assert blocker.instrumentation.counters['ad_detections'] == 2
+    assert blocker.instrumentation.counters['ad_ticks'] == 8
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""DnsSinkhole против заглушки вышестоящего сервера на localhost"""
+
+import socket
+import struct
+import threading
+
+import pytest
+
+from dns_sinkhole import DnsSinkhole, FLAG_QR, FLAG_RD, FLAG_TC, QCLASS_IN, QTYPE_A, parse_query
+from domain_blocklist import DomainBlocklist
+
+
+def make_query(name: str, qid: int = 0x1234, qtype: int = QTYPE_A) -> bytes:
+    labels = b''.join(bytes([len(label)]) + label.encode() for label in name.split('.'))
+    return struct.pack('!6H', qid, FLAG_RD, 1, 0, 0, 0) + labels + b'\0' + struct.pack('!HH', qtype, QCLASS_IN)
+
+
+def make_answer(query: bytes, address: bytes, ttl: int = 300) -> bytes:
+    """Ответ с одной A-записью на запрос query (id и вопрос из запроса)"""
+    question = parse_query(query)
+    header = struct.pack('!6H', question.qid, FLAG_QR | FLAG_RD, 1, 1, 0, 0)
+    answer = struct.pack('!HHHIH', 0xC00C, QTYPE_A, QCLASS_IN, ttl, 4) + address
+    return header + query[12:question.end] + answer
+
+
+def answer_address(response: bytes) -> bytes:
+    return response[-4:]
+
+
+class StubUpstream:
+    """Вышестоящий DNS-сервер: на каждый запрос вызывает handler(sock, query, addr)"""
+
+    def __init__(self, handler, family=socket.AF_INET, host='127.0.0.1'):
+        self.handler = handler
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+        self.sock.bind((host, 0))
+        self.sock.settimeout(0.2)
+        self.address = self.sock.getsockname()
+        self.queries = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                query, addr = self.sock.recvfrom(4096)
+            except socket.timeout:
+                continue
+            self.queries.append(query)
+            self.handler(self.sock, query, addr)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(2.0)
+        self.sock.close()
+
+
+@pytest.fixture
+def sinkhole_with(request):
+    """Фабрика: сервер-заглушка с обработчиком + запущенный DnsSinkhole"""
+    started = []
+
+    def factory(handler, upstream_host=None):
+        if upstream_host is None:
+            upstream = StubUpstream(handler)
+        else:
+            # Заглушка на том адресе, в который разрешится имя
+            family, _, _, _, sockaddr = socket.getaddrinfo(upstream_host, 0, type=socket.SOCK_DGRAM)[0]
+            upstream = StubUpstream(handler, family, sockaddr[0])
+        upstream_address = (upstream_host or upstream.address[0], upstream.address[1])
+        sinkhole = DnsSinkhole(DomainBlocklist(['.ads.example']), listen=('127.0.0.1', 0),
+                               upstream=upstream_address, timeout=1.0)
+        sinkhole.start()
+        started.append((upstream, sinkhole))
+        return upstream, sinkhole
+
+    yield factory
+    for upstream, sinkhole in started:
+        sinkhole.stop()
+        upstream.close()
+
+
+def ask(sinkhole: DnsSinkhole, query: bytes) -> bytes:
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(3.0)
+    try:
+        client.sendto(query, ('127.0.0.1', sinkhole.port))
+        return client.recvfrom(4096)[0]
+    finally:
+        client.close()
+
+
+def test_forwards_and_caches_genuine_reply(sinkhole_with):
+    upstream, sinkhole = sinkhole_with(
+        lambda sock, query, addr: sock.sendto(make_answer(query, b'\x05\x06\x07\x08'), addr))
+    query = make_query('music.example', qid=0x4242)
+
+    response = ask(sinkhole, query)
+    assert response[:2] == query[:2]
+    assert answer_address(response) == b'\x05\x06\x07\x08'
+
+    response = ask(sinkhole, make_query('music.example', qid=0x4343))
+    assert response[:2] == b'\x43\x43'
+    assert len(upstream.queries) == 1
+    assert sinkhole.counters['cache_hits'] == 1
+
+
+def test_upstream_given_by_name(sinkhole_with):
+    upstream, sinkhole = sinkhole_with(
+        lambda sock, query, addr: sock.sendto(make_answer(query, b'\x05\x06\x07\x08'), addr),
+        upstream_host='localhost')
+    response = ask(sinkhole, make_query('music.example'))
+    assert answer_address(response) == b'\x05\x06\x07\x08'
+    assert sinkhole.counters['upstream_rejected'] == 0
+    assert sinkhole.counters['forwarded'] == 1
+
+
+def test_blocked_name_is_not_forwarded(sinkhole_with):
+    upstream, sinkhole = sinkhole_with(lambda sock, query, addr: None)
+    response = ask(sinkhole, make_query('tracker.ads.example'))
+    assert struct.unpack('!H', response[2:4])[0] & 0x000F == 3
+    assert upstream.queries == []
+
+
+def test_upstream_ids_are_random(sinkhole_with):
+    upstream, sinkhole = sinkhole_with(
+        lambda sock, query, addr: sock.sendto(make_answer(query, b'\x01\x01\x01\x01'), addr))
+    for index in range(8):
+        ask(sinkhole, make_query(f'host{index}.example', qid=1))
+    ids = [query[:2] for query in upstream.queries]
+    assert len(set(ids)) > 1
+    assert ids != sorted(ids)
+
+
+def test_reply_with_other_question_is_rejected(sinkhole_with):
+    def handler(sock, query, addr):
+        # Подделка с верным id, но вопросом о другом имени, затем настоящий ответ
+        forged_query = query[:2] + make_query('evil.example')[2:]
+        sock.sendto(make_answer(forged_query, b'\x06\x06\x06\x06'), addr)
+        sock.sendto(make_answer(query, b'\x05\x06\x07\x08'), addr)
+
+    upstream, sinkhole = sinkhole_with(handler)
+    response = ask(sinkhole, make_query('music.example'))
+    assert answer_address(response) == b'\x05\x06\x07\x08'
+    assert sinkhole.counters['upstream_rejected'] == 1
+
+    cached = ask(sinkhole, make_query('music.example'))
+    assert answer_address(cached) == b'\x05\x06\x07\x08'
+
+
+def test_reply_from_other_address_is_rejected(sinkhole_with):
+    spoofer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    spoofer.bind(('127.0.0.1', 0))
+
+    def handler(sock, query, addr):
+        # Верные id и вопрос, но не с адреса вышестоящего сервера
+        spoofer.sendto(make_answer(query, b'\x06\x06\x06\x06'), addr)
+        sock.sendto(make_answer(query, b'\x05\x06\x07\x08'), addr)
+
+    try:
+        upstream, sinkhole = sinkhole_with(handler)
+        response = ask(sinkhole, make_query('music.example'))
+        assert answer_address(response) == b'\x05\x06\x07\x08'
+        assert sinkhole.counters['upstream_rejected'] == 1
+    finally:
+        spoofer.close()
+
+
+def test_unanswered_query_gets_servfail(sinkhole_with):
+    upstream, sinkhole = sinkhole_with(lambda sock, query, addr: None)
+    response = ask(sinkhole, make_query('silent.example'))
+    assert struct.unpack('!H', response[2:4])[0] & 0x000F == 2
+    assert sinkhole.counters['upstream_errors'] == 1
+    assert sinkhole._pending == {}
+
+
+def test_tcp_upstream_closing_early_gets_servfail(sinkhole_with):
+    def handler(sock, query, addr):
+        # Обрезанный ответ по UDP - пересылка уходит на TCP
+        truncated = bytearray(make_answer(query, b'\x05\x06\x07\x08'))
+        struct.pack_into('!H', truncated, 2, FLAG_QR | FLAG_RD | FLAG_TC)
+        sock.sendto(bytes(truncated), addr)
+
+    upstream, sinkhole = sinkhole_with(handler)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(upstream.address)
+    listener.listen(1)
+
+    def close_early():
+        connection, _ = listener.accept()
+        connection.recv(4096)
+        connection.sendall(b'\x00\x40')  # длина 64, но тело не приходит
+        connection.close()
+
+    closer = threading.Thread(target=close_early, daemon=True)
+    closer.start()
+    try:
+        response = ask(sinkhole, make_query('music.example'))
+        assert struct.unpack('!H', response[2:4])[0] & 0x000F == 2
+        assert sinkhole.counters['upstream_errors'] == 1
+    finally:
+        closer.join(2.0)
+        listener.close()
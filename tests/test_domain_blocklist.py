@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""Дерево правил DomainBlocklist: виды правил, границы меток, публичные суффиксы"""
+
+import pytest
+
+from domain_blocklist import (RULE_EXACT, RULE_SUFFIX, RULE_WILDCARD, DomainBlocklist,
+                              default_blocklist, normalize_entry)
+
+
+def test_exact_rule_matches_only_the_name():
+    blocklist = DomainBlocklist(['spotify.com'])
+    assert blocklist.is_blocked('spotify.com')
+    assert blocklist.is_blocked('SPOTIFY.COM.')
+    assert not blocklist.is_blocked('ads.spotify.com')
+    assert not blocklist.is_blocked('notspotify.com')
+    assert not blocklist.is_blocked('spotify.com.evil.net')
+
+
+def test_suffix_rule_matches_domain_and_subdomains():
+    blocklist = DomainBlocklist(['.doubleclick.net'])
+    assert blocklist.is_blocked('doubleclick.net')
+    assert blocklist.is_blocked('ad.g.doubleclick.net')
+    assert not blocklist.is_blocked('notdoubleclick.net')
+    assert not blocklist.is_blocked('net')
+
+
+def test_wildcard_rule_matches_only_subdomains():
+    blocklist = DomainBlocklist(['*.doubleclick.net'])
+    assert blocklist.is_blocked('ad.doubleclick.net')
+    assert blocklist.is_blocked('a.b.doubleclick.net')
+    assert not blocklist.is_blocked('doubleclick.net')
+    assert not blocklist.is_blocked('xdoubleclick.net')
+
+
+def test_glob_rule_stays_within_one_label():
+    blocklist = DomainBlocklist(['audio-sp-*.pscdn.co'])
+    assert blocklist.is_blocked('audio-sp-fra.pscdn.co')
+    assert not blocklist.is_blocked('audio-sp-fra.cdn.pscdn.co')
+    assert not blocklist.is_blocked('audio-fra.pscdn.co')
+    assert not blocklist.is_blocked('pscdn.co')
+
+
+def test_rules_share_the_tree():
+    blocklist = DomainBlocklist(['ads.spotify.com', '.pubmatic.com', '*.moatads.com'])
+    assert blocklist.is_blocked('ads.spotify.com')
+    assert blocklist.is_blocked('x.pubmatic.com')
+    assert blocklist.is_blocked('js.moatads.com')
+    assert not blocklist.is_blocked('spotify.com')
+    assert not blocklist.is_blocked('moatads.com')
+    assert blocklist.stats()[RULE_WILDCARD] == 1
+
+
+@pytest.mark.parametrize('entry', ['*.com', '.com', 'com', '*.co.uk', '.co.uk', 'ads-*.com',
+                                   'ads-*.co.uk', 'spotify.*', 'x.*.com'])
+def test_public_suffix_wildcards_are_rejected(entry):
+    assert normalize_entry(entry) is None
+    blocklist = DomainBlocklist([entry])
+    assert len(blocklist) == 0
+    assert blocklist.skipped_count == 1
+    assert not blocklist.is_blocked('bbc.co.uk')
+    assert not blocklist.is_blocked('example.com')
+
+
+@pytest.mark.parametrize('entry, rule', [
+    ('.bbc.co.uk', ('bbc.co.uk', RULE_SUFFIX)),
+    ('*.ads.co.uk', ('*.ads.co.uk', RULE_WILDCARD)),
+    ('co.uk', ('co.uk', RULE_EXACT)),
+    ('https://Ads.Spotify.com.', ('ads.spotify.com', RULE_EXACT)),
+])
+def test_rules_below_public_suffix_are_kept(entry, rule):
+    assert normalize_entry(entry) == rule
+
+
+def test_url_path_is_skipped():
+    assert normalize_entry('facebook.com/tr') is None
+
+
+def test_default_list_has_no_skipped_entries():
+    blocklist = default_blocklist()
+    assert blocklist.skipped_count == 0
+    assert blocklist.is_blocked('audio-sp-fra.pscdn.co')
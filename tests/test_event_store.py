@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""EventStore -> EventQuery: запись пачками и отчеты по events.db"""
+
+import sqlite3
+import time
+
+from event_store import EventQuery, EventStore
+
+
+def test_round_trip_through_event_query(tmp_path):
+    path = tmp_path / 'events.db'
+    store = EventStore(path, flush_interval=0.05, batch_size=3)
+    store.title_changed(100.0, 'Artist - Song', None)
+    store.title_changed(110.0, 'Advertisement', 'Artist - Song', instance=4242)
+    store.detection(110.5, 'Advertisement', ['title', 'duration'], ['exact:advertisement'], instance=4242)
+    store.detection(140.0, 'Sponsored', ['title', 'duration'])
+    store.detection(150.0, 'Advertisement', ['title', 'audio', 'process'])
+    store.action(110.6, 'skip.simulated', 0.012, True, instance=4242)
+    store.action(140.1, 'skip.simulated', 0.030, True)
+    store.action(150.1, 'close_ad_windows', 0.002, False)
+    store.close()
+    store.close()
+    assert store.written == 8 and store.dropped == 0
+    assert store.batches >= 3
+
+    query = EventQuery(path)
+    try:
+        assert query.title_history('Advertisement') == [
+            {'ts': 110.0, 'instance': 4242, 'title': 'Advertisement', 'previous': 'Artist - Song'}]
+        detections = query.detections(since=110.0, until=145.0)
+        assert [row['title'] for row in detections] == ['Sponsored', 'Advertisement']
+        assert detections[1]['detectors'] == 'title,duration'
+        assert detections[1]['signatures'] == 'exact:advertisement'
+
+        assert query.detected_titles()[0] == {'title': 'Advertisement', 'detections': 2, 'last_ts': 150.0}
+        combinations = {row['detectors']: row['detections'] for row in query.detector_combinations()}
+        assert combinations == {'title,duration': 2, 'title,audio,process': 1}
+
+        actions = {row['action']: row for row in query.action_latencies()}
+        assert actions['skip.simulated']['count'] == 2 and actions['skip.simulated']['ok'] == 2
+        assert round(actions['skip.simulated']['max_ms']) == 30
+        assert actions['close_ad_windows']['ok'] == 0
+
+        report = query.report(since=105.0)
+        assert report['title_changes'] == 1
+        assert len(report['detected_titles']) == 2
+    finally:
+        query.close()
+
+
+def test_store_uses_wal_and_title_index(tmp_path):
+    path = tmp_path / 'events.db'
+    EventStore(path).close()
+    connection = sqlite3.connect(str(path))
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        plan = ' '.join(row[-1] for row in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM detections WHERE title = ?", ('x',)))
+        assert 'detections_title' in plan
+    finally:
+        connection.close()
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    store = EventStore(tmp_path / 'events.db', flush_interval=60.0, batch_size=10000, max_queue=5)
+    started = time.monotonic()
+    for index in range(50):
+        store.title_changed(float(index), f'Track {index}', None)
+    assert time.monotonic() - started < 1.0
+    store.close()
+    assert store.written + store.dropped == 50
+    assert store.dropped > 0
+    store.title_changed(99.0, 'after close', None)
+    assert store.written + store.dropped == 50
+
+
+def test_blocker_records_titles_detections_and_actions(simulated_blocker, tmp_path):
+    from platform_backends import SpotifyWindow
+    from spotify_ad_blocker import DetectionSnapshot
+
+    blocker, _ = simulated_blocker()
+    path = tmp_path / 'blocker-events.db'
+    blocker.configure_events(True, path)
+    processes = [{'pid': 4242, 'name': 'Spotify.exe', 'cmdline': ['Spotify.exe']}]
+    for index, title in enumerate(['Artist - Song'] * 3 + ['Advertisement'] * 3):
+        window = SpotifyWindow(1, title, (0, 0, 800, 600), False)
+        blocker.process_tick(DetectionSnapshot(processes, [window], title, timestamp=1000.0 + index))
+    blocker._record_action('skip_ad_track:4242', 0.01, True)
+    blocker.event_store.close()
+
+    query = EventQuery(path)
+    try:
+        titles = [row['title'] for row in query._rows("SELECT title FROM title_changes ORDER BY ts")]
+        assert titles == ['Artist - Song', 'Advertisement']
+        assert [row['title'] for row in query.detected_titles()] == ['Advertisement']
+        assert query.action_latencies()[0]['action'] == 'skip_ad_track'
+        assert query._rows("SELECT instance FROM actions") == [{'instance': 4242}]
+    finally:
+        query.close()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""HostsFileWriter: пропуск неизмененного содержимого и слияние блока"""
+
+from hosts_writer import HostsFileWriter
+
+USER_LINES = "127.0.0.1 localhost\n# comment\n10.0.0.5 nas.local\n"
+
+
+def domains(*names):
+    return lambda: iter(names)
+
+
+def test_write_skips_unchanged_content(tmp_path):
+    writer = HostsFileWriter(tmp_path / 'user_hosts')
+    assert writer.write(domains('ads.example', 'spclient.example'), header=("Header",))
+    mtime = writer.path.stat().st_mtime_ns
+    assert not writer.write(domains('ads.example', 'spclient.example'), header=("Header",))
+    assert writer.path.stat().st_mtime_ns == mtime
+    assert writer.write(domains('ads.example'))
+    assert '127.0.0.1 spclient.example' not in writer.path.read_text()
+
+
+def test_write_rewrites_changed_header_or_markers(tmp_path):
+    path = tmp_path / 'user_hosts'
+    assert HostsFileWriter(path).write(domains('ads.example'), header=("Старый заголовок",))
+    assert HostsFileWriter(path).write(domains('ads.example'), header=("Новый заголовок",))
+    assert '# Новый заголовок' in path.read_text(encoding='utf-8')
+
+    assert HostsFileWriter(path, name='other-blocker').write(domains('ads.example'),
+                                                              header=("Новый заголовок",))
+    assert '# >>> other-blocker' in path.read_text(encoding='utf-8')
+
+
+def test_merge_keeps_user_lines_and_replaces_block(tmp_path):
+    path = tmp_path / 'hosts'
+    path.write_text(USER_LINES)
+    writer = HostsFileWriter(path)
+
+    assert writer.merge_block(domains('ads.example'))
+    assert not writer.merge_block(domains('ads.example'))
+    assert writer.merge_block(domains('other.example'))
+
+    text = path.read_text()
+    assert text.startswith(USER_LINES)
+    assert '127.0.0.1 other.example\n' in text
+    assert 'ads.example' not in text
+    assert text.count(writer.begin_marker) == 1
+    assert text.count(writer.end_marker) == 1
+
+    assert writer.remove_block()
+    assert path.read_text() == USER_LINES
+    assert not writer.remove_block()
+
+
+def test_merge_appends_newline_to_unterminated_file(tmp_path):
+    path = tmp_path / 'hosts'
+    path.write_text("127.0.0.1 localhost")
+    HostsFileWriter(path).merge_block(domains('ads.example'))
+    assert path.read_text().startswith("127.0.0.1 localhost\n# >>> ")
+
+
+def test_missing_end_marker_keeps_following_lines(tmp_path):
+    path = tmp_path / 'hosts'
+    messages = []
+    writer = HostsFileWriter(path, log=lambda message, level='INFO': messages.append(level))
+    path.write_text(f"127.0.0.1 localhost\n{writer.begin_marker} sha256=0\n{USER_LINES}")
+
+    assert writer.merge_block(domains('ads.example'))
+    text = path.read_text()
+    assert text.startswith("127.0.0.1 localhost\n")
+    assert text.endswith(USER_LINES)
+    assert '127.0.0.1 ads.example\n' in text
+    assert text.count(writer.begin_marker) == 1
+    assert messages == ['WARNING']
+
+    # Теперь блок целый: повторное слияние ничего не меняет
+    assert not writer.merge_block(domains('ads.example'))
+
+
+def test_only_begin_marker(tmp_path):
+    path = tmp_path / 'hosts'
+    writer = HostsFileWriter(path)
+    path.write_text(f"{writer.begin_marker} sha256=0\n")
+
+    assert writer.merge_block(domains('ads.example'))
+    text = path.read_text()
+    assert text.count(writer.begin_marker) == 1
+    assert text.count(writer.end_marker) == 1
+    assert writer.remove_block()
+    assert path.read_text() == ''
+
+
+def test_remove_block_without_end_marker_keeps_lines(tmp_path):
+    path = tmp_path / 'hosts'
+    writer = HostsFileWriter(path)
+    path.write_text(f"{writer.begin_marker} sha256=0\n{USER_LINES}")
+    assert writer.remove_block()
+    assert path.read_text() == USER_LINES
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Общий обход экземпляров Spotify и общий пул аудио сессий"""
+
+from audio_backends import AudioPeakMonitor, AudioSessionPool, PooledAudioBackend
+from multi_session import SpotifyInstanceScanner, group_by_root
+from poll_scheduler import AdaptivePollScheduler
+from process_tracker import FakeProcessProvider, SpotifyProcessTracker
+from simulated_spotify import SimulatedPlatform, SimulatedSpotify
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingMeters:
+    """Перебор аудио сессий: счетчик вызовов и PID с сессией"""
+
+    def __init__(self, pids=()):
+        self.pids = set(pids)
+        self.calls = 0
+        self.closed = False
+
+    def read(self):
+        if self.closed:
+            raise OSError("session closed")
+        return 0.5
+
+    def __call__(self, pids):
+        self.calls += 1
+        return {pid: self.read for pid in pids & self.pids}
+
+
+def make_platform(count=3):
+    provider = FakeProcessProvider()
+    spotifies = [SimulatedSpotify(seed=index, pid=4242 + 100 * index, session_id=index + 1,
+                                  provider=provider) for index in range(count)]
+    return SimulatedPlatform(spotifies), spotifies
+
+
+def make_scanner(platform, pool=None, states=None):
+    states = states if states is not None else []
+
+    def new_state(root, foreign):
+        states.append((root.pid, foreign))
+        return {}
+
+    tracker = SpotifyProcessTracker(platform.process_provider())
+    return SpotifyInstanceScanner(tracker, platform, new_state, AdaptivePollScheduler,
+                                  audio_sessions=pool)
+
+
+def test_group_by_root_puts_root_first():
+    platform, spotifies = make_platform(2)
+    groups = group_by_root(list(platform.process_provider().iter_processes()))
+    assert sorted(groups) == [4242, 4342]
+    assert [info.pid for info in groups[4342]] == [4342, 4343, 4344, 4345]
+
+
+def test_scanner_splits_windows_by_instance():
+    platform, spotifies = make_platform(3)
+    scanner = make_scanner(platform)
+    instances = scanner.scan()
+    assert [instance.key for instance in instances] == [4242, 4342, 4442]
+    assert [instance.session_id for instance in instances] == [1, 2, 3]
+    for instance, spotify in zip(instances, spotifies):
+        assert instance.title == spotify.title
+
+    spotifies[1].quit()
+    assert [instance.key for instance in scanner.scan()] == [4242, 4442]
+    assert scanner.peak_instances == 3
+
+
+def test_foreign_instances_are_flagged():
+    platform, _ = make_platform(3)
+    states = []
+    scanner = make_scanner(platform, states=states)
+    scanner.own_session = 2
+    scanner.scan()
+    assert states == [(4242, True), (4342, False), (4442, True)]
+
+
+def test_pool_enumerates_once_per_tick_for_all_instances():
+    meters = CountingMeters({1, 11})
+    pool = AudioSessionPool(meters, clock=Clock())
+    backends = [PooledAudioBackend(pool) for _ in range(3)]
+    pid_sets = [(1, 2), (11, 12), (21, 22)]
+
+    pool.next_tick(pid for pids in pid_sets for pid in pids)
+    bound = [backend.bind(pids) for backend, pids in zip(backends, pid_sets)]
+    assert bound == [True, True, False]
+    assert meters.calls == 1
+    assert backends[0].peak() == 0.5
+
+    # Следующие тики: найденные сессии из кэша, поиск недостающей - по таймеру
+    for _ in range(5):
+        pool.next_tick(pid for pids in pid_sets for pid in pids)
+        for backend, pids in zip(backends, pid_sets):
+            backend.bind(pids)
+    assert meters.calls == 1
+
+
+def test_pool_retries_missing_session_after_interval():
+    clock = Clock()
+    meters = CountingMeters()
+    pool = AudioSessionPool(meters, retry_interval=5.0, clock=clock)
+    backend = PooledAudioBackend(pool)
+    pool.next_tick([1])
+    assert not backend.bind([1])
+
+    meters.pids.add(1)
+    clock.now = 4.0
+    pool.next_tick([1])
+    assert not backend.bind([1])
+    clock.now = 5.0
+    pool.next_tick([1])
+    assert backend.bind([1])
+    assert meters.calls == 2
+
+
+def test_pool_looks_up_new_pids_immediately():
+    clock = Clock()
+    meters = CountingMeters({31})
+    pool = AudioSessionPool(meters, clock=clock)
+    pool.next_tick([1])
+    assert not PooledAudioBackend(pool).bind([1])
+    pool.next_tick([1, 31])
+    assert PooledAudioBackend(pool).bind([31])
+    assert meters.calls == 2
+
+
+def test_pool_forgets_closed_session():
+    meters = CountingMeters({1})
+    pool = AudioSessionPool(meters, clock=Clock())
+    backend = PooledAudioBackend(pool)
+    pool.next_tick([1])
+    assert backend.bind([1])
+
+    meters.closed = True
+    assert backend.peak() is None
+    meters.closed = False
+    pool.next_tick([1])
+    assert backend.bind([1])
+    assert meters.calls == 2
+
+
+def test_scanner_feeds_pool_with_simulated_sessions():
+    platform, spotifies = make_platform(3)
+    pool = AudioSessionPool(platform.audio_meters_by_pid, clock=Clock())
+    scanner = make_scanner(platform, pool)
+    monitors = {}
+    for _ in range(3):
+        for instance in scanner.scan():
+            monitor = monitors.setdefault(instance.key, AudioPeakMonitor(PooledAudioBackend(pool)))
+            assert monitor.sample(instance.pids) is not None
+    assert pool.enumerations == 1
+    assert "переборов аудио сессий=1" in scanner.summary()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""SpotifyWindowRegistry поверх поддельных win32gui/win32process"""
+
+from platform_backends import SpotifyWindowRegistry
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeWin32:
+    """Окна рабочего стола: hwnd -> (pid, заголовок); счетчик EnumWindows"""
+
+    SW_SHOWMINIMIZED = 2
+
+    def __init__(self):
+        self.windows = {}
+        self.enumerations = 0
+
+    def EnumWindows(self, callback, extra):
+        self.enumerations += 1
+        for hwnd in list(self.windows):
+            callback(hwnd, extra)
+
+    def IsWindow(self, hwnd):
+        return hwnd in self.windows
+
+    def IsWindowVisible(self, hwnd):
+        return hwnd in self.windows
+
+    def GetWindowText(self, hwnd):
+        return self.windows[hwnd][1] if hwnd in self.windows else ''
+
+    def GetWindowThreadProcessId(self, hwnd):
+        return 1, self.windows[hwnd][0]
+
+    def GetWindowPlacement(self, hwnd):
+        return 0, 1, (0, 0), (0, 0), (0, 0, 800, 600)
+
+    def GetWindowRect(self, hwnd):
+        return 0, 0, 800, 600
+
+
+def make_registry():
+    win32 = FakeWin32()
+    clock = Clock()
+    registry = SpotifyWindowRegistry(win32, win32, win32, rescan_interval=30.0,
+                                     empty_rescan_interval=2.0, clock=clock)
+    return registry, win32, clock
+
+
+def test_cached_windows_are_checked_without_enumeration():
+    registry, win32, clock = make_registry()
+    win32.windows[16] = (100, 'Artist - Song')
+    for _ in range(10):
+        clock.now += 0.5
+        assert [w.title for w in registry.windows([100])] == ['Artist - Song']
+    assert win32.enumerations == 1
+
+
+def test_no_titled_window_is_not_enumerated_every_tick():
+    registry, win32, clock = make_registry()
+    win32.windows[16] = (100, '')  # только служебное окно без заголовка (трей)
+    for _ in range(10):
+        clock.now += 0.1
+        assert registry.windows([100]) == []
+    assert win32.enumerations == 1
+
+    # По грубому таймеру окно появляется
+    win32.windows[16] = (100, 'Artist - Song')
+    clock.now += 2.0
+    assert [w.title for w in registry.windows([100])] == ['Artist - Song']
+    assert win32.enumerations == 2
+
+
+def test_new_pid_set_is_enumerated_immediately():
+    registry, win32, clock = make_registry()
+    assert registry.windows([100]) == []
+    win32.windows[32] = (200, 'Spotify Free')
+    assert [w.title for w in registry.windows([200])] == ['Spotify Free']
+    assert win32.enumerations == 2
+
+
+def test_closed_window_triggers_enumeration():
+    registry, win32, clock = make_registry()
+    win32.windows[16] = (100, 'Artist - Song')
+    registry.windows([100])
+    del win32.windows[16]
+    win32.windows[48] = (100, 'Spotify Premium')
+    clock.now += 0.1
+    assert [w.title for w in registry.windows([100])] == ['Spotify Premium']
+    assert win32.enumerations == 2
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""AdaptivePollScheduler на подставных часах"""
+
+import pytest
+
+from poll_scheduler import AdaptivePollScheduler, STATE_ACTIVE, STATE_IDLE, STATE_PAUSED
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(**options):
+    clock = Clock()
+    return AdaptivePollScheduler(min_interval=0.1, max_interval=2.0, clock=clock, **options), clock
+
+
+def test_interval_backs_off_on_stable_track():
+    scheduler, clock = make_scheduler()
+    scheduler.observe('Artist - Song', False)
+    assert scheduler.next_interval() == 0.1
+    clock.now = 5.0
+    intervals = [scheduler.next_interval() for _ in range(6)]
+    assert intervals == [0.2, 0.4, 0.8, 1.6, 2.0, 2.0]
+
+
+def test_title_change_and_ads_reset_to_min_interval():
+    scheduler, clock = make_scheduler(ad_burst=10.0)
+    scheduler.observe('Artist - Song', False)
+    clock.now = 5.0
+    scheduler.next_interval()
+    scheduler.next_interval()
+    scheduler.observe('Advertisement', True)
+    clock.now = 10.0
+    scheduler.observe('Other - Song', False)
+    clock.now = 14.0
+    assert scheduler.next_interval() == 0.1
+    clock.now = 21.0
+    assert scheduler.next_interval() == 0.2
+
+
+def test_sleep_never_skips_expected_boundary():
+    scheduler, clock = make_scheduler(boundary_window=5.0)
+    for index in range(3):
+        clock.now = index * 100.0
+        scheduler.observe(f'Artist - Song {index}', False)
+    assert scheduler.expected_boundary() == 300.0
+    clock.now = 294.0
+    for _ in range(4):
+        scheduler.next_interval()
+    clock.now = 294.5
+    assert scheduler.next_interval() <= 0.5 + 1e-9
+    clock.now = 296.0
+    assert scheduler.next_interval() == 0.1
+
+
+def test_power_states():
+    scheduler, _ = make_scheduler(paused_interval=3.0, idle_interval=10.0)
+    assert scheduler.observe('Spotify Free', False)
+    assert scheduler.state == STATE_PAUSED and scheduler.next_interval() == 3.0
+    assert scheduler.observe(None, False, running=False)
+    assert scheduler.state == STATE_IDLE and scheduler.next_interval() == 10.0
+    assert scheduler.observe('Artist - Song', False)
+    assert scheduler.state == STATE_ACTIVE and scheduler.next_interval() == 0.1
+    assert not scheduler.observe('Artist - Song', False)
+
+
+def test_invalid_intervals():
+    with pytest.raises(ValueError):
+        AdaptivePollScheduler(min_interval=0)
+    with pytest.raises(ValueError):
+        AdaptivePollScheduler(min_interval=1.0, max_interval=0.5)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""SpotifyProcessTracker: закрепленные PID и полный обход только при изменениях; ошибки WMI"""
+
+from types import SimpleNamespace
+
+from process_tracker import (WBEM_E_TIMEDOUT, FakeProcessProvider, ProcessInfo, SpotifyProcessTracker,
+                             WmiProcessStartWatcher, com_error_code)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def spotify_tree(pid=100, create_time=1.0):
+    return [ProcessInfo(pid, 'Spotify.exe', create_time, 1, ('Spotify.exe',)),
+            ProcessInfo(pid + 1, 'Spotify.exe', create_time, pid, ('Spotify.exe', '--type=renderer'))]
+
+
+def make_tracker(processes=(), rescan_interval=30.0):
+    provider = FakeProcessProvider([ProcessInfo(1, 'explorer.exe', 0.5)] + list(processes))
+    clock = Clock()
+    return SpotifyProcessTracker(provider, rescan_interval=rescan_interval, clock=clock), provider, clock
+
+
+def test_pinned_pids_are_checked_without_rescan():
+    tracker, provider, clock = make_tracker(spotify_tree())
+    found = tracker.refresh()
+    assert [info.pid for info in found] == [100, 101]
+    assert tracker.main_process.pid == 100
+    assert found[1].cmdline == ('Spotify.exe', '--type=renderer')
+
+    for _ in range(10):
+        clock.now += 1.0
+        assert tracker.refresh() is found
+    assert provider.scan_count == 1
+    assert provider.alive_checks == 20
+
+
+def test_periodic_rescan_picks_up_new_children():
+    tracker, provider, clock = make_tracker(spotify_tree(), rescan_interval=30.0)
+    tracker.refresh()
+    provider.add(ProcessInfo(102, 'Spotify.exe', 1.0, 100, ('Spotify.exe', '--type=utility')))
+    clock.now = 29.0
+    assert len(tracker.refresh()) == 2
+    clock.now = 30.0
+    assert len(tracker.refresh()) == 3
+    assert tracker.full_scans == 2
+
+
+def test_exited_process_triggers_rescan():
+    tracker, provider, _ = make_tracker(spotify_tree())
+    tracker.refresh()
+    provider.remove(101)
+    assert [info.pid for info in tracker.refresh()] == [100]
+    assert provider.scan_count == 2
+
+
+def test_reused_pid_is_not_trusted():
+    tracker, provider, _ = make_tracker(spotify_tree(create_time=1.0))
+    tracker.refresh()
+    # Spotify перезапущен, и ОС выдала те же PID
+    for info in spotify_tree(create_time=2.0):
+        provider.add(info)
+    assert all(info.create_time == 2.0 for info in tracker.refresh())
+    assert tracker.full_scans == 2
+
+
+def test_no_spotify_rescans_until_found():
+    tracker, provider, _ = make_tracker()
+    assert tracker.refresh() == []
+    assert not tracker.is_running()
+    for info in spotify_tree():
+        provider.add(info)
+    assert tracker.is_running()
+    assert provider.scan_count == 3
+
+
+def test_invalidate_and_force():
+    tracker, provider, _ = make_tracker(spotify_tree())
+    tracker.refresh()
+    tracker.invalidate()
+    assert tracker.main_process is None
+    tracker.refresh()
+    tracker.refresh(force=True)
+    assert provider.scan_count == 3
+    assert tracker.main_process.pid == 100
+
+
+class FakeComError(Exception):
+    """pythoncom.com_error: hresult и excepinfo со scode WMI"""
+
+    def __init__(self, scode):
+        super().__init__(hex(scode))
+        self.hresult = -2147352567  # DISP_E_EXCEPTION
+        self.excepinfo = (0, 'SWbemEventSource', '', None, 0, scode - (1 << 32))
+
+
+class FakeEvents:
+    """Источник событий WMI: по одному шагу сценария на вызов NextEvent"""
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+
+    def NextEvent(self, timeout_ms):
+        step = self.steps.pop(0) if self.steps else FakeComError(WBEM_E_TIMEDOUT)
+        if isinstance(step, Exception):
+            raise step
+
+
+def make_watcher(connections):
+    """Наблюдатель, останавливающийся на первом событии запуска"""
+    logged = []
+    started = []
+    watcher = WmiProcessStartWatcher(lambda: started.append(1) or watcher._stop.set(),
+                                     log=lambda message, level='INFO', *args: logged.append(level),
+                                     retry_delay=0.0, max_reconnects=2)
+    pending = list(connections)
+
+    def connect():
+        connection = pending.pop(0)
+        if isinstance(connection, Exception):
+            raise connection
+        return connection
+
+    return watcher, connect, started, logged
+
+
+def test_wmi_timeouts_keep_waiting():
+    events = FakeEvents([FakeComError(WBEM_E_TIMEDOUT)] * 3 + [None])
+    watcher, connect, started, logged = make_watcher([events])
+    watcher._watch(connect, FakeComError)
+    assert started == [1]
+    assert watcher.reconnects == 0
+    assert logged == []
+
+
+def test_wmi_connection_loss_reconnects():
+    lost = FakeEvents([FakeComError(WBEM_E_TIMEDOUT), FakeComError(0x800706BA)])
+    watcher, connect, started, logged = make_watcher([lost, FakeEvents([None])])
+    watcher._watch(connect, FakeComError)
+    assert started == [1]
+    assert watcher.reconnects == 1
+    assert logged == ['WARNING']
+
+
+def test_wmi_unavailable_gives_up_to_polling():
+    failure = FakeComError(0x80041003)
+    watcher, connect, started, logged = make_watcher([failure] * 3)
+    watcher._watch(connect, FakeComError)
+    assert started == []
+    assert watcher.reconnects == 2
+    assert logged == ['WARNING'] * 3
+
+
+def test_com_error_code_prefers_wmi_scode():
+    assert com_error_code(FakeComError(WBEM_E_TIMEDOUT)) == WBEM_E_TIMEDOUT
+    assert com_error_code(SimpleNamespace(hresult=-2147023174, excepinfo=None)) == 0x800706BA
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""SimulatedSpotify и SimulatedPlatform: сценарий рекламы и блокировщик поверх них"""
+
+import time
+
+from process_tracker import FakeProcessProvider
+from simulated_spotify import SimulatedPlatform, SimulatedSpotify
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_spotify(clock, **options):
+    options.setdefault('tracks_between_ads', 1)
+    return SimulatedSpotify(ad_break=(1, 1), track_length=(10.0, 10.0), ad_length=(20.0, 20.0),
+                            seed=1, clock=clock, **options)
+
+
+def test_playlist_alternates_tracks_and_ads():
+    clock = Clock()
+    spotify = make_spotify(clock)
+    assert not spotify.playing_ad and ' - ' in spotify.title
+    clock.now = 10.5
+    assert spotify.playing_ad
+    assert spotify.title in ('Advertisement', 'Spotify - Advertisement', 'Sponsored', 'Spotify Ad')
+    clock.now = 30.5
+    assert not spotify.playing_ad
+    assert spotify.summary()['ads_played'] == 1
+    assert spotify.summary()['ad_seconds_heard'] == 20.0
+
+
+def test_peak_has_silence_at_boundary_and_loud_ads():
+    clock = Clock()
+    spotify = make_spotify(clock)
+    clock.now = 10.1
+    assert spotify.peak() == 0.0
+    clock.now = 11.0
+    assert spotify.peak() > 0.7
+    clock.now = 5.0 + 30.0
+    assert spotify.peak() < 0.45
+
+
+def test_skip_pause_and_quit():
+    clock = Clock()
+    spotify = make_spotify(clock)
+    clock.now = 12.0
+    spotify.skip()
+    assert not spotify.playing_ad
+    assert spotify.summary()['ads_skipped'] == 1
+
+    spotify.pause()
+    assert spotify.title == 'Spotify Free' and spotify.peak() == 0.0
+    clock.now = 100.0
+    spotify.resume()
+    assert spotify.title != 'Spotify Free'
+
+    spotify.quit()
+    assert spotify.title is None
+    assert spotify.provider.processes == {}
+
+
+def test_platform_maps_windows_sessions_and_skips_by_pid():
+    clock = Clock()
+    provider = FakeProcessProvider()
+    first = make_spotify(clock, pid=100, session_id=1, provider=provider)
+    second = make_spotify(clock, pid=200, session_id=2, provider=provider, tracks_between_ads=0)
+    platform = SimulatedPlatform([first, second])
+
+    by_pid = platform.spotify_windows_by_pid(first.pids + second.pids)
+    assert sorted(by_pid) == [100, 200]
+    assert by_pid[200][0].title == second.title
+    assert platform.process_session(203) == 2
+    assert platform.process_session(999) is None
+
+    transport = platform.skip_transports()[0]
+    transport.send(by_pid[200][0].hwnd)
+    assert second.summary()['ads_skipped'] == 1
+    assert first.summary()['tracks_skipped'] == 0
+
+    assert platform.terminate_process(201)
+    assert 201 not in provider.processes and 200 in provider.processes
+
+
+def test_blocker_skips_simulated_ads(simulated_blocker):
+    clock = Clock()
+    blocker, platform = simulated_blocker(clock=clock, tracks_between_ads=1, ad_break=(1, 1),
+                                          track_length=(10.0, 10.0), ad_length=(20.0, 20.0), seed=1,
+                                          ad_titles=('Advertisement', 'Spotify - Advertisement'))
+    blocker.clock = clock
+    spotify = platform.spotify
+    for _ in range(600):
+        clock.now += 0.25
+        blocker.process_tick(blocker.take_snapshot())
+        deadline = time.monotonic() + 2.0
+        while (blocker.actions.pending or blocker.actions._active) and time.monotonic() < deadline:
+            time.sleep(0.001)
+    stats = spotify.summary()
+    assert stats['ads_played'] >= 3
+    assert stats['ads_skipped'] == stats['ads_played']
+    assert stats['avg_ad_seconds_heard'] < 2.0
+
+
+def test_temporary_root_is_removed_on_close():
+    platform = SimulatedPlatform(SimulatedSpotify(seed=1))
+    roots = platform.spotify_roots(platform.root)
+    assert all(root.is_dir() for root in roots)
+    platform.close()
+    assert not platform.root.exists()
+
+
+def test_given_root_is_kept_on_close(tmp_path):
+    platform = SimulatedPlatform(SimulatedSpotify(seed=1), root=tmp_path / 'spotify')
+    platform.spotify_roots(platform.root)
+    platform.close()
+    assert (tmp_path / 'spotify').is_dir()
+
+
+def test_replay_blocker_removes_temporary_config_dir():
+    from trace_replay import create_replay_blocker
+
+    blocker = create_replay_blocker()
+    config_dir = blocker.config_dir
+    assert config_dir.is_dir()
+    blocker.stop()
+    assert not config_dir.exists()
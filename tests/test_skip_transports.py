@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""SkipTransportSelector: выбор способа пропуска по измеренной задержке"""
+
+from skip_transports import CallbackSkipTransport, SkipTransportSelector
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Player:
+    """Заголовок меняется после пропуска через рабочий способ"""
+
+    def __init__(self):
+        self.track = 0
+
+    @property
+    def title(self):
+        return f'Artist - Song {self.track}'
+
+    def skip(self, hwnd):
+        self.track += 1
+
+
+def broken(hwnd):
+    raise OSError("окно не отвечает")
+
+
+def make_selector(*transports, **options):
+    clock = Clock()
+    selector = SkipTransportSelector(list(transports), clock=clock, **options)
+    results = []
+    selector.listeners.append(lambda name, seconds, ok: results.append((name, round(seconds, 3), ok)))
+    return selector, clock, results
+
+
+def test_failed_send_falls_through_to_next_transport():
+    player = Player()
+    selector, clock, results = make_selector(CallbackSkipTransport('broken', broken),
+                                             CallbackSkipTransport('working', player.skip))
+    selector.observe(player.title)
+    assert selector.skip(1) == 'working'
+    clock.now = 0.2
+    selector.observe(player.title)
+    assert results == [('broken', 0.0, False), ('working', 0.2, True)]
+    assert selector.preferred == 'working'
+
+
+def test_unconfirmed_skip_fails_after_timeout():
+    selector, clock, results = make_selector(CallbackSkipTransport('silent', lambda hwnd: None),
+                                             confirm_timeout=1.5)
+    selector.observe('Advertisement')
+    selector.skip(1)
+    clock.now = 1.0
+    selector.observe('Advertisement')
+    assert results == []
+    clock.now = 1.6
+    selector.observe('Advertisement')
+    assert results == [('silent', 1.6, False)]
+
+
+def test_fastest_confirmed_transport_is_preferred():
+    player = Player()
+    selector, clock, _ = make_selector(CallbackSkipTransport('slow', player.skip),
+                                       CallbackSkipTransport('fast', player.skip), explore_every=2)
+    # Первый пропуск - через slow, второй (исследование) - через fast
+    for latency in (0.5, 0.05):
+        selector.observe(player.title)
+        sent_at = clock.now
+        selector.skip(1)
+        clock.now = sent_at + latency
+        selector.observe(player.title)
+        clock.now += 1.0
+    assert selector.stats['fast'].confirmed == 1
+    assert selector.preferred == 'fast'
+    assert [transport.name for transport in selector.order()] == ['fast', 'slow']
+
+
+def test_failing_transport_is_suspended_then_retried():
+    player = Player()
+    selector, clock, _ = make_selector(CallbackSkipTransport('broken', broken),
+                                       CallbackSkipTransport('working', player.skip),
+                                       max_failures=2, retry_after=3, explore_every=1000)
+    for _ in range(2):
+        selector.skip(1)
+        clock.now += 0.1
+        selector.observe(player.title)
+    assert [transport.name for transport in selector.order()] == ['working', 'broken']
+    for _ in range(3):
+        selector.skip(1)
+        clock.now += 0.1
+        selector.observe(player.title)
+    assert not selector._suspended(selector.stats['broken'])
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Цикл мониторинга на событиях смены заголовка вместо sleep"""
+
+import threading
+import time
+
+from title_events import PollingTitleEventSource, ScriptedTitleEventSource
+
+
+def test_scripted_source_replays_events():
+    exhausted = []
+    source = ScriptedTitleEventSource(['Artist - Song', None, 'Advertisement'],
+                                      on_exhausted=lambda: exhausted.append(True))
+    assert source.event_driven
+    assert source.wait(1.0)
+    assert not source.wait(2.0)
+    assert source.wait()
+    assert source.last_title == 'Advertisement'
+    assert not source.wait(3.0)
+    assert not source.wait(3.0)
+    assert exhausted == [True]
+    assert source.timeouts == [1.0, 2.0, None, 3.0, 3.0]
+
+
+def test_polling_source_wakes_on_notify():
+    source = PollingTitleEventSource(interval=5.0)
+    timer = threading.Timer(0.05, source.notify)
+    timer.start()
+    started = time.monotonic()
+    assert source.wait()
+    assert time.monotonic() - started < 2.0
+
+
+def test_monitor_loop_blocks_on_title_events(simulated_blocker):
+    blocker, platform = simulated_blocker()
+    events = ScriptedTitleEventSource(['Artist - Song'] * 5 + [None] * 5,
+                                      on_exhausted=lambda: setattr(blocker, 'is_running', False))
+    blocker.title_events = events
+    blocker.is_running = True
+
+    started = time.monotonic()
+    blocker.monitor_spotify()
+    # Все ожидания - в источнике событий: цикл не спит сам
+    assert time.monotonic() - started < 2.0
+    assert events.exhausted
+    ticks = blocker.instrumentation.report()['counters']['ticks']
+    assert ticks == len(events.timeouts) == 11
+    assert all(timeout is not None and timeout > 0 for timeout in events.timeouts)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Трассы: разметка рекламы при записи и оценка при воспроизведении"""
+
+import json
+import time
+
+from platform_backends import SpotifyWindow
+from trace_replay import TraceRecorder, load_trace, run_benchmark
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def snapshot_at(ts, title):
+    from spotify_ad_blocker import DetectionSnapshot
+
+    processes = [{'pid': 4242, 'name': 'Spotify.exe', 'cmdline': ['Spotify.exe']}]
+    return DetectionSnapshot(processes, [SpotifyWindow(1, title, (0, 0, 800, 600), False)], '',
+                             timestamp=ts, audio_peak=0.5)
+
+
+def test_labels_become_spans(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    recorder = TraceRecorder(path)
+    labels = [False, True, True, False, None, True]
+    for index, label in enumerate(labels):
+        title = 'Advertisement' if label else 'Artist - Song'
+        recorder.record(snapshot_at(100.0 + index, title), label)
+    recorder.close()
+    recorder.close()
+
+    assert recorder.ticks == 6 and recorder.spans == 2
+    snapshots, spans = load_trace(path)
+    assert spans == [(101.0, 102.0), (105.0, 105.0)]
+    assert [s.title for s in snapshots][:2] == ['Artist - Song', 'Advertisement']
+    assert all(s.audio_peak == 0.5 for s in snapshots)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line.get('ad') for line in lines if 't' in line] == labels
+
+
+def test_simulated_recording_can_be_scored(simulated_blocker, tmp_path):
+    clock = Clock()
+    blocker, platform = simulated_blocker(clock=clock, tracks_between_ads=1, ad_break=(1, 1),
+                                          track_length=(10.0, 10.0), ad_length=(20.0, 20.0), seed=1,
+                                          ad_titles=('Advertisement',))
+    blocker.clock = clock
+    path = tmp_path / 'trace.jsonl'
+    recorder = TraceRecorder(path)
+    for _ in range(400):
+        clock.now += 0.25
+        snapshot = blocker.take_snapshot()
+        snapshot.timestamp = clock.now
+        label = platform.playing_ad(blocker._spotify_pids)
+        blocker.process_tick(snapshot)
+        recorder.record(snapshot, label)
+        deadline = time.monotonic() + 2.0
+        while (blocker.actions.pending or blocker.actions._active) and time.monotonic() < deadline:
+            time.sleep(0.001)
+    recorder.close()
+
+    report = run_benchmark(path)
+    assert report['spans'] == platform.spotify.summary()['ads_played'] >= 2
+    assert report['spans_blocked'] == report['spans']
+    assert report['false_blocks'] == 0
+    assert report['tick_precision'] == 1.0
+    assert report['tick_recall'] > 0.0
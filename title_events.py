@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Источники событий смены заголовка окна Spotify
+
+Цикл мониторинга блокируется на TitleEventSource.wait() вместо
+фиксированного time.sleep(0.3):
+
+- WinEventTitleEventSource - хук WinEvent (EVENT_OBJECT_NAMECHANGE) на
+  процессы Spotify, реакция за миллисекунды и почти нулевая нагрузка
+  на CPU, пока играет музыка;
+- PollingTitleEventSource - прежнее поведение, опрос с фиксированным
+  интервалом;
+- ScriptedTitleEventSource - заранее заданная последовательность событий
+  для тестов и воспроизведения без Windows.
+"""
+
+import os
+import threading
+from typing import Callable, Iterable, List, Optional, Set
+
+
+class TitleEventSource:
+    """Интерфейс источника событий: wait() возвращает True, если пришло событие"""
+
+    # True - источник сам сообщает о смене заголовка, опрос не нужен
+    event_driven = False
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        # Будим цикл мониторинга, чтобы он увидел остановку
+        self.notify()
+
+    def notify(self):
+        """Сообщить о смене заголовка (или разбудить ожидающий цикл)"""
+        self._event.set()
+
+    def set_target_pids(self, pids: Iterable[int]):
+        """PID процессов Spotify, за окнами которых нужно следить"""
+        pass
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        raise NotImplementedError
+
+
+class PollingTitleEventSource(TitleEventSource):
+    """Опрос с фиксированным интервалом - прежнее поведение цикла"""
+
+    def __init__(self, interval: float = 0.3):
+        super().__init__()
+        self.interval = interval
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # Явный таймаут задает планировщик опроса (может быть длиннее interval)
+        delay = self.interval if timeout is None else timeout
+        self._event.wait(delay)
+        self._event.clear()
+        # При опросе каждый тик считается поводом для проверки
+        return True
+
+
+class ScriptedTitleEventSource(TitleEventSource):
+    """Сценарий событий для тестов: каждый wait() забирает следующий элемент
+
+    Строка - событие смены заголовка (запоминается в last_title),
+    None - истечение таймаута без событий. Когда сценарий закончился,
+    вызывается on_exhausted (например, blocker.stop).
+    """
+
+    event_driven = True
+
+    def __init__(self, events: Iterable[Optional[str]],
+                 on_exhausted: Optional[Callable[[], None]] = None):
+        super().__init__()
+        self._events = iter(events)
+        self.on_exhausted = on_exhausted
+        self.last_title: Optional[str] = None
+        self.timeouts: List[Optional[float]] = []
+        self.exhausted = False
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        self.timeouts.append(timeout)
+        try:
+            title = next(self._events)
+        except StopIteration:
+            if not self.exhausted:
+                self.exhausted = True
+                if self.on_exhausted:
+                    self.on_exhausted()
+            return False
+        if title is None:
+            return False
+        self.last_title = title
+        return True
+
+
+# Константы WinAPI
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+WM_QUIT = 0x0012
+WM_APP = 0x8000
+WM_APP_REHOOK = WM_APP + 1
+
+
+class WinEventTitleEventSource(TitleEventSource):
+    """Хук EVENT_OBJECT_NAMECHANGE на окна процессов Spotify
+
+    Хуки WINEVENT_OUTOFCONTEXT доставляются через очередь сообщений
+    потока, который их установил, поэтому установка, снятие хуков и цикл
+    GetMessage живут в отдельном потоке. Без событий wait() все равно
+    просыпается раз в heartbeat секунд, чтобы не пропустить признаки
+    рекламы, не связанные с заголовком.
+    """
+
+    event_driven = True
+
+    def __init__(self, heartbeat: float = 1.0):
+        super().__init__()
+        import ctypes
+        from ctypes import wintypes
+
+        self.heartbeat = heartbeat
+        self._ctypes = ctypes
+        self._wintypes = wintypes
+        self._user32 = ctypes.WinDLL('user32', use_last_error=True)
+        self._kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+
+        self._proc_type = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        self._user32.SetWinEventHook.restype = wintypes.HANDLE
+        self._user32.SetWinEventHook.argtypes = [
+            wintypes.UINT, wintypes.UINT, wintypes.HMODULE, self._proc_type,
+            wintypes.DWORD, wintypes.DWORD, wintypes.UINT]
+        self._user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        self._user32.PostThreadMessageW.argtypes = [
+            wintypes.DWORD, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+
+        # Ссылку на callback держим, иначе его соберет сборщик мусора
+        self._callback = self._proc_type(self._on_win_event)
+        self._pids: Set[int] = set()
+        self._hooks = []
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id = None
+        self._ready = threading.Event()
+
+    def _on_win_event(self, hook, event, hwnd, id_object, id_child, thread_id, event_time):
+        if id_object == OBJID_WINDOW and id_child == CHILDID_SELF:
+            self._event.set()
+
+    def _install_hooks(self):
+        for hook in self._hooks:
+            self._user32.UnhookWinEvent(hook)
+        self._hooks = []
+        for pid in sorted(self._pids):
+            hook = self._user32.SetWinEventHook(
+                EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE, None,
+                self._callback, pid, 0,
+                WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS)
+            if hook:
+                self._hooks.append(hook)
+
+    def _run(self):
+        ctypes = self._ctypes
+        msg = self._wintypes.MSG()
+        # PeekMessage создает очередь сообщений потока до PostThreadMessage
+        self._user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, 0)
+        self._thread_id = self._kernel32.GetCurrentThreadId()
+        self._install_hooks()
+        self._ready.set()
+        try:
+            while self._user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                if msg.message == WM_APP_REHOOK:
+                    self._install_hooks()
+                    continue
+                self._user32.TranslateMessage(ctypes.byref(msg))
+                self._user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for hook in self._hooks:
+                self._user32.UnhookWinEvent(hook)
+            self._hooks = []
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='WinEventHook', daemon=True)
+        self._thread.start()
+        self._ready.wait(2.0)
+
+    def stop(self):
+        if self._thread is not None and self._thread_id:
+            self._user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+            self._thread.join(timeout=2.0)
+        self._thread = None
+        super().stop()
+
+    def set_target_pids(self, pids: Iterable[int]):
+        pids = set(pids)
+        if pids == self._pids:
+            return
+        self._pids = pids
+        if self._thread_id:
+            # Хуки переустанавливаются в потоке, владеющем очередью сообщений
+            self._user32.PostThreadMessageW(self._thread_id, WM_APP_REHOOK, 0, 0)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        fired = self._event.wait(self.heartbeat if timeout is None else timeout)
+        self._event.clear()
+        return fired
+
+
+def create_title_event_source(log: Optional[Callable[..., None]] = None,
+                              poll_interval: float = 0.3) -> TitleEventSource:
+    """WinEvent-хуки на Windows, иначе (или при ошибке) - опрос"""
+    if os.name == 'nt':
+        try:
+            return WinEventTitleEventSource()
+        except Exception as e:
+            if log:
+                log(f"WinEvent-хуки недоступны, используется опрос: {e}", "WARNING")
+    return PollingTitleEventSource(poll_interval)
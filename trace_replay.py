@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Запись трасс детекции и офлайн-бенчмарк по ним
+
+Трасса - файл JSONL, одна строка на тик с сырыми входными данными
+детекторов: время, процессы Spotify, окна (заголовок, прямоугольник,
+свернуто ли), заголовок активного окна и пиковый уровень звука.
+Процессы и окна пишутся только при изменении, поэтому трасса компактна.
+Размеченные рекламные интервалы задаются строками {"span": [начало, конец]}:
+их пишет и сам TraceRecorder по меткам тиков, если разметка известна
+(Platform.playing_ad, например в симуляторе).
+
+Воспроизведение прогоняет трассу через is_ad_playing и автомат
+monitor_spotify (SpotifyAdBlocker.process_tick) без Windows и
+сообщает пропускную способность, задержку от начала рекламы до
+блокировки и точность/полноту относительно разметки.
+
+Запуск бенчмарка:
+    python trace_replay.py trace.jsonl [--repeat N]
+"""
+
+import sys
+import json
+import time
+import tempfile
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from capabilities import PlatformCapabilities
+from audio_backends import AudioBackend, AudioPeakMonitor
+from platform_backends import SpotifyWindow
+
+
+class TraceRecorder:
+    """Построчная запись снимков тиков в JSONL с дельта-кодированием"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'a', encoding='utf-8', buffering=64 * 1024)
+        self._last_processes = None
+        self._last_windows = None
+        # Открытый интервал рекламы по меткам тиков: (первый, последний рекламный тик)
+        self._span: Optional[Tuple[float, float]] = None
+        self.ticks = 0
+        self.spans = 0
+
+    def record(self, snapshot, label: Optional[bool] = None):
+        """Записать тик; label - играет ли реклама на самом деле (None - неизвестно)"""
+        record = {'t': round(snapshot.timestamp, 3), 'fg': snapshot.foreground_title}
+        processes = [[p['pid'], p['name'], p.get('cmdline', [])] for p in snapshot.processes]
+        if processes != self._last_processes:
+            record['p'] = processes
+            self._last_processes = processes
+        windows = [[w.hwnd, w.title, list(w.rect), w.minimized] for w in snapshot.windows]
+        if windows != self._last_windows:
+            record['w'] = windows
+            self._last_windows = windows
+        if snapshot.audio_peak is not None:
+            record['a'] = round(snapshot.audio_peak, 4)
+        if label is not None:
+            record['ad'] = label
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n')
+        self.ticks += 1
+        if label:
+            start = self._span[0] if self._span is not None else snapshot.timestamp
+            self._span = (start, snapshot.timestamp)
+        elif label is not None:
+            self._close_span()
+
+    def _close_span(self):
+        if self._span is not None:
+            self.add_span(*self._span)
+            self._span = None
+
+    def add_span(self, start: float, end: float):
+        """Разметка рекламного интервала"""
+        self._file.write(json.dumps({'span': [round(start, 3), round(end, 3)]}) + '\n')
+        self.spans += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._close_span()
+            self._file.close()
+
+
+def load_trace(path: Path):
+    """Прочитать трассу: список снимков и список размеченных интервалов рекламы"""
+    # Импорт здесь: spotify_ad_blocker сам импортирует этот модуль
+    from spotify_ad_blocker import DetectionSnapshot
+
+    snapshots = []
+    spans: List[Tuple[float, float]] = []
+    processes: List[Dict] = []
+    windows = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'span' in record:
+                spans.append(tuple(record['span']))
+                continue
+            if 'p' in record:
+                processes = [{'pid': pid, 'name': name, 'cmdline': cmdline}
+                             for pid, name, cmdline in record['p']]
+            if 'w' in record:
+                windows = [SpotifyWindow(hwnd, title, tuple(rect), minimized)
+                           for hwnd, title, rect, minimized in record['w']]
+            snapshots.append(DetectionSnapshot(processes, windows, record.get('fg', ''),
+                                               timestamp=record['t'], audio_peak=record.get('a')))
+    return snapshots, spans
+
+
+class ReplayCapabilities(PlatformCapabilities):
+    """Все детекторы включены: входные данные берутся из трассы, а не из ОС"""
+
+    def __init__(self):
+        # Модули ОС не загружаются: при воспроизведении они не нужны
+        super().__init__(modules={'replay': ('builtins', '')})
+
+    def has(self, feature: str) -> bool:
+        return True
+
+
+class _NoAudioBackend(AudioBackend):
+    def bind(self, pids) -> bool:
+        return False
+
+    def peak(self):
+        return None
+
+
+def create_replay_blocker(config_dir: Optional[Path] = None):
+    """Блокировщик для воспроизведения: без действий, лог во временной папке
+
+    Временная папка (если config_dir не задан) удаляется в blocker.stop().
+    """
+    from spotify_ad_blocker import SpotifyAdBlocker
+
+    temporary = None
+    if config_dir is None:
+        temporary = tempfile.TemporaryDirectory(prefix='ad_blocker_replay_')
+        config_dir = temporary.name
+    blocker = SpotifyAdBlocker(config_dir=Path(config_dir), caps=ReplayCapabilities())
+    blocker.log_writer.echo = False
+    blocker.audio_monitor = AudioPeakMonitor(_NoAudioBackend(), clock=lambda: blocker.clock())
+    blocker.block_times: List[float] = []
+    # Вместо реальных действий запоминаем момент блокировки
+    blocker.block_ad_aggressively = lambda: blocker.block_times.append(blocker.clock())
+    if temporary is not None:
+        stop = blocker.stop
+
+        def stop_and_cleanup():
+            stop()
+            temporary.cleanup()
+
+        blocker.stop = stop_and_cleanup
+    return blocker
+
+
+def replay(blocker, snapshots) -> Dict:
+    """Прогнать снимки через автомат мониторинга; вернуть решения по тикам"""
+    current = {'t': 0.0}
+    blocker.clock = lambda: current['t']
+    decisions = []
+    started = time.perf_counter()
+    for snapshot in snapshots:
+        current['t'] = snapshot.timestamp
+        if snapshot.audio_peak is not None and blocker.audio_monitor is not None:
+            blocker.audio_monitor.push(snapshot.audio_peak, snapshot.timestamp)
+        decisions.append(blocker.process_tick(snapshot))
+    elapsed = time.perf_counter() - started
+    return {'decisions': decisions, 'elapsed': elapsed}
+
+
+def evaluate(snapshots, decisions: List[bool], block_times: List[float],
+             spans: List[Tuple[float, float]]) -> Dict:
+    """Точность/полнота по тикам и задержка детекции по интервалам рекламы"""
+    def in_span(ts):
+        return any(start <= ts <= end for start, end in spans)
+
+    tp = fp = fn = 0
+    for snapshot, predicted in zip(snapshots, decisions):
+        actual = in_span(snapshot.timestamp)
+        if predicted and actual:
+            tp += 1
+        elif predicted:
+            fp += 1
+        elif actual:
+            fn += 1
+
+    latencies = []
+    missed = 0
+    for start, end in spans:
+        blocked = [t for t in block_times if start <= t <= end]
+        if blocked:
+            latencies.append(min(blocked) - start)
+        else:
+            missed += 1
+    false_blocks = sum(1 for t in block_times if not in_span(t))
+
+    latencies.sort()
+    return {
+        'tick_precision': tp / (tp + fp) if tp + fp else None,
+        'tick_recall': tp / (tp + fn) if tp + fn else None,
+        'spans': len(spans),
+        'spans_blocked': len(spans) - missed,
+        'false_blocks': false_blocks,
+        'latency_p50_s': latencies[len(latencies) // 2] if latencies else None,
+        'latency_max_s': latencies[-1] if latencies else None,
+    }
+
+
+def run_benchmark(path: Path, repeat: int = 1) -> Dict:
+    snapshots, spans = load_trace(path)
+    blocker = create_replay_blocker()
+    try:
+        total_elapsed = 0.0
+        result = None
+        for _ in range(repeat):
+            # Каждый прогон начинается с чистого состояния автомата
+            blocker.block_times.clear()
+            blocker._ad_detection_count = 0
+            blocker._music_detection_count = 0
+            blocker._last_ad_block_time = 0
+            for attr in ('_last_window_switch', '_last_ad_detection', '_last_music_log'):
+                if hasattr(blocker, attr):
+                    delattr(blocker, attr)
+            blocker.audio_monitor.samples.clear()
+            result = replay(blocker, snapshots)
+            total_elapsed += result['elapsed']
+
+        report = evaluate(snapshots, result['decisions'], blocker.block_times, spans)
+        ticks = len(snapshots) * repeat
+        report.update({
+            'ticks': ticks,
+            'ticks_per_sec': ticks / total_elapsed if total_elapsed else None,
+            'detector_runs': dict(blocker.detectors.run_counts),
+        })
+        return report
+    finally:
+        blocker.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарк детекции рекламы по трассе")
+    parser.add_argument('trace', type=Path, help="файл трассы JSONL")
+    parser.add_argument('--repeat', type=int, default=1, help="число прогонов для замера пропускной способности")
+    args = parser.parse_args()
+
+    if not args.trace.exists():
+        print(f"❌ Трасса не найдена: {args.trace}")
+        sys.exit(1)
+
+    report = run_benchmark(args.trace, args.repeat)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()